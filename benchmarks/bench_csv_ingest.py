@@ -0,0 +1,91 @@
+"""Compare peak RSS and wall time of eager vs chunked CSV ingestion.
+
+Each mode runs in its own subprocess so peak RSS is measured in isolation:
+
+    python benchmarks/bench_csv_ingest.py --rows 2000000
+    python benchmarks/bench_csv_ingest.py --file path/to/big.csv
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core.ingest import read_csv_chunked  # noqa: E402
+
+
+def make_csv(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    chunk = 500_000
+    for start in range(0, rows, chunk):
+        n = min(chunk, rows - start)
+        pd.DataFrame({
+            "id": np.arange(start, start + n),
+            "date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D"),
+            "region": rng.choice(["North", "South", "East", "West"], n),
+            "product": rng.choice([f"P{i:03d}" for i in range(200)], n),
+            "units": rng.integers(0, 500, n),
+            "price": rng.choice([9.5, 19.75, 99.0, 4.25], n),
+            "note": [f"order-{i}" for i in range(start, start + n)],
+        }).to_csv(path, mode="a" if start else "w", header=not start, index=False)
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 ** 2) if sys.platform == "darwin" else peak / 1024
+
+
+def worker(mode, path):
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        df = pd.read_csv(f) if mode == "eager" else read_csv_chunked(f)
+    elapsed = time.perf_counter() - start
+    frame_mb = df.memory_usage(deep=True).sum() / (1024 ** 2)
+    print(f"{mode},{elapsed:.3f},{peak_rss_mb():.1f},{frame_mb:.1f},{len(df)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--file", help="benchmark an existing CSV instead of a synthetic one")
+    parser.add_argument("--worker", choices=["eager", "chunked"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.file)
+        return
+
+    path = args.file
+    tmp = None
+    if path is None:
+        tmp = tempfile.NamedTemporaryFile(suffix=".csv", delete=False)
+        tmp.close()
+        path = tmp.name
+        make_csv(path, args.rows)
+
+    try:
+        print(f"file: {path} ({os.path.getsize(path) / (1024 ** 2):.1f} MB)")
+        print(f"{'mode':<8} {'wall s':>8} {'peak RSS MB':>12} {'frame MB':>9} {'rows':>10}")
+        for mode in ("eager", "chunked"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--worker", mode, "--file", path],
+                check=True, capture_output=True, text=True,
+            ).stdout.strip().splitlines()[-1]
+            name, wall, rss, frame, rows = out.split(",")
+            print(f"{name:<8} {float(wall):>8.2f} {float(rss):>12.1f} {float(frame):>9.1f} {int(rows):>10,}")
+    finally:
+        if tmp is not None:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
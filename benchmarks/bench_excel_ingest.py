@@ -0,0 +1,109 @@
+"""Compare the pandas read_excel path with streaming, parallel sheet ingestion.
+
+Both modes load every sheet of the same workbook; each runs in its own
+subprocess so peak RSS is measured in isolation (for the streaming mode, the
+largest of the parent and its sheet workers):
+
+    python benchmarks/bench_excel_ingest.py --rows 200000 --sheets 4
+    python benchmarks/bench_excel_ingest.py --file path/to/workbook.xlsx
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_xlsx(path, rows, sheets, seed=0):
+    from openpyxl import Workbook
+
+    rng = np.random.default_rng(seed)
+    workbook = Workbook(write_only=True)
+    for s in range(sheets):
+        sheet = workbook.create_sheet(f"Sheet{s + 1}")
+        sheet.append(["id", "date", "region", "units", "price", "note"])
+        dates = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")
+        regions = rng.choice(["North", "South", "East", "West"], rows)
+        units = rng.integers(0, 500, rows)
+        prices = rng.choice([9.5, 19.75, 99.0, 4.25], rows)
+        for i in range(rows):
+            sheet.append([i, dates[i].to_pydatetime(), regions[i], int(units[i]), float(prices[i]), f"order-{i}"])
+    workbook.save(path)
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 ** 2) if sys.platform == "darwin" else peak / 1024
+
+
+def pq_rows(path):
+    import pyarrow.parquet as pq
+
+    return pq.ParquetFile(path).metadata.num_rows
+
+
+def worker(mode, path):
+    from core import store
+    from core.ingest import excel_sheet_names, ingest_workbook
+
+    start = time.perf_counter()
+    if mode == "pandas":
+        frames = pd.read_excel(path, sheet_name=None)
+        rows = sum(len(df) for df in frames.values())
+    else:
+        # the store is relative to the working directory, also for the workers
+        path = os.path.abspath(path)
+        os.chdir(tempfile.mkdtemp())
+        ids = ingest_workbook(path, excel_sheet_names(path), "bench")
+        rows = sum(pq_rows(store.dataset_path(i)) for i in ids.values())
+    elapsed = time.perf_counter() - start
+    peak = max(peak_rss_mb(), peak_rss_mb(resource.RUSAGE_CHILDREN))
+    print(f"{mode},{elapsed:.3f},{peak:.1f},{rows}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000, help="rows per sheet")
+    parser.add_argument("--sheets", type=int, default=4)
+    parser.add_argument("--file", help="benchmark an existing .xlsx instead of a synthetic one")
+    parser.add_argument("--worker", choices=["pandas", "streaming"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.file)
+        return
+
+    path = args.file
+    tmp = None
+    if path is None:
+        tmp = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False)
+        tmp.close()
+        path = tmp.name
+        make_xlsx(path, args.rows, args.sheets)
+
+    try:
+        print(f"file: {path} ({os.path.getsize(path) / (1024 ** 2):.1f} MB)")
+        print(f"{'mode':<10} {'wall s':>8} {'peak RSS MB':>12} {'rows':>10}")
+        for mode in ("pandas", "streaming"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--worker", mode, "--file", path],
+                check=True, capture_output=True, text=True,
+            ).stdout.strip().splitlines()[-1]
+            name, wall, rss, rows = out.split(",")
+            print(f"{name:<10} {float(wall):>8.2f} {float(rss):>12.1f} {int(rows):>10,}")
+    finally:
+        if tmp is not None:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Compare json.load + json_normalize with streaming JSON ingestion.
+
+Records are nested (an order with customer and shipping objects and a list of
+items). Each mode runs in its own subprocess so peak RSS is measured in
+isolation; "picked" streams only a few of the flattened columns:
+
+    python benchmarks/bench_json_ingest.py --rows 500000
+    python benchmarks/bench_json_ingest.py --rows 500000 --lines
+    python benchmarks/bench_json_ingest.py --file path/to/big.json
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core.ingest import read_json_records  # noqa: E402
+
+PICKED = ["date", "customer.region", "total"]
+
+
+def make_json(path, rows, lines=False, seed=0):
+    rng = np.random.default_rng(seed)
+    chunk = 100_000
+    with open(path, "w") as f:
+        if not lines:
+            f.write("[\n")
+        for start in range(0, rows, chunk):
+            n = min(chunk, rows - start)
+            dates = (pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D")).strftime("%Y-%m-%d")
+            regions = rng.choice(["North", "South", "East", "West"], n)
+            units = rng.integers(1, 20, n)
+            prices = rng.choice([9.5, 19.75, 99.0, 4.25], n)
+            for i in range(n):
+                record = {
+                    "id": start + i,
+                    "date": dates[i],
+                    "customer": {"id": f"C{(start + i) % 5000:05d}", "region": regions[i],
+                                 "address": {"city": f"City {i % 300}", "zip": f"{i % 99999:05d}"}},
+                    "items": [{"sku": f"P{i % 200:03d}", "units": int(units[i])}],
+                    "total": float(units[i] * prices[i]),
+                    "note": f"order-{start + i}",
+                }
+                separator = "\n" if lines else (",\n" if start + i < rows - 1 else "\n")
+                f.write(json.dumps(record) + separator)
+        if not lines:
+            f.write("]\n")
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 ** 2) if sys.platform == "darwin" else peak / 1024
+
+
+def worker(mode, path):
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        if mode == "eager":
+            first = f.read(1).lstrip()
+            f.seek(0)
+            # the upload page's old path; it only read whole documents
+            data = json.load(f) if first == b"[" else [json.loads(line) for line in f if line.strip()]
+            df = pd.json_normalize(data)
+        else:
+            df = read_json_records(f, columns=PICKED if mode == "picked" else None)
+    elapsed = time.perf_counter() - start
+    frame_mb = df.memory_usage(deep=True).sum() / (1024 ** 2)
+    print(f"{mode},{elapsed:.3f},{peak_rss_mb():.1f},{frame_mb:.1f},{len(df)},{len(df.columns)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--lines", action="store_true", help="write JSON Lines instead of one array")
+    parser.add_argument("--file", help="benchmark an existing JSON file instead of a synthetic one")
+    parser.add_argument("--worker", choices=["eager", "streaming", "picked"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.file)
+        return
+
+    path = args.file
+    tmp = None
+    if path is None:
+        tmp = tempfile.NamedTemporaryFile(suffix=".jsonl" if args.lines else ".json", delete=False)
+        tmp.close()
+        path = tmp.name
+        make_json(path, args.rows, args.lines)
+
+    try:
+        print(f"file: {path} ({os.path.getsize(path) / (1024 ** 2):.1f} MB)")
+        print(f"{'mode':<10} {'wall s':>8} {'peak RSS MB':>12} {'frame MB':>9} {'rows':>10} {'cols':>5}")
+        for mode in ("eager", "streaming", "picked"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--worker", mode, "--file", path],
+                check=True, capture_output=True, text=True,
+            ).stdout.strip().splitlines()[-1]
+            name, wall, rss, frame, rows, cols = out.split(",")
+            print(f"{name:<10} {float(wall):>8.2f} {float(rss):>12.1f} {float(frame):>9.1f} {int(rows):>10,} "
+                  f"{int(cols):>5}")
+    finally:
+        if tmp is not None:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
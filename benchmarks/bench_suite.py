@@ -0,0 +1,280 @@
+"""Headless benchmark of the app's data paths on synthetic datasets.
+
+Runs the stages a page load goes through, outside the browser, on datasets
+from ``synthetic.py``: CSV ingestion, type inference and conversion, the
+Parquet store, loading and indexing the dataset, filtering, the dashboard's
+KPI statistics (sketched and exact) and every chart tab. Query stages repeat
+over a seeded sequence of random filters (whole days, a few categories), so
+each repeat misses the result caches the way a new filter state does.
+
+For each stage it reports latency percentiles, throughput (dataset rows per
+second at the median) and peak memory above the stage's starting point
+(sampled resident memory; needs psutil). Results can be saved as JSON and
+compared against a stored baseline; stages slower or hungrier than the
+baseline by more than ``--tolerance`` (and than its run-to-run spread) are
+flagged and the exit status is 1:
+
+    python benchmarks/bench_suite.py --rows 10k 1m --output baseline.json
+    python benchmarks/bench_suite.py --rows 10k 1m --baseline baseline.json
+
+Generated CSVs are kept in ``--data-dir`` and reused by later runs with the
+same spec. Datasets larger than the in-memory threshold run on the DuckDB
+backend, as in the app (``--backend`` forces one).
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic import add_spec_arguments, cached_csv, parse_count, spec_from_args  # noqa: E402
+
+from core.backend import backend_for  # noqa: E402
+from core.charts import TABS, ChartContext, build  # noqa: E402
+from core.dataset import prepare_frame  # noqa: E402
+from core.downsample import DEFAULT_POINT_BUDGET  # noqa: E402
+from core.duckdb_backend import DuckDBIndex  # noqa: E402
+from core.filters import FilterIndex  # noqa: E402
+from core.ingest import read_csv_chunked  # noqa: E402
+from core.sketches import partition_summary, statistics  # noqa: E402
+from core.store import content_hash, read_dataset, save_dataset  # noqa: E402
+from core.tracing import environment  # noqa: E402
+from core.type_inference import apply_schema, column_groups, infer_schema  # noqa: E402
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+SAMPLE_SECONDS = 0.005
+
+
+class PeakMemory:
+    """Highest resident memory above the starting point while the block runs."""
+
+    def __init__(self):
+        self.peak = None
+
+    def __enter__(self):
+        if psutil is None:
+            return self
+        self._process = psutil.Process()
+        self._start = self._high = self._process.memory_info().rss
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._done.wait(SAMPLE_SECONDS):
+            self._high = max(self._high, self._process.memory_info().rss)
+
+    def __exit__(self, *exc):
+        if psutil is not None:
+            self._done.set()
+            self._thread.join()
+            self._high = max(self._high, self._process.memory_info().rss)
+            self.peak = self._high - self._start
+
+
+class Stage:
+    def __init__(self, rows):
+        self.rows = rows
+        self.seconds = []
+        self.peak = None
+
+    def run(self, fn, *args):
+        with PeakMemory() as memory:
+            start = time.perf_counter()
+            result = fn(*args)
+            self.seconds.append(time.perf_counter() - start)
+        if memory.peak is not None:
+            self.peak = max(self.peak or 0, memory.peak)
+        return result
+
+    def summary(self):
+        p50, p95, p99 = np.percentile(self.seconds, [50, 95, 99])
+        return {"runs": len(self.seconds), "rows": self.rows, "p50": p50, "p95": p95, "p99": p99,
+                "mean": float(np.mean(self.seconds)), "rows_per_second": self.rows / p50 if p50 else None,
+                "peak_bytes": self.peak}
+
+
+def random_filters(index, date_col, cat_col, count, seed):
+    """``count`` reproducible (date, categories) filters: whole-day ranges and,
+    half of the time, one to three categories."""
+    rng = np.random.default_rng(seed)
+    lo, hi = index.date_bounds(date_col) if date_col else (None, None)
+    categories = index.categories(cat_col) if cat_col else []
+    filters = []
+    for _ in range(count):
+        date = None
+        if lo is not None:
+            days = (pd.Timestamp(hi).normalize() - pd.Timestamp(lo).normalize()).days + 1
+            first = int(rng.integers(0, days))
+            length = int(rng.integers(1, days - first + 1))
+            start = pd.Timestamp(lo).normalize() + pd.Timedelta(days=first)
+            date = (date_col, start, start + pd.Timedelta(days=length) - pd.Timedelta(1, "ns"))
+        chosen = None
+        if categories and rng.random() < 0.5:
+            picked = rng.choice(len(categories), min(len(categories), int(rng.integers(1, 4))), replace=False)
+            chosen = (cat_col, [categories[i] for i in picked])
+        filters.append((date, chosen))
+    return filters
+
+
+def kpis(stats, date_cols, num_cols, cat_cols):
+    """What the dashboard reads from its statistics on every run."""
+    stats.column_totals(num_cols)
+    if num_cols:
+        stats.column_range(num_cols[0])
+        stats.quantile(num_cols[0], 0.5)
+    if cat_cols:
+        stats.top_value(cat_cols[0])
+    if date_cols:
+        stats.column_range(date_cols[0])
+
+
+def run_suite(path, backend, repeats, heavy_repeats, seed, tabs):
+    stages = {}
+
+    def stage(name, rows):
+        stages[name] = Stage(rows)
+        return stages[name]
+
+    with open(path, "rb") as f:
+        digest = content_hash(f)
+    ingest = stage("ingest CSV", 0)
+    for _ in range(heavy_repeats):
+        raw = None  # the previous copy would double the footprint of large datasets
+        with open(path, "rb") as f:
+            raw = ingest.run(read_csv_chunked, f)
+    rows = ingest.rows = len(raw)
+    infer, convert, write = stage("type inference", rows), stage("convert types", rows), stage("write Parquet", rows)
+    for _ in range(heavy_repeats):
+        schema = infer.run(infer_schema, raw)
+        convert.run(apply_schema, raw, schema)
+        stored = write.run(save_dataset, raw, digest)
+    del raw
+
+    backend = backend_for(stored) if backend == "auto" else backend
+    load = stage("load dataset", rows) if backend == "pandas" else None
+    indexing, summaries = stage("build index", rows), stage("KPI summaries", rows)
+    for i in range(heavy_repeats):
+        # a fresh dataset id per repeat, so nothing is served from the caches
+        dataset_id = f"{digest}-{i}"
+        df = index = None
+        if backend == "duckdb":
+            index = indexing.run(DuckDBIndex, stored, dataset_id)
+        else:
+            df = load.run(lambda: prepare_frame(read_dataset(stored)))
+            index = indexing.run(FilterIndex, df, dataset_id)
+        date_cols, num_cols, cat_cols = column_groups(index.head())
+        date_col = date_cols[0] if date_cols else None
+        cat_col = cat_cols[0] if cat_cols else None
+        summaries.run(partition_summary, index, date_col, cat_col)
+
+    filters = random_filters(index, date_col, cat_col, repeats, seed)
+    filtering = stage("filter", rows)
+    views = [filtering.run(index.select, date, cats) for date, cats in filters]
+    sketched, exact = stage("KPI statistics (sketch)", rows), stage("KPI statistics (exact)", rows)
+    for view, (date, cats) in zip(views, filters):
+        sketched.run(lambda: kpis(statistics(index, view, date_col, cat_col, date, cats),
+                                  date_cols, num_cols, cat_cols))
+        exact.run(lambda: kpis(statistics(index, view, date_col, cat_col, date, cats, exact=True),
+                               date_cols, num_cols, cat_cols))
+    for tab in tabs:
+        charts = stage(f"chart: {tab}", rows)
+        for view in views:
+            ctx = ChartContext(view, date_cols, num_cols, cat_cols, [], [], "Plotly", "Light", DEFAULT_POINT_BUDGET)
+            charts.run(build, tab, ctx)
+    return backend, {name: s.summary() for name, s in stages.items()}
+
+
+def format_mb(n):
+    return "n/a" if n is None else f"{n / (1024 ** 2):,.1f}"
+
+
+def compare(current, base, tolerance, min_delta):
+    """Text for the comparison of one stage with its baseline, and whether it
+    regressed: slower by more than ``tolerance`` and ``min_delta`` seconds, and
+    beyond the baseline's own p95 (run-to-run noise)."""
+    if base is None:
+        return "new", False
+    ratio = current["p50"] / base["p50"] if base["p50"] else 1.0
+    text = f"{ratio - 1:+.0%} p50"
+    regressed = (ratio > 1 + tolerance and current["p50"] - base["p50"] > min_delta
+                 and current["p50"] > base["p95"])
+    if current["peak_bytes"] is not None and base.get("peak_bytes"):
+        memory = current["peak_bytes"] / base["peak_bytes"]
+        text += f", {memory - 1:+.0%} peak"
+        # small peaks are mostly sampling noise
+        regressed |= memory > 1 + tolerance and current["peak_bytes"] - base["peak_bytes"] > 8 * 1024 ** 2
+    return text + (" REGRESSION" if regressed else ""), regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", nargs="+", default=["10k", "1m"], help="dataset sizes, e.g. 10k 1m 10m 50m")
+    add_spec_arguments(parser)
+    parser.add_argument("--repeats", type=int, default=20, help="random filters per query stage")
+    parser.add_argument("--heavy-repeats", type=int, default=3,
+                        help="runs of the ingest, inference, store, load and index stages")
+    parser.add_argument("--backend", choices=["auto", "pandas", "duckdb"], default="auto")
+    parser.add_argument("--tabs", nargs="*", help="chart tabs to time (default: all)")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "eda-bench"))
+    parser.add_argument("--output", help="save the results as JSON (e.g. as a new baseline)")
+    parser.add_argument("--baseline", help="compare with results saved earlier")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before flagging")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0,
+                        help="slowdowns smaller than this are never flagged")
+    args = parser.parse_args()
+
+    tabs = [tab for tab in TABS if not args.tabs or any(name.lower() in tab.lower() for name in args.tabs)]
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = {(tuple(run["spec"].values()), run["backend"]): run for run in json.load(f)["runs"]}
+    output = os.path.abspath(args.output) if args.output else None
+
+    # the store (and DuckDB's temporary files) live next to the generated data
+    os.makedirs(args.data_dir, exist_ok=True)
+    os.chdir(args.data_dir)
+    runs = []
+    regressions = 0
+    for rows in map(parse_count, args.rows):
+        spec = spec_from_args(args, rows)
+        path = cached_csv(spec, args.data_dir)
+        backend, stages = run_suite(path, args.backend, args.repeats, args.heavy_repeats, args.seed, tabs)
+        runs.append({"spec": spec._asdict(), "backend": backend, "stages": stages})
+        base = baseline.get((tuple(spec), backend), {}).get("stages", {})
+
+        print(f"\n{rows:,} rows x {spec.cols} columns ({os.path.getsize(path) / (1024 ** 2):,.1f} MB CSV), "
+              f"{backend} backend")
+        print(f"{'stage':<34} {'runs':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rows/s':>13} "
+              f"{'peak MB':>8}  {'vs baseline' if baseline else ''}")
+        for name, result in stages.items():
+            text, regressed = compare(result, base.get(name), args.tolerance, args.min_delta_ms / 1000) if baseline else ("", False)
+            regressions += regressed
+            # stages that do (almost) nothing up front, e.g. lazily built indexes
+            throughput = f"{result['rows_per_second']:,.0f}" if result["p50"] > 1e-4 else "-"
+            print(f"{name:<34} {result['runs']:>4} {result['p50'] * 1000:>9.1f} {result['p95'] * 1000:>9.1f} "
+                  f"{result['p99'] * 1000:>9.1f} {throughput:>13} {format_mb(result['peak_bytes']):>8}  {text}")
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "runs": runs}, f, indent=1)
+    if regressions:
+        print(f"\n{regressions} stage(s) regressed by more than {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Reproducible synthetic datasets for the benchmarks.
+
+A dataset is described by a ``Spec``: row count, column count, distinct values
+per categorical column, rows per day in the date column and the share of
+missing cells. Rows are generated in fixed-size chunks, each from its own
+seeded generator, so the same spec always gives the same data and a 50M-row
+CSV is written without holding it in memory:
+
+    python benchmarks/synthetic.py --rows 10m --cardinality 1000 out.csv
+
+Column kinds cycle through numeric (float), categorical, integer and free text
+after a leading ``date`` column; categorical values are skewed (Zipf-like), as
+in real sales or log data.
+"""
+import argparse
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 500_000
+KINDS = ["num", "cat", "int", "text"]
+START = pd.Timestamp("2024-01-01")
+
+Spec = namedtuple("Spec", "rows cols cardinality rows_per_day null_rate seed",
+                  defaults=(8, 50, 10_000, 0.01, 0))
+
+
+def parse_count(text):
+    """``"10k"`` / ``"1.5m"`` / ``"50M"`` / ``"2000"`` as an int."""
+    text = str(text).strip().lower()
+    scale = {"k": 10 ** 3, "m": 10 ** 6}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def column_names(spec):
+    return ["date"] + [f"{KINDS[i % len(KINDS)]}_{i}" for i in range(spec.cols - 1)]
+
+
+def _chunk(spec, index):
+    rng = np.random.default_rng([spec.seed, index])
+    start = index * CHUNK_ROWS
+    n = min(CHUNK_ROWS, spec.rows - start)
+    days = max(1, -(-spec.rows // spec.rows_per_day))
+    seconds = rng.integers(0, days * 86400, n)
+    columns = {"date": (START + pd.to_timedelta(seconds, unit="s")).strftime("%Y-%m-%d %H:%M:%S")}
+    weights = 1.0 / np.arange(1, spec.cardinality + 1) ** 0.8
+    weights /= weights.sum()
+    for name in column_names(spec)[1:]:
+        kind = name.split("_")[0]
+        if kind == "num":
+            values = pd.Series(rng.normal(100, 25, n).round(2))
+        elif kind == "int":
+            values = pd.Series(rng.integers(0, 1000, n), dtype="Int64")
+        elif kind == "cat":
+            values = pd.Series(np.char.add(f"{name}_", rng.choice(spec.cardinality, n, p=weights).astype(str)))
+        else:
+            values = pd.Series(np.char.add("note ", np.arange(start, start + n).astype(str)))
+        if spec.null_rate:
+            values = values.mask(rng.random(n) < spec.null_rate)
+        columns[name] = values
+    return pd.DataFrame(columns)
+
+
+def iter_chunks(spec):
+    """The dataset as ``CHUNK_ROWS``-row DataFrames of raw (CSV-like) values."""
+    for index in range(-(-spec.rows // CHUNK_ROWS)):
+        yield _chunk(spec, index)
+
+
+def make_frame(spec):
+    return pd.concat(iter_chunks(spec), ignore_index=True)
+
+
+def write_csv(spec, path):
+    """Write the dataset to ``path`` chunk by chunk (atomically)."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    for i, chunk in enumerate(iter_chunks(spec)):
+        chunk.to_csv(tmp, mode="a" if i else "w", header=not i, index=False)
+    os.replace(tmp, path)
+    return path
+
+
+def cached_csv(spec, directory):
+    """Path of the CSV for ``spec`` under ``directory``, generated on first use."""
+    name = "synthetic_{}.csv".format("_".join(str(value) for value in spec))
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        write_csv(spec, path)
+    return path
+
+
+def add_spec_arguments(parser):
+    parser.add_argument("--cols", type=int, default=Spec._field_defaults["cols"],
+                        help="columns, including the date column")
+    parser.add_argument("--cardinality", type=int, default=Spec._field_defaults["cardinality"],
+                        help="distinct values per categorical column")
+    parser.add_argument("--rows-per-day", type=int, default=Spec._field_defaults["rows_per_day"],
+                        help="date density: rows per calendar day")
+    parser.add_argument("--null-rate", type=float, default=Spec._field_defaults["null_rate"],
+                        help="share of missing cells per column")
+    parser.add_argument("--seed", type=int, default=Spec._field_defaults["seed"])
+
+
+def spec_from_args(args, rows):
+    return Spec(rows, args.cols, args.cardinality, args.rows_per_day, args.null_rate, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="100k", help="e.g. 10k, 1m, 50m")
+    add_spec_arguments(parser)
+    parser.add_argument("path")
+    args = parser.parse_args()
+    spec = spec_from_args(args, parse_count(args.rows))
+    write_csv(spec, args.path)
+    print(f"wrote {spec.rows:,} rows x {spec.cols} columns to {args.path} "
+          f"({os.path.getsize(args.path) / (1024 ** 2):.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Shared data layer for the EDA app pages (ingestion, storage, caching)."""
@@ -0,0 +1,224 @@
+"""Server-side chart aggregates.
+
+Charts plot these summaries instead of raw rows, so the payload sent to the
+browser grows with the number of categories or bins rather than the number of
+rows. Results are cached per (dataset + filter state, aggregate, columns).
+
+Views with ``pushdown`` set (the out-of-core backend) compute each aggregate
+themselves, through a method of the same name.
+
+After rows are appended to a dataset, an aggregate that can be combined
+(totals, ranges, per-category moments, histograms whose range did not grow)
+is computed over the appended rows only and merged with the parent dataset's
+cached result for the same filter state.
+"""
+import numpy as np
+import pandas as pd
+
+from core.cache import LRUCache
+from core.memory import track
+
+_cache = LRUCache(maxsize=512)
+track("Chart aggregates", _cache.items)
+
+# calendar periods for time bucketing, finest first (DuckDB date_trunc parts)
+PERIODS = ["day", "week", "month", "quarter", "year"]
+_PERIOD_FREQ = {"day": "D", "week": "W-MON", "month": "MS", "quarter": "QS", "year": "YS"}
+
+
+def _cached(view, name, params, compute, merge=None):
+    """``compute(view)``, cached; ``merge(old, delta_view, compute)`` combines the
+    parent dataset's result with the appended rows (None if it cannot)."""
+    if view.pushdown:
+        compute = lambda v: getattr(v, name)(*params)
+
+    def build():
+        delta = view.delta() if merge is not None else None
+        if delta is not None:
+            parent_key, appended = delta
+            old = _cache.get((parent_key, name) + tuple(params))
+            if old is not None:
+                merged = merge(old, appended, compute)
+                if merged is not None:
+                    return merged
+        return compute(view)
+
+    return _cache.get_or_compute((view.key, name) + tuple(params), build)
+
+
+def category_summary(view, cat_col, num_col):
+    """Per-category ``sum``, ``mean``, ``std`` and ``count`` of ``num_col``."""
+    def compute(view):
+        frame = view.frame([cat_col, num_col])
+        grouped = frame.groupby(cat_col, observed=True, sort=True)[num_col]
+        summary = grouped.agg(["sum", "mean", "std", "count"]).reset_index()
+        return summary[summary["count"] > 0].reset_index(drop=True)
+
+    def merge(old, appended, compute):
+        new = compute(appended)
+        a, b = old.set_index(cat_col), new.set_index(cat_col)
+        a.index, b.index = a.index.astype(object), b.index.astype(object)
+        keys = a.index.union(b.index, sort=False)
+        a, b = a.reindex(keys), b.reindex(keys)
+        n_a, n_b = a["count"].fillna(0), b["count"].fillna(0)
+        n = n_a + n_b
+        mean_a, mean_b = a["mean"].fillna(0), b["mean"].fillna(0)
+        mean = (n_a * mean_a + n_b * mean_b) / n
+        # Chan et al.: combine the sums of squared deviations of both parts
+        m2 = ((a["std"] ** 2 * (n_a - 1)).fillna(0) + (b["std"] ** 2 * (n_b - 1)).fillna(0)
+              + (mean_b - mean_a) ** 2 * n_a * n_b / n)
+        merged = pd.DataFrame({
+            "sum": a["sum"].fillna(0) + b["sum"].fillna(0),
+            "mean": mean,
+            "std": np.sqrt(m2 / (n - 1)).where(n > 1),
+            "count": n.astype(old["count"].dtype),
+        })
+        if isinstance(new[cat_col].dtype, pd.CategoricalDtype):
+            # sort in category order, like the groupby
+            merged.index = pd.CategoricalIndex(merged.index, dtype=new[cat_col].dtype)
+        merged.index.name = cat_col
+        return merged.sort_index().reset_index()
+
+    return _cached(view, "category_summary", (cat_col, num_col), compute, merge)
+
+
+def box_summary(view, cat_col, num_col):
+    """Per-category quartiles and Tukey whiskers (furthest points within 1.5 IQR)."""
+    def compute(view):
+        frame = view.frame([cat_col, num_col]).dropna()
+        grouped = frame.groupby(cat_col, observed=True, sort=True)[num_col]
+        stats = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+        stats.columns = ["q1", "median", "q3"]
+        iqr = stats["q3"] - stats["q1"]
+
+        # per-row fence thresholds, then the extreme values inside them
+        keys = frame[cat_col]
+        low = keys.map(stats["q1"] - 1.5 * iqr).astype(float)
+        high = keys.map(stats["q3"] + 1.5 * iqr).astype(float)
+        values = frame[num_col]
+        stats["lowerfence"] = values.where(values >= low).groupby(keys, observed=True).min()
+        stats["upperfence"] = values.where(values <= high).groupby(keys, observed=True).max()
+        stats["count"] = grouped.count()
+        return stats.dropna(subset=["median"]).reset_index()
+
+    return _cached(view, "box_summary", (cat_col, num_col), compute)
+
+
+def _bin_counts(view, num_col, edges):
+    if view.pushdown:
+        return view.bin_counts(num_col, edges)
+    values = view.column(num_col).dropna().to_numpy(dtype=float)
+    return np.histogram(values, bins=edges)[0]
+
+
+def histogram(view, num_col, bins=20):
+    """Bin counts and edges of ``num_col`` over the non-null values."""
+    def compute(view):
+        values = view.column(num_col).dropna().to_numpy(dtype=float)
+        if not len(values):
+            return np.zeros(bins, dtype=int), np.linspace(0, 1, bins + 1)
+        return np.histogram(values, bins=bins)
+
+    def merge(old, appended, compute):
+        counts, edges = old
+        lo, hi = column_range(appended, num_col)
+        if pd.isna(lo):
+            return old
+        # the edges only stay the same when the appended values fit inside them
+        if not counts.sum() or lo < edges[0] or hi > edges[-1]:
+            return None
+        return counts + _bin_counts(appended, num_col, edges), edges
+
+    return _cached(view, "histogram", (num_col, bins), compute, merge)
+
+
+def column_totals(view, columns):
+    """Sum of each of ``columns`` as a Series."""
+    return _cached(view, "column_totals", (tuple(columns),),
+                   lambda view: view.frame(columns).sum(),
+                   lambda old, appended, compute: old + compute(appended))
+
+
+def column_range(view, col):
+    """``(min, max)`` of ``col``; both NaN/NaT when it has no values."""
+    def compute(view):
+        values = view.column(col)
+        return values.min(), values.max()
+
+    def merge(old, appended, compute):
+        new = compute(appended)
+        return (pd.Series([old[0], new[0]]).min(), pd.Series([old[1], new[1]]).max())
+
+    return _cached(view, "column_range", (col,), compute, merge)
+
+
+def quantile(view, col, q):
+    """The ``q`` quantile of ``col`` (linear interpolation), NaN when it has no values."""
+    return _cached(view, "quantile", (col, q), lambda view: view.column(col).quantile(q))
+
+
+def top_value(view, col):
+    """Most frequent value of ``col``, or None when it has no values."""
+    def compute(view):
+        counts = view.column(col).value_counts()
+        return counts.idxmax() if len(counts) else None
+
+    return _cached(view, "top_value", (col,), compute)
+
+
+def period_start(values, period):
+    """Start of the ``period`` containing each datetime (weeks start on Monday)."""
+    values = np.asarray(values, dtype="datetime64[ns]")
+    if period == "day":
+        starts = values.astype("datetime64[D]")
+    elif period == "week":
+        days = values.astype("datetime64[D]")
+        # 1970-01-01 was a Thursday
+        starts = days - ((days.astype("int64") + 3) % 7).astype("timedelta64[D]")
+    elif period == "month":
+        starts = values.astype("datetime64[M]")
+    elif period == "quarter":
+        months = values.astype("datetime64[M]").astype("int64")
+        starts = (months - months % 3).astype("datetime64[M]")
+    elif period == "year":
+        starts = values.astype("datetime64[Y]")
+    else:
+        raise ValueError(f"Unknown period: {period}")
+    return np.where(np.isnat(values), np.datetime64("NaT"), starts.astype("datetime64[ns]"))
+
+
+def period_starts(lo, hi, period):
+    """Every ``period`` start from the one containing ``lo`` to the one containing ``hi``."""
+    first, last = period_start([lo, hi], period)
+    return pd.date_range(first, last, freq=_PERIOD_FREQ[period])
+
+
+def period_totals(view, date_col, cat_col, num_col, period):
+    """Sum of ``num_col`` per (``period`` start of ``date_col``, ``cat_col``), in
+    time then category order; rows without a date or category are left out."""
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period: {period}")
+
+    def compute(view):
+        frame = view.frame([date_col, cat_col, num_col])
+        starts = pd.Series(period_start(frame[date_col], period), index=frame.index, name=date_col)
+        totals = frame[num_col].groupby([starts, frame[cat_col]], observed=True, sort=True).sum()
+        return totals.reset_index()
+
+    def merge(old, appended, compute):
+        new = compute(appended)
+        if isinstance(new[cat_col].dtype, pd.CategoricalDtype):
+            # the appended version's categories extend the parent's
+            old = old.assign(**{cat_col: pd.Categorical(old[cat_col].astype(object), dtype=new[cat_col].dtype)})
+        both = pd.concat([old, new], ignore_index=True)
+        return both.groupby([date_col, cat_col], observed=True, sort=True)[num_col].sum().reset_index()
+
+    return _cached(view, "period_totals", (date_col, cat_col, num_col, period), compute, merge)
+
+
+def bin_centers(edges):
+    return (edges[:-1] + edges[1:]) / 2
+
+
+def clear():
+    _cache.clear()
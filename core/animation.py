@@ -0,0 +1,77 @@
+"""Frame budgeting for the animated bar chart.
+
+Animating raw rows gives one frame per distinct timestamp, each carrying its
+rows, so second-resolution data means tens of thousands of frames. Instead,
+time is bucketed into calendar periods: the finest of day, week or month that
+keeps the frame count within ``FRAME_BUDGET`` (quarters or years for very long
+ranges), and each frame is one bar per category with the period's total,
+aggregated server-side (``core.aggregate.period_totals``). Only the
+``MAX_BARS`` largest categories get their own bar; the rest are summed into
+one. When a finer resolution is chosen explicitly, the frames are split into
+pages of ``FRAME_BUDGET`` and the page loads the next page in the background
+while the current one plays.
+"""
+from collections import namedtuple
+
+import pandas as pd
+
+from core.aggregate import PERIODS, column_range, period_starts, period_totals
+
+FRAME_BUDGET = 60
+MAX_BARS = 15
+# what the period selector offers; coarser periods are only picked automatically
+RESOLUTIONS = ["auto", "day", "week", "month"]
+
+FramePlan = namedtuple("FramePlan", "period frames pages")
+
+_LABELS = {"day": "%Y-%m-%d", "week": "Week of %Y-%m-%d", "month": "%b %Y", "year": "%Y"}
+
+
+def choose_resolution(lo, hi, budget=FRAME_BUDGET):
+    """The finest period with at most ``budget`` frames between ``lo`` and ``hi``."""
+    for period in PERIODS:
+        if len(period_starts(lo, hi, period)) <= budget:
+            return period
+    return PERIODS[-1]
+
+
+def frame_plan(view, date_col, resolution="auto", budget=FRAME_BUDGET):
+    """The period, frame count and page count for animating ``view`` over
+    ``date_col``; None when it has no dates."""
+    lo, hi = column_range(view, date_col)
+    if pd.isna(lo):
+        return None
+    period = choose_resolution(lo, hi, budget) if resolution == "auto" else resolution
+    frames = len(period_starts(lo, hi, period))
+    return FramePlan(period, frames, -(-frames // budget))
+
+
+def frame_label(start, period):
+    if period == "quarter":
+        return f"{start.year} Q{start.quarter}"
+    return start.strftime(_LABELS[period])
+
+
+def animation_frames(view, date_col, cat_col, num_col, plan, page=0, budget=FRAME_BUDGET, max_bars=MAX_BARS):
+    """Bar totals for page ``page`` of ``plan``: one row per (frame, bar), every
+    bar in every frame (zero when the period has no rows), with a frame label
+    column named ``date_col``."""
+    totals = period_totals(view, date_col, cat_col, num_col, plan.period)
+    lo, hi = column_range(view, date_col)
+    starts = period_starts(lo, hi, plan.period)[page * budget:(page + 1) * budget]
+
+    # bars are chosen over the whole range, so every page shows the same ones
+    overall = totals.groupby(cat_col, observed=True)[num_col].sum().abs().sort_values(ascending=False, kind="stable")
+    bars = overall.index[:max_bars].astype(object).tolist()
+    names = totals[cat_col].astype(object)
+    if len(overall) > max_bars:
+        other = f"Other ({len(overall) - max_bars:,} more)"
+        names = names.where(names.isin(bars), other)
+        bars.append(other)
+
+    shown = totals[totals[date_col].isin(starts)]
+    summed = shown[num_col].groupby([shown[date_col], names[shown.index].rename(cat_col)], sort=False).sum()
+    grid = pd.MultiIndex.from_product([starts, bars], names=[date_col, cat_col])
+    table = summed.reindex(grid, fill_value=0).reset_index()
+    table[date_col] = [frame_label(start, plan.period) for start in table[date_col]]
+    return table
@@ -0,0 +1,139 @@
+"""Appending new rows to a stored dataset.
+
+Datasets are stored by content hash, so appending rows makes a new version
+with its own id; the parent stays as it was (saved dashboards and shared links
+keep pointing at the data they were made with). Only the new rows are parsed:
+
+* their columns are checked against the dataset's (same names, compatible
+  types) before anything is written;
+* the new version's Parquet file is the parent's row groups followed by the
+  new rows (``core.store.append_dataset``);
+* if the parent is loaded in this process, its prepared frame, filter indexes,
+  correlation statistics and partition summaries are extended with the new
+  rows and handed to the new version, and cached aggregates are extended on
+  first use (see ``core.aggregate``). Nothing is recomputed over the old rows.
+
+A CSV that grows by appending lines (a daily log) can simply be uploaded again:
+when its first bytes are exactly the file the dataset was read from, only the
+bytes after them are parsed (``new_rows_offset``).
+"""
+import hashlib
+import os
+
+import pandas as pd
+
+from core import duckdb_backend
+from core.correlation import extend_engines
+from core.dataset import extend_frame, make_unique_columns
+from core.filters import extend_index
+from core.registry import registry
+from core.sketches import extend_summaries
+from core.store import (append_dataset, content_hash, dataset_metadata, dataset_path,
+                        dataset_rows, read_columns, read_head)
+from core.tracing import traced
+from core.type_inference import (BOOLEAN, DATETIME, NUMERIC, SAMPLE_SIZE, TEXT, apply_schema,
+                                 infer_column, infer_schema)
+
+# metadata key: how many bytes of the source CSV the dataset was read from
+SOURCE_BYTES = "source_bytes"
+
+
+def _kind(series):
+    if pd.api.types.is_bool_dtype(series):
+        return BOOLEAN
+    if pd.api.types.is_numeric_dtype(series):
+        return NUMERIC
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return DATETIME
+    return TEXT
+
+
+def check_schema(dataset, new_rows):
+    """Raise ``ValueError`` unless the prepared ``new_rows`` have the prepared
+    ``dataset``'s columns with compatible types (columns with no values in
+    either fit anything)."""
+    missing = [col for col in dataset.columns if col not in new_rows.columns]
+    extra = [col for col in new_rows.columns if col not in dataset.columns]
+    problems = []
+    if missing:
+        problems.append(f"missing columns {missing}")
+    if extra:
+        problems.append(f"unexpected columns {extra}")
+    for col in dataset.columns.intersection(new_rows.columns):
+        old, new = dataset[col], new_rows[col]
+        if old.notna().any() and new.notna().any() and _kind(old) != _kind(new):
+            problems.append(f"'{col}' is {_kind(new)}, expected {_kind(old)}")
+    if problems:
+        raise ValueError("The new rows do not match the dataset: " + "; ".join(problems))
+
+
+def appended_id(dataset_id, digest):
+    """Id of the version of ``dataset_id`` with the rows of content hash ``digest``."""
+    return hashlib.blake2b(f"{dataset_id}+{digest}".encode(), digest_size=16).hexdigest()
+
+
+def new_rows_offset(file, dataset_id):
+    """Byte offset where new lines start if the CSV ``file`` begins with exactly
+    the bytes ``dataset_id`` was read from; None otherwise.
+
+    Raises ``ValueError`` if it does but the new bytes do not start a new line
+    (the old last row was extended), as neither reading only the new bytes nor
+    reading the whole file again would give the right rows.
+    """
+    metadata = dataset_metadata(dataset_path(dataset_id))
+    if SOURCE_BYTES not in metadata:
+        return None
+    size = int(metadata[SOURCE_BYTES])
+    file.seek(0, os.SEEK_END)
+    total = file.tell()
+    file.seek(size - 1)
+    # the last old byte and the ones after it
+    boundary = file.read(3)
+    if total <= size or content_hash(file, limit=size) != dataset_id:
+        file.seek(0)
+        return None
+    if boundary[:1] == b"\n":
+        return size
+    # a file saved without a final newline gets one before the new lines
+    for newline in (b"\n", b"\r\n"):
+        if boundary[1:].startswith(newline):
+            return size + len(newline)
+    file.seek(0)
+    raise ValueError("The file starts with the dataset's rows, but its last row was changed "
+                     "instead of new lines being added after it; upload it as a new dataset.")
+
+
+@traced("Append rows")
+def append_rows(dataset_id, new_rows, new_id, metadata=None):
+    """Store ``new_rows`` (raw, as parsed from the upload) appended to dataset
+    ``dataset_id`` as dataset ``new_id`` and return ``new_id``.
+
+    Raises ``ValueError`` if their columns do not match the dataset's.
+    """
+    path = dataset_path(dataset_id)
+    new_rows.columns = make_unique_columns(new_rows.columns)
+    raw = read_head(path, SAMPLE_SIZE)
+    # the dataset's own inferred types (cached when it was loaded), so the new
+    # rows are parsed the same way, e.g. day-first dates stay day-first; values
+    # that do not parse leave the column as text and fail the check
+    schema = infer_schema(raw, dataset_id)
+    prepared = apply_schema(new_rows, {col: schema[col] if col in schema else infer_column(new_rows[col])
+                                       for col in new_rows.columns})
+    loaded = registry.peek(dataset_id)
+    check_schema(loaded if loaded is not None else apply_schema(raw, schema), prepared)
+
+    parent_rows = dataset_rows(path)
+    new_path = dataset_path(new_id)
+    if not os.path.exists(new_path):
+        append_dataset(path, new_rows[read_columns(path)], new_id, metadata)
+
+    if loaded is not None and registry.peek(new_id) is None:
+        df = registry.put(new_id, extend_frame(loaded, prepared[list(loaded.columns)]))
+        # the parent's frame is superseded; sessions still on it reload it from disk
+        registry.discard(dataset_id)
+        extend_index(dataset_id, new_id, df)
+        extend_engines(dataset_id, new_id, df, parent_rows)
+        extend_summaries(dataset_id, new_id, df, parent_rows)
+    if duckdb_backend.duckdb is not None:
+        duckdb_backend.extend_index(dataset_id, new_id, new_path, parent_rows)
+    return new_id
@@ -0,0 +1,39 @@
+"""Choosing where a dataset's queries run.
+
+Datasets whose stored Parquet file fits comfortably in memory are loaded once
+into the shared in-memory frame (``core.dataset``) and filtered through a
+``FilterIndex``. Larger files are queried in place by DuckDB
+(``core.duckdb_backend``), which never loads the whole file. Both return an
+index with the same ``head`` / ``date_bounds`` / ``categories`` / ``select``
+surface, so the pages do not depend on the backend.
+
+``EDA_BACKEND`` forces ``pandas`` or ``duckdb``; the default ``auto`` switches
+to DuckDB above ``EDA_OUT_OF_CORE_BYTES`` of Parquet on disk (Parquet typically
+expands several times when loaded).
+"""
+import os
+
+from core import duckdb_backend
+from core.dataset import load_dataset
+from core.filters import filter_index
+from core.tracing import span
+
+BACKEND = os.environ.get("EDA_BACKEND", "auto")
+OUT_OF_CORE_BYTES = int(os.environ.get("EDA_OUT_OF_CORE_BYTES", 1024 ** 3))
+
+
+def backend_for(path):
+    if duckdb_backend.duckdb is None or BACKEND == "pandas":
+        return "pandas"
+    if BACKEND == "duckdb" or os.path.getsize(path) > OUT_OF_CORE_BYTES:
+        return "duckdb"
+    return "pandas"
+
+
+def open_dataset(dataset_id, path):
+    """Return the filter index for a stored dataset on the chosen backend."""
+    backend = backend_for(path)
+    with span("Open dataset", backend=backend):
+        if backend == "duckdb":
+            return duckdb_backend.duckdb_index(dataset_id, path)
+        return filter_index(dataset_id, load_dataset(dataset_id, path))
@@ -0,0 +1,56 @@
+"""Small thread-safe LRU cache for derived results (aggregates, figures)."""
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """``maxsize`` caps the number of entries; with a ``sizeof`` function,
+    ``max_bytes`` also caps their combined size (the newest entry always stays)."""
+
+    def __init__(self, maxsize=256, max_bytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+        # computed outside the lock; a concurrent miss just computes twice
+        return self.put(key, compute())
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        size = self.sizeof(value) if self.sizeof is not None else 0
+        with self._lock:
+            self._data[key] = value
+            self._sizes[key] = size
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize or (
+                    self.max_bytes is not None and len(self._data) > 1 and sum(self._sizes.values()) > self.max_bytes):
+                evicted, _ = self._data.popitem(last=False)
+                del self._sizes[evicted]
+        return value
+
+    def items(self):
+        """Snapshot of ``(key, value)`` pairs, least recently used first."""
+        with self._lock:
+            return list(self._data.items())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+
+    def __len__(self):
+        return len(self._data)
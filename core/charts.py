@@ -0,0 +1,368 @@
+"""Chart builders for the Smart Auto-Dashboard.
+
+Each builder takes a ``ChartContext`` (the filtered view plus the visualization
+settings) and returns a list of render items ``(kind, payload)``; the page only
+calls the builder for the tab being shown, and ``build`` caches the items per
+(filter state, tab, settings) so switching back to a tab costs nothing.
+
+Matplotlib charts are drawn on standalone ``Figure`` objects with an Agg
+canvas rather than through ``pyplot``, and ``build`` renders them to PNG, so
+builders can run on worker threads (``prefetch``) and the cache holds bytes
+instead of live figures.
+"""
+import inspect
+import io
+from collections import namedtuple
+
+import altair as alt
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import seaborn as sns
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from core.aggregate import bin_centers, box_summary, category_summary, histogram
+from core.animation import MAX_BARS, animation_frames, frame_plan
+from core import scheduler
+from core.cache import LRUCache
+from core.correlation import correlation as correlation_matrix, top_pairs
+from core.downsample import bin2d, downsample_line, downsample_points
+from core.memory import track
+from core.tracing import span
+
+ChartContext = namedtuple("ChartContext", [
+    "view", "date_cols", "num_cols", "cat_cols", "lat_cols", "lon_cols",
+    "viz_lib", "theme", "point_budget",
+])
+
+# correlation matrices wider than this are drawn without per-cell labels
+ANNOTATE_LIMIT = 20
+
+_figures = LRUCache(maxsize=64)
+track("Dashboard figures", _figures.items)
+
+
+def _template(ctx):
+    return "plotly_dark" if ctx.theme == "Dark" else "plotly_white"
+
+
+def _subplots():
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    return fig, fig.subplots()
+
+
+def _png(fig):
+    # same output options as st.pyplot
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight", dpi=200)
+    return buffer.getvalue()
+
+
+def _zoomed(view, col, zoom):
+    return view if zoom is None else view.within(col, *zoom)
+
+
+def _lod_caption(plotted, total, strategy):
+    if len(plotted) < total:
+        return [("caption", f"Showing {len(plotted):,} of {total:,} points ({strategy}). "
+                            "Zoom into a narrower range for full resolution.")]
+    return []
+
+
+def donut(ctx):
+    cat_cols, num_cols = ctx.cat_cols, ctx.num_cols
+    if not (cat_cols and num_cols):
+        return [("info", "Not enough data for donut chart.")]
+    summary = category_summary(ctx.view, cat_cols[0], num_cols[0])
+    if ctx.viz_lib == "Plotly":
+        fig = px.pie(summary, names=cat_cols[0], values="sum", hole=0.4, template=_template(ctx))
+        return [("plotly", fig)]
+    if ctx.viz_lib == "Altair":
+        chart = alt.Chart(summary).mark_arc(innerRadius=50).encode(
+            theta=alt.Theta(field="sum", type="quantitative", title=num_cols[0]),
+            color=alt.Color(field=cat_cols[0], type="nominal")
+        )
+        return [("altair", chart)]
+    return [("warning", "Donut available only in Plotly / Altair.")]
+
+
+def bar(ctx):
+    cat_cols, num_cols = ctx.cat_cols, ctx.num_cols
+    if not (cat_cols and num_cols):
+        return [("info", "Not enough data for bar chart.")]
+    summary = category_summary(ctx.view, cat_cols[0], num_cols[0])
+    if ctx.viz_lib == "Plotly":
+        fig = px.bar(summary, x=cat_cols[0], y="sum", color=cat_cols[0], labels={"sum": num_cols[0]},
+                     template=_template(ctx))
+        return [("plotly", fig)]
+    if ctx.viz_lib == "Matplotlib":
+        fig, ax = _subplots()
+        summary.set_index(cat_cols[0])["mean"].plot(kind="bar", ax=ax,
+            color="green" if ctx.theme == "Light" else "white")
+        ax.set_ylabel(num_cols[0])
+        return [("pyplot", fig)]
+    if ctx.viz_lib == "Seaborn":
+        fig, ax = _subplots()
+        sns.barplot(x=cat_cols[0], y="mean", data=summary, ax=ax)
+        # 95% interval of the mean from the aggregated std and count
+        ax.errorbar(range(len(summary)), summary["mean"],
+                    yerr=1.96 * summary["std"].fillna(0) / np.sqrt(summary["count"]),
+                    fmt="none", ecolor="black")
+        ax.set_ylabel(num_cols[0])
+        return [("pyplot", fig)]
+    chart = alt.Chart(summary).mark_bar().encode(
+        x=cat_cols[0], y=alt.Y("sum", title=num_cols[0]), color=cat_cols[0])
+    return [("altair", chart)]
+
+
+def box(ctx):
+    cat_cols, num_cols = ctx.cat_cols, ctx.num_cols
+    if not (cat_cols and num_cols):
+        return [("info", "Not enough data for boxplot.")]
+    stats = box_summary(ctx.view, cat_cols[0], num_cols[0])
+    if ctx.viz_lib == "Plotly":
+        fig = go.Figure([
+            go.Box(name=str(row[cat_cols[0]]), q1=[row["q1"]], median=[row["median"]], q3=[row["q3"]],
+                   lowerfence=[row["lowerfence"]], upperfence=[row["upperfence"]])
+            for _, row in stats.iterrows()
+        ])
+        fig.update_layout(template=_template(ctx), xaxis_title=cat_cols[0], yaxis_title=num_cols[0])
+        return [("plotly", fig)]
+    if ctx.viz_lib in ("Seaborn", "Matplotlib"):
+        fig, ax = _subplots()
+        box_stats = [
+            {"label": str(row[cat_cols[0]]), "q1": row["q1"], "med": row["median"], "q3": row["q3"],
+             "whislo": row["lowerfence"], "whishi": row["upperfence"], "fliers": []}
+            for _, row in stats.iterrows()
+        ]
+        boxes = ax.bxp(box_stats, showfliers=False, patch_artist=ctx.viz_lib == "Seaborn")
+        if ctx.viz_lib == "Seaborn":
+            for patch, color in zip(boxes["boxes"], sns.color_palette(n_colors=len(box_stats))):
+                patch.set_facecolor(color)
+        ax.set_xlabel(cat_cols[0])
+        ax.set_ylabel(num_cols[0])
+        return [("pyplot", fig)]
+    return []
+
+
+def histogram_chart(ctx):
+    num_cols = ctx.num_cols
+    if not num_cols:
+        return [("info", "No numeric columns for histogram.")]
+    counts, edges = histogram(ctx.view, num_cols[0], bins=20)
+    centers = bin_centers(edges)
+    if ctx.viz_lib == "Plotly":
+        fig = px.bar(x=centers, y=counts, labels={"x": num_cols[0], "y": "count"}, template=_template(ctx))
+        fig.update_traces(width=np.diff(edges))
+        fig.update_layout(bargap=0)
+        return [("plotly", fig)]
+    if ctx.viz_lib == "Seaborn":
+        fig, ax = _subplots()
+        sns.histplot(x=centers, weights=counts, bins=len(counts), binrange=(edges[0], edges[-1]), kde=True, ax=ax)
+        ax.set_xlabel(num_cols[0])
+        return [("pyplot", fig)]
+    if ctx.viz_lib == "Matplotlib":
+        fig, ax = _subplots()
+        ax.hist(centers, bins=edges, weights=counts, color="skyblue")
+        return [("pyplot", fig)]
+    return []
+
+
+def correlation(ctx, mode="heatmap", top_k=20):
+    num_cols = ctx.num_cols
+    if not num_cols:
+        return [("info", "Not enough numeric data for correlation heatmap.")]
+    corr = correlation_matrix(ctx.view, num_cols)
+    if mode == "pairs":
+        pairs = top_pairs(corr, top_k)
+        pairs.insert(0, "pair", pairs["column_a"].astype(str) + " × " + pairs["column_b"].astype(str))
+        items = []
+        if ctx.viz_lib == "Plotly":
+            fig = px.bar(pairs[::-1], x="r", y="pair", orientation="h", color="r", range_color=[-1, 1],
+                         color_continuous_scale="RdBu_r", template=_template(ctx))
+            items.append(("plotly", fig))
+        elif ctx.viz_lib in ("Seaborn", "Matplotlib"):
+            fig, ax = _subplots()
+            ax.barh(pairs["pair"][::-1], pairs["r"][::-1], color=sns.color_palette("coolwarm", len(pairs)))
+            ax.set_xlim(-1, 1)
+            items.append(("pyplot", fig))
+        return items + [("dataframe", pairs.drop(columns="pair"))]
+
+    # per-cell labels stop being readable (and cost a lot to render) on wide data
+    annotate = len(num_cols) <= ANNOTATE_LIMIT
+    if ctx.viz_lib == "Plotly":
+        fig = px.imshow(corr, text_auto=".2f" if annotate else False, zmin=-1, zmax=1,
+                        color_continuous_scale="RdBu_r", template=_template(ctx))
+        return [("plotly", fig)]
+    if ctx.viz_lib == "Seaborn":
+        fig, ax = _subplots()
+        sns.heatmap(corr, annot=annotate, cmap="coolwarm", ax=ax)
+        return [("pyplot", fig)]
+    return [("info", "Correlation supported only in Plotly/Seaborn")]
+
+
+def scatter(ctx, zoom=None, as_bins=False):
+    num_cols, cat_cols = ctx.num_cols, ctx.cat_cols
+    if len(num_cols) < 2:
+        return [("info", "Need at least 2 numeric columns for scatter plot.")]
+    color_col = cat_cols[0] if cat_cols else None
+    view = _zoomed(ctx.view, num_cols[0], zoom)
+    frame = view.frame(num_cols[:2] + cat_cols[:1])
+    if as_bins and ctx.viz_lib == "Plotly":
+        counts, x_edges, y_edges = bin2d(frame, num_cols[0], num_cols[1])
+        fig = go.Figure(go.Heatmap(x=bin_centers(x_edges), y=bin_centers(y_edges), z=counts.T,
+                                   colorscale="Viridis"))
+        fig.update_layout(template=_template(ctx), xaxis_title=num_cols[0], yaxis_title=num_cols[1])
+        return [("plotly", fig)]
+
+    plot_df = downsample_points(frame, num_cols[0], num_cols[1], ctx.point_budget)
+    items = _lod_caption(plot_df, len(view), "density-preserving sample")
+    if ctx.viz_lib == "Plotly":
+        fig = px.scatter(plot_df, x=num_cols[0], y=num_cols[1], color=color_col, template=_template(ctx))
+        return items + [("plotly", fig)]
+    if ctx.viz_lib == "Seaborn":
+        fig, ax = _subplots()
+        sns.scatterplot(x=num_cols[0], y=num_cols[1], hue=color_col, data=plot_df, ax=ax)
+        return items + [("pyplot", fig)]
+    if ctx.viz_lib == "Matplotlib":
+        fig, ax = _subplots()
+        ax.scatter(plot_df[num_cols[0]], plot_df[num_cols[1]], c="blue")
+        return items + [("pyplot", fig)]
+    return []
+
+
+def line(ctx, zoom=None):
+    date_cols, num_cols, cat_cols = ctx.date_cols, ctx.num_cols, ctx.cat_cols
+    if not (date_cols and num_cols):
+        return [("info", "Need date and numeric column for line chart.")]
+    color_col = cat_cols[0] if cat_cols else None
+    view = _zoomed(ctx.view, date_cols[0], zoom)
+    frame = view.frame(date_cols[:1] + num_cols[:1] + cat_cols[:1])
+    plot_df = downsample_line(frame, date_cols[0], num_cols[0], ctx.point_budget, group=color_col)
+    items = _lod_caption(plot_df, len(view), "LTTB per series")
+    if color_col is not None:
+        shown, series = plot_df[color_col].nunique(), frame[color_col].nunique()
+        if shown < series:
+            items.append(("caption", f"Drawing the {shown:,} largest of {series:,} {color_col} series."))
+    if ctx.viz_lib == "Plotly":
+        fig = px.line(plot_df, x=date_cols[0], y=num_cols[0], color=color_col, template=_template(ctx))
+        return items + [("plotly", fig)]
+    if ctx.viz_lib == "Seaborn":
+        fig, ax = _subplots()
+        sns.lineplot(x=date_cols[0], y=num_cols[0], hue=color_col, data=plot_df, ax=ax)
+        return items + [("pyplot", fig)]
+    if ctx.viz_lib == "Matplotlib":
+        fig, ax = _subplots()
+        ax.plot(plot_df[date_cols[0]], plot_df[num_cols[0]])
+        return items + [("pyplot", fig)]
+    return []
+
+
+def animated(ctx, resolution="auto", page=0):
+    date_cols, num_cols, cat_cols = ctx.date_cols, ctx.num_cols, ctx.cat_cols
+    if not (date_cols and num_cols and cat_cols):
+        return [("info", "Not enough data for animated plot.")]
+    date_col, num_col, cat_col = date_cols[0], num_cols[0], cat_cols[0]
+    plan = frame_plan(ctx.view, date_col, resolution)
+    if plan is None:
+        return [("info", "Not enough data for animated plot.")]
+    page = min(page, plan.pages - 1)
+    table = animation_frames(ctx.view, date_col, cat_col, num_col, plan, page)
+    bars = table[cat_col].unique().tolist()
+    lo, hi = min(table[num_col].min(), 0), max(table[num_col].max(), 0)
+    pad = (hi - lo) * 0.05 or 1
+    # fixed axes and bar order, so frames only move the bars
+    fig = px.bar(table, x=cat_col, y=num_col, color=cat_col, animation_frame=date_col,
+                 category_orders={cat_col: bars}, range_y=[lo - pad, hi + pad], template=_template(ctx))
+    fig.update_layout(showlegend=False)
+    paging = f" (page {page + 1} of {plan.pages})" if plan.pages > 1 else ""
+    caption = f"{plan.frames:,} frames, one per {plan.period}{paging}; total {num_col} per {cat_col}"
+    if len(bars) > MAX_BARS:
+        caption += f", top {MAX_BARS} categories shown"
+    return [("caption", caption + "."), ("plotly", fig)]
+
+
+def map_chart(ctx):
+    lat_cols, lon_cols, num_cols, cat_cols = ctx.lat_cols, ctx.lon_cols, ctx.num_cols, ctx.cat_cols
+    if not (lat_cols and lon_cols):
+        return [("info", "No latitude/longitude columns found for map visualization.")]
+    frame = ctx.view.frame(lat_cols[:1] + lon_cols[:1] + cat_cols[:1] + num_cols[:1])
+    plot_df = downsample_points(frame, lon_cols[0], lat_cols[0], ctx.point_budget)
+    fig = px.scatter_mapbox(plot_df, lat=lat_cols[0], lon=lon_cols[0],
+                            color=cat_cols[0] if cat_cols else None,
+                            size=num_cols[0] if num_cols else None, mapbox_style="open-street-map",
+                            template=_template(ctx))
+    return _lod_caption(plot_df, len(ctx.view), "density-preserving sample") + [("plotly", fig)]
+
+
+TABS = {
+    "🍩 Donut Chart": donut,
+    "📊 Bar Chart": bar,
+    "📦 Box Plot": box,
+    "📈 Histogram": histogram_chart,
+    "🔗 Correlation Heatmap": correlation,
+    "⚪ Scatter Plot": scatter,
+    "📉 Line Chart": line,
+    "🎥 Animated Plot": animated,
+    "🌍 Map Visualization": map_chart,
+}
+# tabs drawn from small per-category or per-bin summaries; only these are worth
+# building before they are opened (point charts read samples of the rows)
+PREFETCH_TABS = ["🍩 Donut Chart", "📊 Bar Chart", "📦 Box Plot", "📈 Histogram"]
+
+
+def _key(tab, ctx, params):
+    # defaults are filled in so build(tab, ctx) and build(tab, ctx, zoom=None) share a key
+    bound = inspect.signature(TABS[tab]).bind(ctx, **params)
+    bound.apply_defaults()
+    args = tuple(sorted((name, value) for name, value in bound.arguments.items() if name != "ctx"))
+    return (ctx.view.cache_key, tab, ctx.viz_lib, ctx.theme, ctx.point_budget, args)
+
+
+def _render(tab, ctx, params):
+    items = TABS[tab](ctx, **params)
+    return [("image", _png(payload)) if kind == "pyplot" else (kind, payload) for kind, payload in items]
+
+
+def build(tab, ctx, **params):
+    """Run the builder for ``tab`` (or reuse its cached items) and return the
+    items; recorded as a ``core.tracing`` span that notes whether the items
+    were cached (including waiting for a running prefetch)."""
+    key = _key(tab, ctx, params)
+    built = []
+    with span("Build chart", tab=tab) as attrs:
+        scheduler.wait(key)
+        items = _figures.get_or_compute(key, lambda: built.append(True) or _render(tab, ctx, params))
+        attrs["cached"] = not built
+    return items
+
+
+def prefetch(tabs, ctx, params=None, group=None):
+    """Build ``tabs`` on the worker pool so switching to them is a cache hit.
+
+    ``params`` maps a tab to the arguments the page will call it with. With a
+    ``group`` (one per session), prefetches still queued for the group's
+    previous filter state or settings are cancelled.
+    """
+    params = params or {}
+    scope = (ctx.view.cache_key, ctx.viz_lib, ctx.theme, ctx.point_budget)
+    for tab in tabs:
+        tab_params = params.get(tab, {})
+        key = _key(tab, ctx, tab_params)
+        scheduler.prefetch(key, lambda key=key, tab=tab, tab_params=tab_params: _figures.get_or_compute(
+            key, lambda: _render(tab, ctx, tab_params)), group, scope)
+
+
+def zoom_bounds(lo, hi):
+    """Slider bounds for a column's ``(min, max)`` as plain Python values, or
+    None if it has no range."""
+    if pd.isna(lo) or pd.isna(hi) or lo == hi:
+        return None
+    if isinstance(lo, pd.Timestamp):
+        return lo.to_pydatetime(), hi.to_pydatetime()
+    if isinstance(lo, (int, np.integer)) and isinstance(hi, (int, np.integer)):
+        return int(lo), int(hi)
+    return float(lo), float(hi)
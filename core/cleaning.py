@@ -0,0 +1,77 @@
+"""Cleaned variants of a filtered dataset for the preview page.
+
+String normalization (strip whitespace, blank -> missing) runs once per column
+and is shared by both variants. Categorical columns are normalized through
+their categories, so the work scales with distinct values rather than rows.
+Duplicate rows are found by hashing each row once; only rows whose hashes
+match are then compared, so a hash collision cannot drop a distinct row.
+Everything is computed on first use and cached per filter state.
+"""
+import numpy as np
+import pandas as pd
+
+from core.cache import LRUCache
+from core.memory import DERIVED_CACHE_BYTES, sizeof, track
+
+# cleaned frames are full-size copies; keep only a few, within the derived-data cap
+_cache = LRUCache(maxsize=4, max_bytes=DERIVED_CACHE_BYTES, sizeof=sizeof)
+track("Cleaned variants", _cache.items)
+
+
+def _normalize_categorical(series):
+    cleaned = pd.Series(series.cat.categories).str.strip().replace("", np.nan)
+    new_codes, uniques = pd.factorize(cleaned)
+    codes = series.cat.codes.to_numpy()
+    remapped = np.where(codes >= 0, new_codes[codes], -1)
+    return pd.Series(pd.Categorical.from_codes(remapped, uniques), index=series.index, name=series.name)
+
+
+def _normalize_text(series):
+    is_str = series.map(lambda v: isinstance(v, str)) if series.dtype == object else None
+    stripped = series.str.strip().replace("", np.nan)
+    # non-string objects (numbers, lists) are kept as they are
+    return stripped if is_str is None else stripped.where(is_str, series)
+
+
+def normalize_strings(frame):
+    columns = {}
+    for col in frame.columns:
+        series = frame[col]
+        if isinstance(series.dtype, pd.CategoricalDtype) and pd.api.types.is_string_dtype(series.cat.categories):
+            series = _normalize_categorical(series)
+        elif series.dtype == object or isinstance(series.dtype, pd.StringDtype):
+            series = _normalize_text(series)
+        columns[col] = series
+    return pd.DataFrame(columns, index=frame.index, copy=False)
+
+
+def _hashable(frame):
+    try:
+        return frame, pd.util.hash_pandas_object(frame, index=False)
+    except TypeError:
+        # unhashable cells (lists, dicts) are compared by their text
+        frame = frame.astype(str)
+        return frame, pd.util.hash_pandas_object(frame, index=False)
+
+
+def drop_duplicate_rows(frame):
+    comparable, hashes = _hashable(frame)
+    candidates = np.flatnonzero(hashes.duplicated(keep=False).to_numpy())
+    keep = np.ones(len(frame), dtype=bool)
+    # rows with equal hashes are compared exactly
+    keep[candidates[comparable.iloc[candidates].duplicated().to_numpy()]] = False
+    return frame[keep].reset_index(drop=True)
+
+
+def normalized(view):
+    return _cache.get_or_compute((view.key, "normalized"), lambda: normalize_strings(view.frame()))
+
+
+def without_duplicates_null(view):
+    """Duplicate rows removed, blank strings as missing values."""
+    return _cache.get_or_compute((view.key, "no_duplicates"), lambda: drop_duplicate_rows(normalized(view)))
+
+
+def with_duplicates_filled(view):
+    """All rows kept, missing values filled from the previous (then next) row."""
+    return _cache.get_or_compute((view.key, "filled"), lambda: normalized(view).ffill().bfill())
@@ -0,0 +1,211 @@
+"""Incremental Pearson correlation from sufficient statistics.
+
+For numeric columns X (NaN = missing) with presence mask M, the pairwise-
+complete correlation of every column pair follows from four additive k x k
+matrices:
+
+    n   = M'M        pairs observed together
+    sx  = X'M        sum of x_i over rows where x_j is also present
+    sxx = (X*X)'M    same for x_i squared
+    sxy = X'X        cross-products (missing values as 0)
+
+Because they are sums over rows, statistics for a new filter state are the old
+ones plus the rows that entered minus the rows that left, and appended rows
+just add on. Values are shifted by a fixed per-column offset before
+accumulating to keep the sums well conditioned. Products run over column
+blocks on a thread pool (numpy releases the GIL in matmul).
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from core.memory import track
+
+ROW_CHUNK = 250_000
+COLUMN_BLOCK = 64
+MAX_ENGINES = 16
+# with more numeric columns than this, the dashboard opens on the strongest
+# pairs instead of the full heatmap
+PAIRS_VIEW_ABOVE = 40
+
+_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="corr")
+
+
+def _blocked_product(a, b):
+    """``a.T @ b`` computed per column block in parallel."""
+    k = a.shape[1]
+    if k <= COLUMN_BLOCK:
+        return a.T @ b
+    out = np.empty((k, b.shape[1]))
+    blocks = [slice(i, i + COLUMN_BLOCK) for i in range(0, k, COLUMN_BLOCK)]
+
+    def fill(block):
+        out[block] = a[:, block].T @ b
+
+    list(_pool.map(fill, blocks))
+    return out
+
+
+class CorrStats:
+    def __init__(self, columns, shift):
+        k = len(columns)
+        self.columns = list(columns)
+        self.shift = shift
+        self.n = np.zeros((k, k))
+        self.sx = np.zeros((k, k))
+        self.sxx = np.zeros((k, k))
+        self.sxy = np.zeros((k, k))
+
+    def copy(self):
+        other = CorrStats(self.columns, self.shift)
+        for name in ("n", "sx", "sxx", "sxy"):
+            setattr(other, name, getattr(self, name).copy())
+        return other
+
+    def add(self, values, sign=1.0):
+        """Accumulate (or with ``sign=-1`` remove) a float array of rows."""
+        values = values - self.shift
+        present = ~np.isnan(values)
+        mask = present.astype(float)
+        values = np.where(present, values, 0.0)
+        self.n += sign * _blocked_product(mask, mask)
+        self.sx += sign * _blocked_product(values, mask)
+        self.sxx += sign * _blocked_product(values * values, mask)
+        self.sxy += sign * _blocked_product(values, values)
+        return self
+
+    def add_frame(self, frame, rows=None, sign=1.0):
+        """Accumulate ``frame``'s rows (or the row ids ``rows``) in chunks."""
+        total = len(frame) if rows is None else len(rows)
+        for start in range(0, total, ROW_CHUNK):
+            if rows is None:
+                chunk = frame.iloc[start:start + ROW_CHUNK]
+            else:
+                chunk = frame.take(rows[start:start + ROW_CHUNK])
+            self.add(chunk.to_numpy(dtype=float, na_value=np.nan), sign)
+        return self
+
+    def corr(self):
+        n, sx, sxx = self.n, self.sx, self.sxx
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov = n * self.sxy - sx * sx.T
+            var_i = n * sxx - sx * sx
+            r = cov / np.sqrt(var_i * var_i.T)
+        r[(n < 2) | ~np.isfinite(r)] = np.nan
+        np.clip(r, -1.0, 1.0, out=r)
+        return pd.DataFrame(r, index=self.columns, columns=self.columns)
+
+
+class CorrelationEngine:
+    """Keeps the statistics of the last filter state of one dataset's columns."""
+
+    def __init__(self, df, columns):
+        self.df = df
+        self.columns = list(columns)
+        self.frame = df[self.columns]
+        shift = self.frame.mean(numeric_only=False).to_numpy(dtype=float)
+        self.shift = np.nan_to_num(shift)
+        self._rows = None
+        self._stats = None
+        self._lock = threading.Lock()
+
+    def nbytes(self):
+        """Bytes of the kept statistics and row ids (the frame is shared)."""
+        stats = self._stats
+        size = 0 if stats is None else sum(getattr(stats, name).nbytes for name in ("n", "sx", "sxx", "sxy"))
+        return size + (0 if self._rows is None else self._rows.nbytes)
+
+    def _all_rows(self):
+        return np.arange(len(self.frame))
+
+    def stats_for(self, rows):
+        """Statistics over the row ids ``rows`` (None = every row)."""
+        rows = self._all_rows() if rows is None else np.sort(rows)
+        with self._lock:
+            if self._stats is not None:
+                if len(rows) == len(self._rows) and np.array_equal(rows, self._rows):
+                    return self._stats
+                added = np.setdiff1d(rows, self._rows, assume_unique=True)
+                removed = np.setdiff1d(self._rows, rows, assume_unique=True)
+                if len(added) + len(removed) < len(rows):
+                    stats = self._stats.copy()
+                    stats.add_frame(self.frame, added)
+                    stats.add_frame(self.frame, removed, sign=-1.0)
+                    self._rows, self._stats = rows, stats
+                    return stats
+            stats = CorrStats(self.columns, self.shift).add_frame(self.frame, rows)
+            self._rows, self._stats = rows, stats
+            return stats
+
+    def append(self, df, new_rows):
+        """Fold rows appended to the dataset (ids ``new_rows`` of ``df``) into
+        the statistics when the last state covered every row."""
+        with self._lock:
+            covered_all = self._rows is not None and len(self._rows) == len(self.frame)
+            self.df = df
+            self.frame = df[self.columns]
+            if covered_all:
+                self._stats = self._stats.copy().add_frame(self.frame, new_rows)
+                self._rows = np.concatenate([self._rows, new_rows])
+            else:
+                self._rows, self._stats = None, None
+
+
+_engines = OrderedDict()
+_engines_lock = threading.Lock()
+
+
+def _engine_items():
+    with _engines_lock:
+        return list(_engines.items())
+
+
+track("Correlation statistics", _engine_items)
+
+
+def engine(dataset_id, df, columns):
+    key = (dataset_id, tuple(columns))
+    with _engines_lock:
+        found = _engines.get(key)
+        if found is None or found.df is not df:
+            found = _engines[key] = CorrelationEngine(df, columns)
+        _engines.move_to_end(key)
+        while len(_engines) > MAX_ENGINES:
+            _engines.popitem(last=False)
+        return found
+
+
+def extend_engines(parent_id, dataset_id, df, parent_rows):
+    """Move the parent dataset's engines to ``df`` (the parent's frame with rows
+    appended), folding the new rows into their statistics."""
+    new_rows = np.arange(parent_rows, len(df))
+    with _engines_lock:
+        moved = [(key, _engines.pop(key)) for key in list(_engines) if key[0] == parent_id]
+    for (_, columns), found in moved:
+        found.append(df, new_rows)
+        with _engines_lock:
+            _engines[(dataset_id, columns)] = found
+            while len(_engines) > MAX_ENGINES:
+                _engines.popitem(last=False)
+
+
+def correlation(view, columns):
+    """Correlation matrix of ``columns`` over a ``FilteredView``."""
+    if view.pushdown:
+        return view.correlation(columns)
+    dataset_id = view.key[0] if view.key else None
+    return engine(dataset_id, view.df, columns).stats_for(view.rows).corr()
+
+
+def top_pairs(corr, k=20):
+    """The ``k`` column pairs with the strongest absolute correlation."""
+    values = corr.to_numpy()
+    i, j = np.triu_indices(len(values), k=1)
+    pairs = pd.DataFrame({"column_a": corr.index[i], "column_b": corr.columns[j], "r": values[i, j]})
+    pairs = pairs.dropna(subset=["r"])
+    order = pairs["r"].abs().sort_values(ascending=False).index[:k]
+    return pairs.loc[order].reset_index(drop=True)
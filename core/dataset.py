@@ -0,0 +1,60 @@
+"""Loading and normalizing uploaded datasets for the pages."""
+import pandas as pd
+
+from core.registry import registry
+from core.store import read_dataset
+from core.tracing import span
+from core.type_inference import apply_schema, infer_schema
+
+
+def make_unique_columns(columns):
+    counts = {}
+    new_cols = []
+    for col in columns:
+        if col in counts:
+            counts[col] += 1
+            new_cols.append(f"{col}_{counts[col]}")
+        else:
+            counts[col] = 0
+            new_cols.append(col)
+    return new_cols
+
+
+def prepare_frame(df, key=None):
+    df.columns = make_unique_columns(df.columns)
+    with span("Infer types", columns=len(df.columns)):
+        schema = infer_schema(df, key)
+    with span("Convert types"):
+        return apply_schema(df, schema)
+
+
+def load_dataset(dataset_id, path):
+    """Return the shared, prepared frame for ``dataset_id``.
+
+    The frame is cached process-wide and must be treated as read-only: filter,
+    select or ``assign`` into new frames instead of modifying it in place.
+    """
+    return registry.get(dataset_id, lambda: prepare_frame(read_dataset(path), dataset_id))
+
+
+def extend_frame(df, new_rows):
+    """``df`` followed by the prepared ``new_rows`` (same columns).
+
+    Categorical columns keep their existing codes: categories first seen in
+    ``new_rows`` are added after the old ones, so indexes built on the codes
+    stay valid for the old rows.
+    """
+    old_part, new_part = {}, {}
+    for col in df.columns:
+        old, new = df[col], new_rows[col]
+        if isinstance(old.dtype, pd.CategoricalDtype):
+            values = new.astype(object).where(new.notna(), None)
+            unseen = pd.Index(values.dropna().unique()).difference(old.cat.categories)
+            if len(unseen):
+                old = old.cat.add_categories(unseen)
+            new = pd.Series(pd.Categorical(values, dtype=old.dtype), index=new.index, name=col)
+        elif isinstance(new.dtype, pd.CategoricalDtype):
+            new = new.astype(object)
+        old_part[col], new_part[col] = old, new
+    return pd.concat([pd.DataFrame(old_part, copy=False), pd.DataFrame(new_part, copy=False)],
+                     ignore_index=True)
@@ -0,0 +1,156 @@
+"""Level-of-detail reduction for point-heavy charts.
+
+Each chart keeps at most a point budget of rows, with the strategy chosen by
+chart type:
+
+* line / time series: Largest-Triangle-Three-Buckets (LTTB) for a single
+  series, min/max per bucket when the x axis cannot be interpolated;
+* scatter and map: density-preserving sampling on a 2D grid, which thins out
+  crowded cells first so sparse regions and outliers survive; or plain 2D
+  binning when the chart is rendered as a heatmap.
+
+Frames that already fit the budget are returned unchanged, so narrowing the
+plotted range until it fits gives full resolution.
+"""
+import numpy as np
+import pandas as pd
+
+DEFAULT_POINT_BUDGET = 5000
+GRID_SIZE = 64
+# fewest points a series of a grouped line chart is drawn with
+MIN_SERIES_POINTS = 3
+
+
+def _as_float(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        values = series.to_numpy(dtype="datetime64[ns]").astype("int64").astype(float)
+        values[series.isna().to_numpy()] = np.nan
+        return values
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype=float)
+
+
+def lttb_indices(x, y, n_out):
+    """Positions of the ``n_out`` points LTTB keeps from x-sorted ``x``, ``y``."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    keep = np.empty(n_out, dtype=np.intp)
+    keep[0], keep[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_lo:nxt_hi].mean()
+        avg_y = y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[prev] - avg_x) * (y[lo:hi] - y[prev])
+                      - (x[prev] - x[lo:hi]) * (avg_y - y[prev]))
+        prev = lo + int(np.argmax(area))
+        keep[i + 1] = prev
+    return keep
+
+
+def minmax_indices(y, n_out):
+    """Positions of each bucket's minimum and maximum, in original order."""
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    buckets = max(n_out // 2, 1)
+    starts = np.linspace(0, n, buckets + 1).astype(int)[:-1]
+    bucket_of = np.repeat(np.arange(buckets), np.diff(np.append(starts, n)))
+    order = np.lexsort((y, bucket_of))
+    bounds = np.append(starts, n)
+    lows = order[bounds[:-1]]
+    highs = order[bounds[1:] - 1]
+    return np.unique(np.concatenate([lows, highs]))
+
+
+def density_indices(x, y, n_out, grid=GRID_SIZE, seed=0):
+    """Positions of a density-preserving sample of ``n_out`` points.
+
+    Points are binned on a ``grid`` x ``grid`` lattice and every cell keeps up
+    to the same cap of randomly chosen points, with the cap set as high as the
+    budget allows; what the cap leaves of the budget goes to one more point in
+    randomly chosen cells that have more, so exactly ``n_out`` points are kept.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+
+    def cell(values):
+        lo, hi = np.nanmin(values), np.nanmax(values)
+        scaled = (values - lo) / (hi - lo) * grid if hi > lo else np.zeros_like(values)
+        return np.clip(np.nan_to_num(scaled), 0, grid - 1).astype(np.int64)
+
+    cells = cell(x) * grid + cell(y)
+    rng = np.random.default_rng(seed)
+    shuffled = rng.permutation(n)
+    order = shuffled[np.argsort(cells[shuffled], kind="stable")]
+    counts = np.bincount(cells, minlength=grid * grid)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    sorted_cells = cells[order]
+    rank = np.arange(n) - starts[sorted_cells]
+
+    # largest per-cell cap whose total stays within the budget
+    lo, hi = 0, int(counts.max())
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if np.minimum(counts, mid).sum() <= n_out:
+            lo = mid
+        else:
+            hi = mid - 1
+    # one more point for some of the cells with more than the cap; there are
+    # more of those cells than budget left, or the cap could be higher
+    crowded = np.flatnonzero(counts > lo)
+    extra = np.zeros(grid * grid, dtype=bool)
+    extra[rng.choice(crowded, n_out - int(np.minimum(counts, lo).sum()), replace=False)] = True
+    return np.sort(order[(rank < lo) | ((rank == lo) & extra[sorted_cells])])
+
+
+def downsample_line(df, x, y, budget=DEFAULT_POINT_BUDGET, group=None):
+    """Reduce a line chart's frame to at most ``budget`` points.
+
+    With ``group``, only the largest ``budget // MIN_SERIES_POINTS`` series
+    are kept; each gets ``MIN_SERIES_POINTS`` and the rest of the budget is
+    split between them in proportion to their rows.
+    """
+    if len(df) <= budget:
+        return df
+    if group is not None:
+        groups = [part for _, part in df.groupby(group, observed=True, sort=False)]
+        sizes = np.array([len(part) for part in groups])
+        drawn = np.sort(np.argsort(-sizes, kind="stable")[:max(budget // MIN_SERIES_POINTS, 1)])
+        spare = max(budget - MIN_SERIES_POINTS * len(drawn), 0)
+        total = sizes[drawn].sum()
+        return pd.concat([downsample_line(groups[i], x, y, MIN_SERIES_POINTS + spare * sizes[i] // total)
+                          for i in drawn])
+
+    y_values = _as_float(df[y])
+    sortable = pd.api.types.is_numeric_dtype(df[x]) or pd.api.types.is_datetime64_any_dtype(df[x])
+    if sortable:
+        df = df.sort_values(x, kind="stable")
+        y_values = _as_float(df[y])
+        x_values = _as_float(df[x])
+        valid = ~(np.isnan(x_values) | np.isnan(y_values))
+        df, x_values, y_values = df[valid], x_values[valid], y_values[valid]
+        return df.iloc[lttb_indices(x_values, y_values, budget)]
+    if not np.isnan(y_values).all():
+        return df.iloc[minmax_indices(np.nan_to_num(y_values, nan=np.nanmean(y_values)), budget)]
+    return df.iloc[np.linspace(0, len(df) - 1, budget).astype(int)]
+
+
+def downsample_points(df, x, y, budget=DEFAULT_POINT_BUDGET):
+    """Density-preserving sample of a scatter or map frame."""
+    if len(df) <= budget:
+        return df
+    x_values, y_values = _as_float(df[x]), _as_float(df[y])
+    if np.isnan(x_values).all() or np.isnan(y_values).all():
+        return df.sample(budget, random_state=0).sort_index()
+    return df.iloc[density_indices(x_values, y_values, budget)]
+
+
+def bin2d(df, x, y, bins=GRID_SIZE):
+    """2D histogram of ``x`` and ``y``: (counts, x_edges, y_edges)."""
+    frame = df[[x, y]].dropna()
+    return np.histogram2d(_as_float(frame[x]), _as_float(frame[y]), bins=bins)
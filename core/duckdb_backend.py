@@ -0,0 +1,348 @@
+"""Out-of-core queries on the stored Parquet file with DuckDB.
+
+``DuckDBIndex`` and ``DuckDBView`` mirror ``FilterIndex`` and
+``FilteredView``, but nothing is loaded up front: filters become a WHERE clause,
+and aggregates, quantiles and correlations run inside DuckDB, streaming the
+file, so only their small results come back as pandas objects. Raw rows (for
+point charts, previews and cleaning) are fetched as a reservoir sample of at
+most ``FETCH_ROWS`` rows.
+
+Column types are inferred from the file's first rows with the same rules as
+the in-memory path and applied as SQL casts; values that fail to parse become
+NULL instead of leaving the whole column as text.
+
+A dataset version made by appending rows also gets a ``delta`` view of just
+the appended rows (by their position in the file), which
+``DuckDBView.delta`` uses so cached aggregates can be extended.
+"""
+import datetime
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from core.store import read_head
+from core.tracing import traced
+from core.type_inference import (BOOLEAN, BOOL_VALUES, DATETIME, NUMERIC, SAMPLE_SIZE,
+                                 apply_schema, infer_schema)
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+FETCH_ROWS = int(os.environ.get("EDA_FETCH_ROWS", 1_000_000))
+# column pairs per correlation query; keeps very wide matrices plannable
+CORR_PAIRS_PER_QUERY = 2000
+MAX_INDEXES = 8
+
+
+def quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _is_text(series):
+    return series.dtype == object or isinstance(series.dtype, (pd.StringDtype, pd.CategoricalDtype))
+
+
+def _projection(col, raw, ctype):
+    """SQL expression reading ``col`` as the type the in-memory path would give it."""
+    name = quote(col)
+    if not _is_text(raw):
+        return name
+    text = f"trim(CAST({name} AS VARCHAR))"
+    if ctype.kind == NUMERIC:
+        return f"TRY_CAST({text} AS DOUBLE) AS {name}"
+    if ctype.kind == DATETIME:
+        if ctype.fmt in (None, "ISO8601"):
+            return f"TRY_CAST({text} AS TIMESTAMP) AS {name}"
+        fmt = ctype.fmt.replace("'", "''")
+        return f"try_strptime({text}, '{fmt}') AS {name}"
+    if ctype.kind == BOOLEAN:
+        cases = " ".join(f"WHEN '{k}' THEN {str(v).upper()}" for k, v in BOOL_VALUES.items())
+        return f"CASE lower({text}) {cases} END AS {name}"
+    return name
+
+
+class DuckDBIndex:
+    def __init__(self, path, dataset_id=None, parent=None):
+        if duckdb is None:
+            raise ImportError("duckdb is required for the out-of-core backend")
+        self.path = path
+        self.dataset_id = dataset_id
+        # (parent dataset id, parent row count) when the dataset was appended to
+        self.parent = parent
+        raw = read_head(path, SAMPLE_SIZE)
+        schema = infer_schema(raw, dataset_id)
+        # typed first rows: column names and dtypes for the pages
+        self._head = apply_schema(raw, schema)
+        self._categorical = [col for col in self._head.columns
+                             if isinstance(self._head[col].dtype, pd.CategoricalDtype)]
+        columns = ", ".join(_projection(col, raw[col], schema[col]) for col in raw.columns)
+        source = "'" + path.replace("'", "''") + "'"
+        self._conn = duckdb.connect()
+        self._conn.execute(f"CREATE VIEW data AS SELECT {columns} FROM read_parquet({source})")
+        if parent is not None:
+            self._conn.execute(f"CREATE VIEW delta AS SELECT {columns} "
+                               f"FROM read_parquet({source}, file_row_number = true) "
+                               f"WHERE file_row_number >= {int(parent[1])}")
+
+    def query(self, sql, params=()):
+        # a cursor per query: DuckDB connections are not safe to share across threads
+        return self._conn.cursor().execute(sql, list(params))
+
+    def head(self, n=5):
+        return self._head.head(n)
+
+    def restore_dtypes(self, frame):
+        """Give fetched rows the categorical dtypes the in-memory frame would have."""
+        for col in self._categorical:
+            if col in frame.columns:
+                frame[col] = frame[col].astype("category")
+        return frame
+
+    def date_bounds(self, col):
+        lo, hi = self.query(f"SELECT min({quote(col)}), max({quote(col)}) FROM data").fetchone()
+        if lo is None:
+            return None, None
+        return pd.Timestamp(lo), pd.Timestamp(hi)
+
+    def categories(self, col, rows=None):
+        """Distinct values of ``col`` under the predicates ``rows`` (a view's ``rows``)."""
+        where, params = _where((rows or ()) + ((f"{quote(col)} IS NOT NULL", ()),))
+        result = self.query(f"SELECT DISTINCT {quote(col)} FROM data{where} ORDER BY 1", params)
+        return [value for (value,) in result.fetchall()]
+
+    @traced("Filter")
+    def select(self, date=None, categories=None):
+        """Same contract as ``FilterIndex.select``."""
+        predicates = ()
+        key = (self.dataset_id,)
+        if date is not None:
+            col, start, end = date
+            predicates += ((f"{quote(col)} BETWEEN ? AND ?", (pd.Timestamp(start), pd.Timestamp(end))),)
+            key += (("date",) + tuple(str(v) for v in date),)
+        if categories is not None:
+            col, selected = categories
+            marks = ", ".join("?" * len(selected))
+            predicates += ((f"{quote(col)} IN ({marks})", tuple(selected)),)
+            key += (("categories", col, tuple(sorted(map(str, selected)))),)
+        return DuckDBView(self, predicates, key)
+
+
+def _where(predicates):
+    if not predicates:
+        return "", []
+    params = [p for _, values in predicates for p in values]
+    return " WHERE " + " AND ".join(f"({sql})" for sql, _ in predicates), params
+
+
+class DuckDBView:
+    # aggregates, correlation and exports call the view's own methods
+    pushdown = True
+
+    def __init__(self, index, predicates=(), key=(), sort=None, table="data"):
+        self.index = index
+        self.predicates = predicates
+        self.key = key
+        self.sort = sort
+        # "delta" for a view of the appended rows only
+        self.table = table
+        self._len = None
+
+    @property
+    def rows(self):
+        """The filter predicates, or None when every row is selected."""
+        return self.predicates or None
+
+    @property
+    def cache_key(self):
+        return self.key + (self.sort,)
+
+    def _query(self, select, predicates=(), tail=""):
+        where, params = _where(self.predicates + tuple(predicates))
+        return self.index.query(f"SELECT {select} FROM {self.table}{where}{tail}", params)
+
+    def _order(self):
+        if self.sort is None:
+            return ""
+        col, ascending = self.sort
+        return f" ORDER BY {quote(col)} {'ASC' if ascending else 'DESC'} NULLS LAST"
+
+    def __len__(self):
+        if self._len is None:
+            self._len = self._query("count(*)").fetchone()[0]
+        return self._len
+
+    def _select_list(self, columns):
+        if columns is None:
+            return "*"
+        return ", ".join(quote(col) for col in dict.fromkeys(columns))
+
+    def frame(self, columns=None, limit=FETCH_ROWS):
+        """The view's rows, or a reservoir sample of ``limit`` of them."""
+        select = self._select_list(columns)
+        if len(self) <= limit:
+            result = self._query(select, tail=self._order())
+        else:
+            where, params = _where(self.predicates)
+            inner = select
+            if columns is not None and self.sort is not None and self.sort[0] not in columns:
+                inner += ", " + quote(self.sort[0])
+            sample = (f"SELECT * FROM (SELECT {inner} FROM {self.table}{where}) "
+                      f"USING SAMPLE reservoir({int(limit)} ROWS) REPEATABLE (0)")
+            result = self.index.query(f"SELECT {select} FROM ({sample}){self._order()}", params)
+        return self.index.restore_dtypes(result.df())
+
+    def column(self, col):
+        return self.frame([col])[col]
+
+    def chunks(self, columns=None, chunk_rows=100_000):
+        """Stream every row of the view as DataFrames of ``chunk_rows`` rows."""
+        reader = self._query(self._select_list(columns), tail=self._order()).fetch_record_batch(chunk_rows)
+        for batch in reader:
+            yield self.index.restore_dtypes(batch.to_pandas())
+
+    def sorted_by(self, col, ascending=True):
+        return DuckDBView(self.index, self.predicates, self.key, (col, ascending), self.table)
+
+    def within(self, col, lo, hi):
+        predicate = (f"{quote(col)} BETWEEN ? AND ?", (lo, hi))
+        key = self.key + (("within", col, str(lo), str(hi)),)
+        return DuckDBView(self.index, self.predicates + (predicate,), key, self.sort, self.table)
+
+    def delta(self):
+        """Same contract as ``FilteredView.delta``."""
+        if self.index.parent is None or self.table != "data":
+            return None
+        view = DuckDBView(self.index, self.predicates, self.key + (("appended",),), table="delta")
+        return (self.index.parent[0],) + self.key[1:], view
+
+    # ---- pushed-down aggregates (see core.aggregate for the pandas versions) ----
+
+    def category_summary(self, cat_col, num_col):
+        cat, num = quote(cat_col), quote(num_col)
+        return self._query(
+            f"{cat}, sum({num}) AS sum, avg({num}) AS mean, stddev_samp({num}) AS std, "
+            f"count({num}) AS count",
+            [(f"{cat} IS NOT NULL", ())],
+            f" GROUP BY {cat} HAVING count({num}) > 0 ORDER BY {cat}").df()
+
+    def box_summary(self, cat_col, num_col):
+        cat, num = quote(cat_col), quote(num_col)
+        where, params = _where(self.predicates + ((f"{cat} IS NOT NULL AND {num} IS NOT NULL", ()),))
+        sql = f"""
+            WITH f AS (SELECT {cat} AS k, {num} AS v FROM {self.table}{where}),
+            q AS (SELECT k, quantile_cont(v, 0.25) AS q1, quantile_cont(v, 0.5) AS median,
+                         quantile_cont(v, 0.75) AS q3, count(*) AS count
+                  FROM f GROUP BY k)
+            SELECT q.k AS {cat}, q1, median, q3,
+                   min(v) FILTER (WHERE v >= q1 - 1.5 * (q3 - q1)) AS lowerfence,
+                   max(v) FILTER (WHERE v <= q3 + 1.5 * (q3 - q1)) AS upperfence,
+                   q.count AS count
+            FROM q JOIN f ON f.k = q.k
+            GROUP BY q.k, q1, median, q3, q.count ORDER BY q.k"""
+        return self.index.query(sql, params).df()
+
+    def histogram(self, num_col, bins=20):
+        num = quote(num_col)
+        lo, hi, count = self._query(f"min({num}), max({num}), count({num})").fetchone()
+        if not count:
+            return np.zeros(bins, dtype=int), np.linspace(0, 1, bins + 1)
+        lo, hi = float(lo), float(hi)
+        if lo == hi:
+            lo, hi = lo - 0.5, hi + 0.5
+        edges = np.linspace(lo, hi, bins + 1)
+        return self.bin_counts(num_col, edges), edges
+
+    def bin_counts(self, num_col, edges):
+        """Counts of ``num_col`` per bin of the evenly spaced ``edges`` (values
+        outside them are not counted)."""
+        num = quote(num_col)
+        bins = len(edges) - 1
+        lo, hi = float(edges[0]), float(edges[-1])
+        width = (hi - lo) / bins
+        bucket = f"least(CAST(floor(({num} - ?) / ?) AS BIGINT), {bins - 1})"
+        where, params = _where(self.predicates + ((f"{num} BETWEEN ? AND ?", (lo, hi)),))
+        result = self.index.query(f"SELECT {bucket} AS b, count(*) FROM {self.table}{where} GROUP BY b",
+                                  [lo, width] + params).fetchall()
+        counts = np.zeros(bins, dtype=int)
+        for b, n in result:
+            counts[int(b)] = n
+        return counts
+
+    def column_totals(self, columns):
+        columns = list(columns)
+        row = self._query(", ".join(f"sum({quote(col)})" for col in columns)).fetchone()
+        return pd.Series(row, index=list(columns), dtype=float)
+
+    def period_totals(self, date_col, cat_col, num_col, period):
+        date, cat, num = quote(date_col), quote(cat_col), quote(num_col)
+        return self._query(f"date_trunc('{period}', {date}) AS {date}, {cat}, coalesce(sum({num}), 0) AS {num}",
+                           [(f"{date} IS NOT NULL AND {cat} IS NOT NULL", ())],
+                           " GROUP BY 1, 2 ORDER BY 1, 2").df()
+
+    def column_range(self, col):
+        lo, hi = self._query(f"min({quote(col)}), max({quote(col)})").fetchone()
+        if isinstance(lo, datetime.datetime):
+            lo, hi = pd.Timestamp(lo), pd.Timestamp(hi)
+        return lo, hi
+
+    def quantile(self, col, q):
+        where, params = _where(self.predicates)
+        (value,) = self.index.query(f"SELECT quantile_cont({quote(col)}, ?) FROM {self.table}{where}",
+                                    [q] + params).fetchone()
+        return np.nan if value is None else value
+
+    def top_value(self, col):
+        row = self._query(f"{quote(col)}, count(*) AS n", [(f"{quote(col)} IS NOT NULL", ())],
+                          " GROUP BY 1 ORDER BY n DESC LIMIT 1").fetchone()
+        return None if row is None else row[0]
+
+    def correlation(self, columns):
+        k = len(columns)
+        r = np.full((k, k), np.nan)
+        pairs = [(i, j) for i in range(k) for j in range(i, k)]
+        for start in range(0, len(pairs), CORR_PAIRS_PER_QUERY):
+            part = pairs[start:start + CORR_PAIRS_PER_QUERY]
+            exprs = ", ".join(f"corr(CAST({quote(columns[i])} AS DOUBLE), CAST({quote(columns[j])} AS DOUBLE))"
+                              for i, j in part)
+            for (i, j), value in zip(part, self._query(exprs).fetchone()):
+                r[i, j] = r[j, i] = np.nan if value is None else value
+        r[~np.isfinite(r)] = np.nan
+        np.clip(r, -1.0, 1.0, out=r)
+        return pd.DataFrame(r, index=list(columns), columns=list(columns))
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _store(dataset_id, index):
+    _indexes[dataset_id] = index
+    _indexes.move_to_end(dataset_id)
+    while len(_indexes) > MAX_INDEXES:
+        _indexes.popitem(last=False)
+    return index
+
+
+def duckdb_index(dataset_id, path):
+    """Return the ``DuckDBIndex`` for the stored file, reusing it across reruns and sessions."""
+    with _indexes_lock:
+        index = _indexes.get(dataset_id)
+        if index is None or index.path != path:
+            index = DuckDBIndex(path, dataset_id)
+        return _store(dataset_id, index)
+
+
+def extend_index(parent_id, dataset_id, path, parent_rows):
+    """Open the appended version at ``path`` with a view of its new rows, when
+    the parent dataset is open here; no-op otherwise."""
+    with _indexes_lock:
+        if _indexes.pop(parent_id, None) is None:
+            return None
+    index = DuckDBIndex(path, dataset_id, parent=(parent_id, parent_rows))
+    with _indexes_lock:
+        return _store(dataset_id, index)
@@ -0,0 +1,95 @@
+"""Chunked dataset export for download buttons.
+
+Exports are written chunk by chunk into a temporary file (kept in memory while
+small), so the frame is never encoded in one piece, and are returned as the
+encoded bytes, which is what ``st.download_button`` accepts from a deferred
+``data`` callable. A
+``FilteredView`` is exported straight from the shared frame by row ids, without
+first materializing the filtered copy.
+"""
+import gzip
+import io
+import tempfile
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+EXPORT_CHUNK_ROWS = 100_000
+# exports stay in memory up to this size, then spill to a temp file
+SPOOL_BYTES = 32 * 1024 ** 2
+
+FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def frame_chunks(frame, chunk_rows=EXPORT_CHUNK_ROWS):
+    for start in range(0, max(len(frame), 1), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def view_chunks(view, columns=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield the view's rows in order, ``chunk_rows`` at a time."""
+    if view.pushdown:
+        yield from view.chunks(columns, chunk_rows)
+        return
+    df = view.df if columns is None else view.df[list(columns)]
+    if view.rows is None:
+        yield from frame_chunks(df, chunk_rows)
+        return
+    for start in range(0, max(len(view.rows), 1), chunk_rows):
+        yield df.take(view.rows[start:start + chunk_rows])
+
+
+def _write_csv(chunks, out):
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(text, index=False, header=i == 0)
+    text.flush()
+    text.detach()
+
+
+def _write_parquet(chunks, out):
+    writer = None
+    for chunk in chunks:
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(out, table.schema)
+        writer.write_table(table.cast(writer.schema))
+    if writer is not None:
+        writer.close()
+
+
+def write_export(chunks, fmt="CSV"):
+    """Encode an iterable of DataFrame chunks in ``fmt`` (a ``FORMATS`` key)
+    and return the encoded bytes."""
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES, mode="w+b")
+    if fmt == "Parquet":
+        _write_parquet(chunks, out)
+    elif fmt == "CSV (gzip)":
+        with gzip.GzipFile(fileobj=out, mode="wb", compresslevel=6) as zipped:
+            _write_csv(chunks, zipped)
+    else:
+        _write_csv(chunks, out)
+    with out:
+        out.seek(0)
+        return out.read()
+
+
+def export_frame(frame, fmt="CSV"):
+    return write_export(frame_chunks(frame), fmt)
+
+
+def export_view(view, fmt="CSV", columns=None):
+    """Export exactly the rows (and order) of a ``FilteredView``."""
+    return write_export(view_chunks(view, columns), fmt)
+
+
+def file_name(stem, fmt):
+    return f"{stem}.{FORMATS[fmt][0]}"
+
+
+def mime_type(fmt):
+    return FORMATS[fmt][1]
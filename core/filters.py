@@ -0,0 +1,293 @@
+"""Indexed row filtering for the sidebar filters.
+
+A ``FilterIndex`` is built once per dataset and lazily per column:
+
+* date columns keep their row order sorted by value, so a date range is two
+  binary searches and a slice;
+* category columns keep rows grouped by category code (one posting list of
+  row ids per category), so a category selection is a concatenation of lists.
+
+Filters resolve to arrays of row ids that are intersected, and a
+``FilteredView`` only materializes the columns a chart asks for.
+
+When rows are appended to a dataset, the built indexes are carried over to
+the new version: the new rows are merged into the sorted date orders and
+added to the ends of the category posting lists, instead of re-sorting
+everything. Views of the new version know their parent, so cached results for
+the old rows can be combined with results over just the new ones (see
+``FilteredView.delta``).
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from core.memory import sizeof, track
+from core.tracing import traced
+
+MAX_INDEXES = 8
+
+
+class FilteredView:
+    # computed here in pandas; see core.duckdb_backend for the pushed-down view
+    pushdown = False
+
+    def __init__(self, df, rows=None, key=(), sort=None, parent=None):
+        self.df = df
+        # None means every row, in the frame's own order
+        self.rows = rows
+        # identifies the dataset and filter state; ``sort`` is kept apart so
+        # order-insensitive results (aggregates) can be shared across sorts
+        self.key = key
+        self.sort = sort
+        # (parent dataset id, parent row count) when the dataset was appended to
+        self.parent = parent
+
+    @property
+    def cache_key(self):
+        return self.key + (self.sort,)
+
+    def __len__(self):
+        return len(self.df) if self.rows is None else len(self.rows)
+
+    def column(self, col):
+        series = self.df[col]
+        return series if self.rows is None else series.take(self.rows)
+
+    def frame(self, columns=None):
+        df = self.df if columns is None else self.df[list(dict.fromkeys(columns))]
+        return df if self.rows is None else df.take(self.rows)
+
+    def sorted_by(self, col, ascending=True):
+        rows = np.arange(len(self.df)) if self.rows is None else self.rows
+        values = self.df[col].take(rows).reset_index(drop=True)
+        order = values.sort_values(ascending=ascending, kind="stable").index.to_numpy()
+        return FilteredView(self.df, rows[order], self.key, (col, ascending), self.parent)
+
+    def within(self, col, lo, hi):
+        """The rows whose ``col`` lies in ``[lo, hi]``."""
+        rows = np.arange(len(self.df)) if self.rows is None else self.rows
+        keep = self.df[col].take(rows).between(lo, hi).to_numpy()
+        key = self.key + (("within", col, str(lo), str(hi)),)
+        return FilteredView(self.df, rows[keep], key, self.sort, self.parent)
+
+    def delta(self):
+        """``(key of the same filter state on the parent dataset, view of the
+        appended rows only)``, or None if the dataset was not appended to."""
+        if self.parent is None:
+            return None
+        parent_id, parent_rows = self.parent
+        if self.rows is None:
+            rows = np.arange(parent_rows, len(self.df))
+        else:
+            rows = self.rows[self.rows >= parent_rows]
+        view = FilteredView(self.df, rows, self.key + (("appended",),))
+        return (parent_id,) + self.key[1:], view
+
+
+class FilterIndex:
+    def __init__(self, df, dataset_id=None, parent=None):
+        self.df = df
+        self.dataset_id = dataset_id
+        self.parent = parent
+        self._dates = {}
+        self._categories = {}
+        self._lock = threading.Lock()
+
+    def _date_index(self, col):
+        with self._lock:
+            if col not in self._dates:
+                series = self.df[col]
+                if getattr(series.dt, "tz", None) is not None:
+                    series = series.dt.tz_localize(None)
+                values = series.to_numpy()
+                order = np.argsort(values, kind="stable")
+                # NaT sorts last; keep it out of every range
+                valid = int(series.notna().sum())
+                self._dates[col] = (order[:valid], values[order[:valid]])
+            return self._dates[col]
+
+    def _category_index(self, col):
+        with self._lock:
+            if col not in self._categories:
+                series = self.df[col]
+                if isinstance(series.dtype, pd.CategoricalDtype):
+                    codes = series.cat.codes.to_numpy()
+                    uniques = series.cat.categories
+                else:
+                    codes, uniques = pd.factorize(series)
+                    uniques = pd.Index(uniques)
+                order = np.argsort(codes, kind="stable")
+                bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+                self._categories[col] = (codes, uniques, order, bounds)
+            return self._categories[col]
+
+    def nbytes(self):
+        """Bytes held by the index arrays built so far."""
+        with self._lock:
+            return sizeof(list(self._dates.values())) + sizeof(list(self._categories.values()))
+
+    def head(self, n=5):
+        return self.df.head(n)
+
+    def date_bounds(self, col):
+        _, values = self._date_index(col)
+        if not len(values):
+            return None, None
+        return pd.Timestamp(values[0]), pd.Timestamp(values[-1])
+
+    def date_rows(self, col, start, end):
+        """Row ids with ``start <= value <= end``, ascending."""
+        order, values = self._date_index(col)
+        lo = np.searchsorted(values, np.datetime64(pd.Timestamp(start)), side="left")
+        hi = np.searchsorted(values, np.datetime64(pd.Timestamp(end)), side="right")
+        return np.sort(order[lo:hi])
+
+    def category_rows(self, col, selected):
+        """Row ids whose value is in ``selected``, ascending."""
+        _, uniques, order, bounds = self._category_index(col)
+        codes = uniques.get_indexer(list(selected)) if len(selected) else []
+        lists = [order[bounds[c]:bounds[c + 1]] for c in codes if c >= 0]
+        if not lists:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(lists)) if len(lists) > 1 else lists[0]
+
+    def categories(self, col, rows=None):
+        """Distinct values of ``col`` among ``rows`` (all rows if None)."""
+        codes, uniques, _, bounds = self._category_index(col)
+        if rows is None:
+            present = np.flatnonzero(np.diff(bounds))
+        else:
+            subset = codes[rows]
+            present = np.flatnonzero(np.bincount(subset[subset >= 0], minlength=len(uniques)))
+        return uniques.take(present).tolist()
+
+    @traced("Filter")
+    def select(self, date=None, categories=None):
+        """Resolve ``date=(col, start, end)`` and ``categories=(col, values)``
+        filters into a ``FilteredView``; a filter left as None is not applied."""
+        row_sets = []
+        key = (self.dataset_id,)
+        if date is not None:
+            row_sets.append(self.date_rows(*date))
+            key += (("date",) + tuple(str(v) for v in date),)
+        if categories is not None:
+            col, selected = categories
+            row_sets.append(self.category_rows(col, selected))
+            key += (("categories", col, tuple(sorted(map(str, selected)))),)
+        return FilteredView(self.df, intersect(row_sets, len(self.df)), key, parent=self.parent)
+
+    def extended(self, df, dataset_id):
+        """Index of ``df``, this index's frame with rows appended, reusing the
+        per-column indexes built so far."""
+        n = len(self.df)
+        index = FilterIndex(df, dataset_id, parent=(self.dataset_id, n))
+        with self._lock:
+            dates = dict(self._dates)
+            categories = dict(self._categories)
+        for col, (order, values) in dates.items():
+            series = df[col].iloc[n:]
+            if getattr(series.dt, "tz", None) is not None:
+                series = series.dt.tz_localize(None)
+            series = series.dropna()
+            new_values = series.to_numpy()
+            new_order = np.argsort(new_values, kind="stable")
+            new_values = new_values[new_order]
+            # after equal old values, like a stable sort of the whole column
+            at = np.searchsorted(values, new_values, side="right")
+            rows = series.index.to_numpy()[new_order]
+            index._dates[col] = (np.insert(order, at, rows), np.insert(values, at, new_values))
+        for col, (codes, uniques, order, bounds) in categories.items():
+            series = df[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                # extend_frame keeps the old codes and adds new categories last
+                uniques = series.cat.categories
+                new_codes = series.cat.codes.to_numpy()[n:]
+            else:
+                tail = series.iloc[n:]
+                new_codes = uniques.get_indexer(tail)
+                unseen = (new_codes < 0) & tail.notna().to_numpy()
+                if unseen.any():
+                    extra, added = pd.factorize(tail[unseen])
+                    new_codes[unseen] = extra + len(uniques)
+                    uniques = uniques.append(pd.Index(added))
+            bounds = np.concatenate([bounds, np.full(len(uniques) + 1 - len(bounds), bounds[-1])])
+            new_order = np.argsort(new_codes, kind="stable")
+            sorted_codes = new_codes[new_order]
+            # each new row goes to the end of its category's posting list
+            at = bounds[sorted_codes + 1]
+            order = np.insert(order, at, new_order + n)
+            bounds = bounds + np.searchsorted(sorted_codes, np.arange(len(uniques) + 1))
+            index._categories[col] = (np.concatenate([codes, new_codes]), uniques, order, bounds)
+        return index
+
+
+def intersect(row_sets, n):
+    """Intersect ascending row-id arrays; None when there is nothing to intersect."""
+    if not row_sets:
+        return None
+    row_sets = sorted(row_sets, key=len)
+    rows = row_sets[0]
+    for other in row_sets[1:]:
+        mask = np.zeros(n, dtype=bool)
+        mask[other] = True
+        rows = rows[mask[rows]]
+    return rows
+
+
+def date_range_filter(col, date_range, bounds):
+    """The ``select(date=...)`` filter for a sidebar ``date_input`` range.
+
+    It runs through the end of the last selected day. It is None while the
+    range is incomplete, or when it covers all of ``bounds`` (the column's
+    ``date_bounds``), since the full range filters nothing.
+    """
+    lo, hi = bounds
+    if len(date_range) != 2 or lo is None:
+        return None
+    start, end = pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1])
+    if start <= lo.normalize() and end >= hi.normalize():
+        return None
+    return (col, start, end + pd.Timedelta(days=1) - pd.Timedelta(1, "ns"))
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _index_items():
+    with _indexes_lock:
+        return list(_indexes.items())
+
+
+track("Filter indexes", _index_items)
+
+
+def _store(dataset_id, index):
+    _indexes[dataset_id] = index
+    _indexes.move_to_end(dataset_id)
+    while len(_indexes) > MAX_INDEXES:
+        _indexes.popitem(last=False)
+    return index
+
+
+def filter_index(dataset_id, df):
+    """Return the ``FilterIndex`` for ``df``, reusing it across reruns and sessions."""
+    with _indexes_lock:
+        index = _indexes.get(dataset_id)
+        if index is None or index.df is not df:
+            index = FilterIndex(df, dataset_id)
+        return _store(dataset_id, index)
+
+
+def extend_index(parent_id, dataset_id, df):
+    """Carry the parent dataset's index over to ``df`` (the parent's frame with
+    rows appended) under ``dataset_id``; no-op when the parent has none."""
+    with _indexes_lock:
+        parent = _indexes.pop(parent_id, None)
+    if parent is None:
+        return None
+    index = parent.extended(df, dataset_id)
+    with _indexes_lock:
+        return _store(dataset_id, index)
@@ -0,0 +1,405 @@
+"""Streaming ingestion for large uploads.
+
+CSV files are read in bounded chunks. Each chunk is narrowed as soon as it is
+parsed (low-cardinality strings become categoricals, ints and floats are
+downcast) so the process never holds the full object-dtype frame; the final
+frame is assembled column by column from the compact chunks.
+
+Excel workbooks (.xlsx) go through openpyxl's read-only mode, which streams
+each sheet's rows instead of building the workbook object model. Rows are
+narrowed in chunks the same way, and each selected sheet is parsed in its own
+worker process and written straight to the dataset store.
+
+JSON files (a top-level array of records, JSON Lines, or a single object) are
+decoded one record at a time, from a sliding text buffer or, for JSON Lines
+when orjson is installed, line by line with orjson, so the whole object tree
+never exists at once. Nested objects are flattened into dotted column
+names (``a.b.c``, as ``pandas.json_normalize`` names them) for a fixed set of
+leaf paths taken from the first records; the user can narrow that set before
+the full parse. Records are gathered into column lists in batches and narrowed
+like CSV chunks. Lists and objects found at a leaf are kept as JSON text.
+"""
+import codecs
+import hashlib
+import itertools
+import json
+import os
+import re
+import shutil
+import tempfile
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from core.dataset import make_unique_columns
+from core.scheduler import run_all_processes
+from core.store import dataset_path, save_dataset
+from core.tracing import traced
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULT_CHUNK_ROWS = 200_000
+EXCEL_CHUNK_ROWS = 50_000
+JSON_CHUNK_ROWS = 50_000
+JSON_READ_BYTES = 1 << 20
+# records read to find the columns of a JSON file; fields that first appear
+# later are not kept
+JSON_SAMPLE_RECORDS = 1_000
+# A string column becomes categorical when it has at most this share of
+# distinct values in a chunk.
+CATEGORY_RATIO = 0.5
+
+
+def is_text(series):
+    return series.dtype == object or isinstance(series.dtype, pd.StringDtype)
+
+
+def shrink_series(series, category_ratio=CATEGORY_RATIO):
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast="integer")
+    if pd.api.types.is_float_dtype(series) and series.dtype != "float32":
+        # pandas' own float downcast tolerates rounding; only narrow when
+        # float32 round-trips every value exactly
+        narrowed = series.astype("float32")
+        values = series.to_numpy()
+        if ((narrowed.to_numpy().astype(values.dtype) == values) | series.isna().to_numpy()).all():
+            return narrowed
+    if is_text(series) and len(series):
+        if series.nunique(dropna=True) <= category_ratio * len(series):
+            return series.astype("category")
+    return series
+
+
+def shrink_dtypes(df, category_ratio=CATEGORY_RATIO):
+    return pd.DataFrame(
+        {col: shrink_series(df[col], category_ratio) for col in df.columns},
+        index=df.index,
+    )
+
+
+def _combine(parts):
+    if len(parts) == 1:
+        return parts[0].reset_index(drop=True)
+    if all(isinstance(p.dtype, pd.CategoricalDtype) for p in parts):
+        return pd.Series(union_categoricals(parts, ignore_order=True), name=parts[0].name)
+    # a column that was categorical in some chunks and plain text in others
+    parts = [p.astype(object) if isinstance(p.dtype, pd.CategoricalDtype) else p for p in parts]
+    return pd.concat(parts, ignore_index=True)
+
+
+def _position(source):
+    try:
+        return source.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+@traced("Parse CSV")
+def read_csv_chunked(source, chunksize=DEFAULT_CHUNK_ROWS, category_ratio=CATEGORY_RATIO,
+                     total_bytes=None, progress=None, names=None):
+    """Read a CSV in ``chunksize``-row pieces and return one compact DataFrame.
+
+    ``progress`` is called after every chunk as ``progress(rows_read, fraction)``;
+    ``fraction`` is ``None`` when the source size is unknown. With ``names``,
+    the source has no header row (e.g. a file read on from past its header).
+    """
+    parts = {}
+    rows = 0
+    header = {} if names is None else {"header": None, "names": names}
+    with pd.read_csv(source, chunksize=chunksize, low_memory=False, **header) as reader:
+        for chunk in reader:
+            rows += len(chunk)
+            _chunk_columns(parts, chunk, category_ratio)
+            del chunk
+            if progress is not None:
+                pos = _position(source)
+                fraction = min(pos / total_bytes, 1.0) if pos is not None and total_bytes else None
+                progress(rows, fraction)
+
+    return _assemble(parts)
+
+
+def _chunk_columns(parts, chunk, category_ratio):
+    chunk = shrink_dtypes(chunk, category_ratio)
+    for col in chunk.columns:
+        parts.setdefault(col, []).append(chunk[col])
+
+
+def _assemble(parts):
+    columns = {}
+    # release each column's chunks as soon as it is assembled
+    for col in list(parts):
+        columns[col] = _combine(parts.pop(col))
+    return pd.DataFrame(columns, copy=False)
+
+
+def excel_sheet_names(source):
+    from openpyxl import load_workbook
+
+    if hasattr(source, "seek"):
+        source.seek(0)
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def _excel_frame(rows, columns):
+    width = len(columns)
+    frame = pd.DataFrame.from_records([row[:width] for row in rows], columns=columns)
+    frame = frame.dropna(how="all").infer_objects()
+    for col in frame.columns:
+        series = frame[col]
+        # cells of mixed types (e.g. numbers among text) are kept as text, as in a CSV
+        if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) not in ("string", "empty"):
+            frame[col] = series.map(lambda v: v if v is None or isinstance(v, str) else str(v))
+    return frame
+
+
+def read_excel_sheet(path, sheet, chunk_rows=EXCEL_CHUNK_ROWS, category_ratio=CATEGORY_RATIO):
+    """Stream one worksheet into a compact DataFrame; the first row is the header."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        columns = make_unique_columns(
+            [f"Unnamed: {i}" if name is None else str(name) for i, name in enumerate(header)])
+        parts = {}
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == chunk_rows:
+                _chunk_columns(parts, _excel_frame(batch, columns), category_ratio)
+                batch = []
+        if batch or not parts:
+            _chunk_columns(parts, _excel_frame(batch, columns), category_ratio)
+        return _assemble(parts)
+    finally:
+        workbook.close()
+
+
+def sheet_digest(digest, sheet):
+    """Dataset id of one sheet of the workbook with content hash ``digest``."""
+    return hashlib.blake2b(f"{digest}/{sheet}".encode(), digest_size=16).hexdigest()
+
+
+def ingest_sheet(path, sheet, digest):
+    """Parse ``sheet`` and store it as dataset ``digest``; returns the row count."""
+    df = read_excel_sheet(path, sheet)
+    save_dataset(df, digest)
+    return len(df)
+
+
+@traced("Parse workbook")
+def ingest_workbook(source, sheets, digest):
+    """Store every sheet in ``sheets`` of a workbook (a path or file object with
+    content hash ``digest``) as its own dataset, parsing sheets in parallel and
+    skipping those already stored. Returns ``{sheet: dataset_id}``."""
+    ids = {sheet: sheet_digest(digest, sheet) for sheet in sheets}
+    todo = [sheet for sheet in sheets if not os.path.exists(dataset_path(ids[sheet]))]
+    if not todo:
+        return ids
+    path, spooled = source, None
+    if not isinstance(source, (str, os.PathLike)):
+        # worker processes open the workbook themselves, so they need a file
+        spooled = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False)
+        source.seek(0)
+        shutil.copyfileobj(source, spooled)
+        spooled.close()
+        path = spooled.name
+    try:
+        run_all_processes(ingest_sheet, [(path, sheet, ids[sheet]) for sheet in todo])
+    finally:
+        if spooled is not None:
+            os.unlink(spooled.name)
+    return ids
+
+
+_decoder = json.JSONDecoder()
+# whitespace between JSON Lines records, or commas and whitespace between array elements
+_SEPARATORS = re.compile(r"[\s,]*")
+_NESTED = (dict, list)
+
+
+def _first_byte(source):
+    source.seek(0)
+    while True:
+        block = source.read(4096)
+        if not block:
+            return b""
+        block = block.removeprefix(codecs.BOM_UTF8).lstrip()
+        if block:
+            return block[:1]
+
+
+def _json_lines(source):
+    source.seek(0)
+    for number, line in enumerate(source):
+        if number == 0:
+            line = line.removeprefix(codecs.BOM_UTF8)
+        if line.strip():
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError as error:
+                raise ValueError(f"Invalid JSON on line {number + 1}: {error}") from error
+            yield record
+
+
+def iter_json_records(source, read_bytes=JSON_READ_BYTES):
+    """Yield the records of a JSON file object one by one: the elements of a
+    top-level array, or each top-level value (JSON Lines, concatenated JSON or
+    a single object)."""
+    if orjson is not None and _first_byte(source) not in (b"[", b""):
+        # JSON Lines, one orjson call per line; a document whose first line is
+        # not a whole value (a pretty-printed object) goes through the scanner
+        lines = _json_lines(source)
+        try:
+            first = next(lines, None)
+        except ValueError:
+            pass
+        else:
+            if first is not None:
+                yield first
+                yield from lines
+            return
+    source.seek(0)
+    decode = codecs.getincrementaldecoder("utf-8-sig")().decode
+    buffer, pos, eof, in_array = "", 0, False, None
+    while True:
+        pos = _SEPARATORS.match(buffer, pos).end()
+        if pos < len(buffer) and in_array is None:
+            in_array = buffer[pos] == "["
+            pos += in_array
+            continue
+        if pos < len(buffer) and in_array and buffer[pos] == "]":
+            return
+        complete = False
+        if pos < len(buffer):
+            try:
+                record, end = _decoder.raw_decode(buffer, pos)
+                # a number at the end of the buffer may go on in the next block
+                complete = end < len(buffer) or eof
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+        if complete:
+            yield record
+            pos = end
+        elif eof:
+            return
+        else:
+            block = source.read(read_bytes)
+            eof = not block
+            buffer, pos = buffer[pos:] + decode(block, final=eof), 0
+
+
+def _leaf_paths(record, prefix=()):
+    for key, value in record.items():
+        if isinstance(value, dict):
+            # empty objects add no column, as in json_normalize
+            yield from _leaf_paths(value, prefix + (str(key),))
+        else:
+            yield prefix + (str(key),)
+
+
+def _as_dict(record):
+    return record if isinstance(record, dict) else {"value": record}
+
+
+def _sample_paths(records):
+    """``{column name: key path}`` of the leaves in ``records``, in first-seen order."""
+    paths = {}
+    for record in records:
+        for path in _leaf_paths(_as_dict(record)):
+            paths.setdefault(".".join(path), path)
+    return paths
+
+
+def json_columns(source, sample_records=JSON_SAMPLE_RECORDS):
+    """Flattened column names found in the first ``sample_records`` records."""
+    return list(_sample_paths(itertools.islice(iter_json_records(source), sample_records)))
+
+
+def _json_text(value):
+    if orjson is not None:
+        try:
+            return orjson.dumps(value).decode()
+        except orjson.JSONEncodeError:
+            pass
+    # the same compact form as orjson
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _json_frame(batch, paths, columns):
+    # column-wise: each level of nesting is looked up once per batch and
+    # shared by every path below it
+    levels = {(): batch}
+
+    def values(path):
+        if path not in levels:
+            key = path[-1]
+            levels[path] = [value.get(key) if type(value) is dict else None for value in values(path[:-1])]
+        return levels[path]
+
+    data = {}
+    for col, path in zip(columns, paths):
+        column = values(path)
+        if any(type(value) in _NESTED for value in column):
+            column = [_json_text(value) if type(value) in _NESTED else value for value in column]
+        data[col] = column
+    return pd.DataFrame(data, columns=columns)
+
+
+@traced("Parse JSON")
+def read_json_records(source, columns=None, chunk_rows=JSON_CHUNK_ROWS, category_ratio=CATEGORY_RATIO,
+                      sample_records=JSON_SAMPLE_RECORDS, total_bytes=None, progress=None):
+    """Stream a JSON file into one compact DataFrame with a column per leaf path.
+
+    ``columns`` picks flattened columns (as listed by ``json_columns``); by
+    default every leaf found in the first ``sample_records`` records is kept.
+    ``progress`` is called after every batch as ``progress(rows_read, fraction)``.
+    An empty top-level array gives an empty DataFrame; raises ``ValueError``
+    if the file holds no JSON value at all.
+    """
+    records = iter_json_records(source)
+    sample = [_as_dict(record) for record in itertools.islice(records, sample_records)]
+    if not sample:
+        if _first_byte(source) == b"[":
+            return pd.DataFrame()
+        raise ValueError("The file contains no JSON records")
+    found = _sample_paths(sample)
+    columns = list(found) if columns is None else list(columns)
+    paths = [found.get(col) or tuple(col.split(".")) for col in columns]
+    names = make_unique_columns(columns)
+
+    parts = {}
+    rows = 0
+    batch = []
+    for record in itertools.chain(sample, records):
+        batch.append(_as_dict(record))
+        if len(batch) == chunk_rows:
+            _chunk_columns(parts, _json_frame(batch, paths, names), category_ratio)
+            rows += len(batch)
+            batch = []
+            if progress is not None:
+                pos = _position(source)
+                progress(rows, min(pos / total_bytes, 1.0) if pos is not None and total_bytes else None)
+    if batch or not parts:
+        _chunk_columns(parts, _json_frame(batch, paths, names), category_ratio)
+    return _assemble(parts)
+
+
+def columns_digest(digest, columns):
+    """Dataset id of the JSON file with content hash ``digest`` loaded with
+    only ``columns``."""
+    return hashlib.blake2b(json.dumps([digest, list(columns)]).encode(), digest_size=16).hexdigest()
@@ -0,0 +1,99 @@
+"""Saved Dashboard Builder layouts.
+
+A saved dashboard is a JSON file of tile specs under
+``STORE_DIR/dashboards/<dataset hash>/``. Next to it, a render file keeps every
+tile's finished figure JSON, written at save time. Datasets are stored by
+content hash, so a dashboard saved for a hash always describes the same data,
+and opening it only reads the render file: no dataset columns are loaded and
+no figures are built, whatever the size of the data. The render file is
+ignored (and tiles are rebuilt) when the tiles or the plotly version no longer
+match.
+"""
+import json
+import os
+import re
+
+import plotly.offline
+
+from core.store import STORE_DIR, is_digest
+from core.tiles import prime_tile_figures, tile_figures, tile_key
+
+DASHBOARD_DIR = os.path.join(STORE_DIR, "dashboards")
+
+
+def _slug(name):
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", name.strip()).strip("_") or "dashboard"
+
+
+def _folder(digest):
+    if not is_digest(digest):
+        raise ValueError(f"Not a dataset id: {digest!r}")
+    return os.path.join(DASHBOARD_DIR, digest)
+
+
+def _paths(digest, name):
+    base = os.path.join(_folder(digest), _slug(name))
+    return f"{base}.json", f"{base}.render.json"
+
+
+def _write_json(path, obj):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+    os.replace(tmp_path, path)
+
+
+def list_dashboards(digest):
+    folder = _folder(digest)
+    if not os.path.isdir(folder):
+        return []
+    names = []
+    for entry in sorted(os.listdir(folder)):
+        if entry.endswith(".json") and not entry.endswith(".render.json"):
+            with open(os.path.join(folder, entry), encoding="utf-8") as f:
+                names.append(json.load(f)["name"])
+    return names
+
+
+def save_dashboard(digest, path, name, tiles):
+    """Save ``tiles`` as dashboard ``name`` for dataset ``digest``, with their
+    figures rendered now.
+
+    Raises ``ValueError`` if another saved dashboard's name maps to the same
+    file (names that differ only in spaces or punctuation).
+    """
+    layout_path, render_path = _paths(digest, name)
+    if os.path.exists(layout_path):
+        with open(layout_path, encoding="utf-8") as f:
+            saved = json.load(f)["name"]
+        if saved != name:
+            raise ValueError(f"'{name}' would overwrite the saved dashboard '{saved}'; choose another name.")
+    os.makedirs(os.path.dirname(layout_path), exist_ok=True)
+    figures = tile_figures(digest, path, tiles)
+    _write_json(render_path, {
+        "plotly": plotly.offline.get_plotlyjs_version(),
+        "figures": [{"key": list(tile_key(digest, tile)), "figure": fig_json}
+                    for tile, fig_json in zip(tiles, figures)],
+    })
+    _write_json(layout_path, {"name": name, "dataset": digest, "tiles": tiles})
+    return layout_path
+
+
+def load_dashboard(digest, name):
+    """Return the saved tiles, priming the tile figure cache from the render file."""
+    layout_path, render_path = _paths(digest, name)
+    with open(layout_path, encoding="utf-8") as f:
+        tiles = json.load(f)["tiles"]
+    if os.path.exists(render_path):
+        with open(render_path, encoding="utf-8") as f:
+            render = json.load(f)
+        if render.get("plotly") == plotly.offline.get_plotlyjs_version():
+            rendered = {tuple(entry["key"]): entry["figure"] for entry in render["figures"]}
+            prime_tile_figures(digest, tiles, rendered)
+    return tiles
+
+
+def delete_dashboard(digest, name):
+    for path in _paths(digest, name):
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,100 @@
+"""Memory accounting for shared datasets and derived results.
+
+Every page works on views of the one shared frame per dataset (see
+``core.registry``), so a session's own state is small; the bulk of memory is
+the shared datasets plus process-wide caches of derived results. Modules
+register those caches with ``track`` and the pages' memory panel reports them
+through ``memory_report``. Derived frames can share unchanged column buffers
+with their dataset (copy-on-write), so per-frame figures are upper bounds.
+
+Caps: ``EDA_DATASET_CACHE_BYTES`` for loaded datasets (evicted ones are reloaded
+from their Parquet copy on disk) and ``EDA_DERIVED_CACHE_BYTES`` for derived
+full-size frames such as the cleaned variants.
+"""
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+from core.registry import frame_nbytes, registry
+
+DERIVED_CACHE_BYTES = int(os.environ.get("EDA_DERIVED_CACHE_BYTES", 512 * 1024 ** 2))
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+_tracked = {}
+_tracked_lock = threading.Lock()
+
+
+def sizeof(obj):
+    """Approximate bytes held by ``obj`` (deep for frames, arrays and containers)."""
+    if isinstance(obj, pd.DataFrame):
+        return frame_nbytes(obj)
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (bytes, bytearray, str)):
+        return len(obj)
+    if isinstance(obj, dict):
+        return sum(sizeof(value) for value in obj.values())
+    if isinstance(obj, (list, tuple, set)):
+        return sum(sizeof(value) for value in obj)
+    if callable(getattr(obj, "nbytes", None)):
+        return obj.nbytes()
+    if hasattr(obj, "to_plotly_json"):
+        return sizeof(obj.to_plotly_json())
+    return sys.getsizeof(obj)
+
+
+def track(name, items):
+    """Report the entries of a cache under ``name``; ``items`` returns a
+    snapshot of its ``(key, value)`` pairs."""
+    with _tracked_lock:
+        _tracked[name] = items
+
+
+def _describe(key):
+    text = " / ".join(map(str, key)) if isinstance(key, tuple) else str(key)
+    return text if len(text) <= 80 else text[:77] + "..."
+
+
+def memory_report(session_state=None, dataset_id=None):
+    """Bytes held per cache, per large derived frame, by this session and by
+    the process, as a dict of tables and totals."""
+    caches = [("Loaded datasets", len(registry.entries()), registry.nbytes())]
+    frames = [("Dataset", _describe(key), size) for key, size in registry.entries()]
+    with _tracked_lock:
+        tracked = list(_tracked.items())
+    for name, items in tracked:
+        entries = items()
+        sizes = [(key, sizeof(value)) for key, value in entries]
+        caches.append((name, len(entries), sum(size for _, size in sizes)))
+        frames += [(name, _describe(key), size) for (key, value), (_, size) in zip(entries, sizes)
+                   if isinstance(value, pd.DataFrame)]
+
+    session = 0
+    if session_state is not None:
+        session = sum(sizeof(session_state[key]) for key in list(session_state.keys()))
+    shared = dict(registry.entries()).get(dataset_id, 0)
+    return {
+        "session_bytes": session,
+        "dataset_bytes": shared,
+        "caches": pd.DataFrame(caches, columns=["cache", "entries", "bytes"]),
+        "frames": pd.DataFrame(frames, columns=["kind", "key", "bytes"]).sort_values("bytes", ascending=False),
+        "process_bytes": psutil.Process().memory_info().rss if psutil is not None else None,
+        "dataset_cap": registry.max_bytes,
+        "derived_cap": DERIVED_CACHE_BYTES,
+    }
+
+
+def format_bytes(n):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:,.0f} {unit}" if unit == "B" else f"{n:,.1f} {unit}"
+        n /= 1024
@@ -0,0 +1,50 @@
+"""Sidebar panels shared by the pages.
+
+Each takes the page's ``streamlit`` module, so the data layer in ``core`` does
+not import Streamlit itself.
+"""
+from core.memory import format_bytes, memory_report
+from core.tracing import describe_trace, keep_trace, span_table, to_chrome_trace, to_json
+
+
+def performance_toggle(st):
+    return st.sidebar.toggle("⏱ Performance panel", key="performance_panel")
+
+
+def performance_panel(st, run, show=None):
+    """Keep the finished trace of ``run`` and, with the panel on, show recent
+    runs' spans with JSON and Chrome trace downloads.
+
+    Pages that need the toggle earlier in the run render it with
+    ``performance_toggle`` and pass its value as ``show``.
+    """
+    keep_trace(st.session_state, run.finish())
+    if show is None:
+        show = performance_toggle(st)
+    if not show:
+        return
+    with st.sidebar.expander("⏱ Performance", expanded=True):
+        traces = st.session_state["traces"][::-1]
+        shown = st.selectbox("Run", range(len(traces)), format_func=lambda i: describe_trace(traces[i]))
+        st.dataframe(span_table(traces[shown]), hide_index=True)
+        st.download_button("📥 Traces (JSON)", to_json(traces), "eda_traces.json", "application/json")
+        st.download_button("📥 Traces (Chrome trace)", to_chrome_trace(traces), "eda_traces.trace.json",
+                           "application/json")
+
+
+def memory_panel(st):
+    """With the panel on, show what this session, the shared dataset and the
+    caches hold in memory. Sizing every cached frame and figure is not free,
+    so nothing is measured while it is off."""
+    if not st.sidebar.toggle("🧠 Memory panel", key="memory_panel"):
+        return
+    with st.sidebar.expander("🧠 Memory", expanded=True):
+        memory = memory_report(st.session_state, st.session_state["dataset_id"])
+        st.metric("This session's own state", format_bytes(memory["session_bytes"]))
+        st.metric("Shared dataset (all sessions)", format_bytes(memory["dataset_bytes"]))
+        if memory["process_bytes"] is not None:
+            st.metric("Server process", format_bytes(memory["process_bytes"]))
+        st.caption(f"Dataset cap {format_bytes(memory['dataset_cap'])} (evicted datasets reload from disk), "
+                   f"derived-frame cap {format_bytes(memory['derived_cap'])}.")
+        st.dataframe(memory["caches"].assign(bytes=memory["caches"]["bytes"].map(format_bytes)), hide_index=True)
+        st.dataframe(memory["frames"].assign(bytes=memory["frames"]["bytes"].map(format_bytes)), hide_index=True)
@@ -0,0 +1,131 @@
+"""Background EDA profiling for the preview page.
+
+Reports are generated on a worker thread so the page stays responsive, and are
+kept per (dataset + filter state, sample size): a rerun, or another session
+looking at the same data, picks up the running or finished job instead of
+profiling again. Above ``DEFAULT_SAMPLE_ROWS`` rows the report is built from a
+fixed random sample unless a full run is requested.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from core.memory import track
+from core.tracing import Trace, activate, span
+
+try:
+    from ydata_profiling import ProfileReport
+except ImportError:
+    ProfileReport = None
+
+DEFAULT_SAMPLE_ROWS = 100_000
+MAX_JOBS = 8
+
+# one worker: profiling is CPU heavy and drives matplotlib internally
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile")
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+
+
+def _report_items():
+    with _jobs_lock:
+        return [(key, (job.frame, job.html, job._pdf)) for key, job in _jobs.items()]
+
+
+track("Profile reports", _report_items)
+
+
+class ProfileJob:
+    STAGES = ["Queued", "Computing statistics", "Rendering report", "Done"]
+
+    def __init__(self, frame, total_rows):
+        self.frame = frame
+        self.rows = len(frame)
+        self.total_rows = total_rows
+        self.stage = "Queued"
+        self.started = time.time()
+        self.html = None
+        self.error = None
+        self._pdf = None
+        self._pdf_lock = threading.Lock()
+        self.future = None
+        # the job's own trace (it outlives the page run that started it)
+        self.trace = None
+
+    @property
+    def sampled(self):
+        return self.rows < self.total_rows
+
+    @property
+    def progress(self):
+        return self.STAGES.index(self.stage) / (len(self.STAGES) - 1)
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    def elapsed(self):
+        return time.time() - self.started
+
+    def run(self):
+        self.trace = Trace("Profile report")
+        try:
+            with activate(self.trace):
+                self.stage = "Computing statistics"
+                title = "Pandas Profiling Report"
+                if self.sampled:
+                    title += f" (sample of {self.rows:,} / {self.total_rows:,} rows)"
+                profile = ProfileReport(self.frame, title=title, explorative=True, minimal=True,
+                                        progress_bar=False)
+                with span("Computing statistics", rows=self.rows):
+                    profile.get_description()
+                self.stage = "Rendering report"
+                with span("Rendering report") as attrs:
+                    self.html = profile.to_html()
+                    attrs["payload_bytes"] = len(self.html.encode())
+        except Exception as e:
+            self.error = e
+        finally:
+            # the source rows are no longer needed once the report exists
+            self.frame = None
+            self.trace.finish()
+            self.stage = "Done"
+
+    def pdf(self):
+        """Render the finished report to PDF once, on first request."""
+        import pdfkit
+
+        with self._pdf_lock:
+            if self._pdf is None:
+                self._pdf = pdfkit.from_string(self.html, False)
+            return self._pdf
+
+
+def _sample_rows(view, limit):
+    rows = np.arange(len(view.df)) if view.rows is None else view.rows
+    if len(rows) <= limit:
+        return rows
+    return np.sort(np.random.default_rng(0).choice(rows, limit, replace=False))
+
+
+def profile(view, sample_rows=DEFAULT_SAMPLE_ROWS, full=False):
+    """Return the ``ProfileJob`` for ``view``, starting it if needed."""
+    limit = None if full else sample_rows
+    key = (view.key, limit)
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is not None:
+            _jobs.move_to_end(key)
+            return job
+        if view.pushdown:
+            frame = view.frame(limit=limit or len(view))
+        else:
+            rows = _sample_rows(view, limit) if limit else view.rows
+            frame = view.df if rows is None else view.df.take(rows)
+        job = _jobs[key] = ProfileJob(frame, len(view))
+        job.future = _executor.submit(job.run)
+        while len(_jobs) > MAX_JOBS:
+            _jobs.popitem(last=False)
+        return job
@@ -0,0 +1,89 @@
+"""Process-wide registry of prepared datasets.
+
+Streamlit reruns every page script from the top, but imported modules live for
+the whole server process. The registry keeps one normalized frame per dataset
+content hash and hands every session and rerun the same object, evicting the
+least recently used datasets once their combined size passes ``max_bytes``.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+DEFAULT_MAX_BYTES = int(os.environ.get("EDA_DATASET_CACHE_BYTES", 2 * 1024 ** 3))
+
+# Shared frames are handed out as views; copy-on-write keeps a page's derived
+# frames from ever writing through to the cached data (default from pandas 3).
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+
+def frame_nbytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class DatasetRegistry:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def get(self, key, loader):
+        """Return the frame cached under ``key``, building it with ``loader()`` once."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        # concurrent sessions asking for the same dataset wait for one load
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    return self._entries[key][0]
+            df = loader()
+            with self._lock:
+                self._entries[key] = (df, frame_nbytes(df))
+                self._loading.pop(key, None)
+                self._evict()
+        return df
+
+    def peek(self, key):
+        """The frame cached under ``key``, or None; never loads."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[0]
+
+    def put(self, key, df):
+        """Cache a frame built elsewhere (e.g. a dataset extended in place)."""
+        with self._lock:
+            self._entries[key] = (df, frame_nbytes(df))
+            self._entries.move_to_end(key)
+            self._evict()
+        return df
+
+    def _evict(self):
+        total = sum(size for _, size in self._entries.values())
+        # the most recent entry always stays, even if it alone exceeds the cap
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, (_, size) = self._entries.popitem(last=False)
+            total -= size
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def entries(self):
+        """``(key, bytes)`` of every cached frame, least recently used first."""
+        with self._lock:
+            return [(key, size) for key, (_, size) in self._entries.items()]
+
+    def nbytes(self):
+        with self._lock:
+            return sum(size for _, size in self._entries.values())
+
+
+registry = DatasetRegistry()
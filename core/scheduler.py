@@ -0,0 +1,93 @@
+"""Worker pools for building charts off the script thread.
+
+Two pools, chosen by what a task needs:
+
+* threads (``run_all`` / ``prefetch``) for builders that read the shared
+  in-memory dataset; the aggregation and downsampling they do is mostly numpy
+  and pandas work that releases the GIL;
+* processes (``run_all_processes``) for self-contained tasks, such as
+  builder tiles that read their own columns from the Parquet store, where
+  pure-Python figure construction and serialization should use every core.
+
+Matplotlib is only ever used on standalone figures with an Agg canvas, one
+figure per task, and rendered to PNG inside the worker, which is the
+threading model Matplotlib supports; pyplot's global state is never touched.
+"""
+import concurrent.futures
+import contextvars
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+WORKERS = int(os.environ.get("EDA_CHART_WORKERS", os.cpu_count() or 4))
+# queued prefetches beyond this are dropped, oldest first
+MAX_PREFETCH = max(32, 4 * WORKERS)
+
+_threads = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="chart")
+_processes = None
+_processes_lock = threading.Lock()
+_prefetches = OrderedDict()
+_prefetches_lock = threading.Lock()
+
+
+def run_all(tasks):
+    """Run zero-argument callables on the thread pool; results in task order.
+
+    Tasks run in a copy of the caller's context, so their ``core.tracing``
+    spans join the caller's trace.
+    """
+    futures = [_threads.submit(contextvars.copy_context().run, task) for task in tasks]
+    return [future.result() for future in futures]
+
+
+def _process_pool():
+    global _processes
+    with _processes_lock:
+        if _processes is None:
+            # spawn: forking a multi-threaded server process is unsafe
+            _processes = ProcessPoolExecutor(max_workers=WORKERS,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return _processes
+
+
+def run_all_processes(fn, args_list):
+    """``[fn(*args) for args in args_list]`` on the process pool, in order.
+
+    ``fn`` must be a module-level function and its arguments picklable.
+    """
+    if len(args_list) <= 1:
+        return [fn(*args) for args in args_list]
+    futures = [_process_pool().submit(fn, *args) for args in args_list]
+    return [future.result() for future in futures]
+
+
+def prefetch(key, task, group=None, scope=None):
+    """Start ``task`` in the background unless one for ``key`` is already
+    queued or running. Results are expected to land in a cache.
+
+    A new ``scope`` for a ``group`` (e.g. a session's filter state) cancels the
+    group's prefetches queued for earlier scopes; ones already running finish.
+    """
+    with _prefetches_lock:
+        for done in [k for k, (f, _, _) in _prefetches.items() if f.done()]:
+            del _prefetches[done]
+        if group is not None:
+            for stale in [k for k, (_, g, s) in _prefetches.items() if g == group and s != scope]:
+                if _prefetches[stale][0].cancel():
+                    del _prefetches[stale]
+        if key in _prefetches:
+            return
+        _prefetches[key] = (_threads.submit(task), group, scope)
+        while len(_prefetches) > MAX_PREFETCH:
+            _, (oldest, _, _) = _prefetches.popitem(last=False)
+            oldest.cancel()
+
+
+def wait(key):
+    """Block until the prefetch for ``key`` (if any) has finished."""
+    with _prefetches_lock:
+        future, _, _ = _prefetches.get(key, (None, None, None))
+    if future is not None:
+        concurrent.futures.wait([future])
@@ -0,0 +1,410 @@
+"""Mergeable per-partition statistics for the dashboard's KPIs and insights.
+
+A ``PartitionSummary`` splits a dataset into partitions by (day of the date
+column, value of the category column), which is what the sidebar filters on,
+and keeps small summaries per partition:
+
+* the row count and, per numeric or date column, the sum, count, min and max;
+* per category column (built on first use), the ``TOP_K`` most frequent values
+  with their counts, plus the largest count left out, which bounds the count
+  of every value that was not kept;
+* per numeric column (built on first use), a quantile sketch: the values at
+  ranks ceil(j * n / QUANTILE_POINTS), j = 1..QUANTILE_POINTS, each weighted
+  by the number of ranks it stands for (every value when n is small).
+
+All of them merge by adding up, so statistics for any filter combination that
+lines up with partitions (whole days, values of the partition column) come from
+the selected partitions only, whatever the row count. Sums, counts, extrema
+and the date range are exact. A merged top value's count lies between its
+kept counts and that plus the left-out counts of the partitions that did not
+keep it; a merged quantile's rank is off by at most the sum over partitions of
+(largest weight - 1).
+
+Filters that cut through partitions, and the opt-in exact mode, use the exact
+aggregates of ``core.aggregate`` instead (``ExactStatistics``).
+"""
+import itertools
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from core.aggregate import column_range, column_totals, quantile, top_value
+from core.cache import LRUCache
+from core.duckdb_backend import quote
+from core.filters import FilterIndex
+from core.memory import sizeof, track
+from core.tracing import traced
+from core.type_inference import column_groups
+
+TOP_K = 32
+QUANTILE_POINTS = 128
+# a category column with more distinct values than this is not partitioned on
+MAX_PARTITION_CATEGORIES = 256
+MAX_SUMMARIES = 8
+
+# ``count`` is None when it was not computed; ``error`` bounds how far the
+# true count can be above ``count``
+TopValue = namedtuple("TopValue", ["value", "count", "error"])
+# ``rank_error`` bounds the distance of ``value``'s rank from the requested
+# one, as a fraction of the rows
+Quantile = namedtuple("Quantile", ["value", "rank_error"])
+
+_table_ids = itertools.count()
+
+
+def _codes(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy().astype(np.int64), pd.Index(series.cat.categories)
+    codes, uniques = pd.factorize(series)
+    return codes.astype(np.int64), pd.Index(uniques)
+
+
+def _rank_weights(part, rank):
+    """Weights of rank points sorted by (partition, rank): the ranks since the
+    previous point of the same partition."""
+    previous = np.r_[0, rank[:-1]]
+    previous[np.r_[True, part[1:] != part[:-1]]] = 0
+    return rank - previous
+
+
+def _top_k(part, values, counts):
+    """Split per-partition counts sorted by (partition, count descending) into
+    the ``TOP_K`` kept per partition and the largest left-out count of each."""
+    starts = np.flatnonzero(np.r_[True, part[1:] != part[:-1]])
+    sizes = np.diff(np.r_[starts, len(part)])
+    rank = np.arange(len(part)) - np.repeat(starts, sizes)
+    kept = rank < TOP_K
+    left_out = rank == TOP_K
+    return (part[kept], values[kept], counts[kept]), (part[left_out], counts[left_out])
+
+
+class _FrameSource:
+    """Partition ids of the rows of an in-memory frame."""
+
+    def __init__(self, df, part, keys):
+        self.df = df
+        self.part = part
+        self.keys = keys
+
+    @classmethod
+    def build(cls, df, date_col, cat_col):
+        n = len(df)
+        if date_col is not None:
+            day = df[date_col]
+            if getattr(day.dt, "tz", None) is not None:
+                day = day.dt.tz_localize(None)
+            day_codes, days = _codes(day.dt.floor("D"))
+        else:
+            day_codes, days = np.full(n, -1, dtype=np.int64), pd.DatetimeIndex([])
+        if cat_col is not None:
+            cat_codes, cats = _codes(df[cat_col])
+        else:
+            cat_codes, cats = np.full(n, -1, dtype=np.int64), pd.Index([], dtype=object)
+        width = len(cats) + 1
+        part, combined = pd.factorize((day_codes + 1) * width + (cat_codes + 1))
+        keys = pd.DataFrame({
+            "day": pd.DatetimeIndex(days).take(combined // width - 1, allow_fill=True, fill_value=pd.NaT),
+            "cat": cats.take(combined % width - 1, allow_fill=True, fill_value=np.nan),
+            "rows": np.bincount(part, minlength=len(combined)),
+        })
+        return cls(df, part, keys)
+
+    def stats(self, columns, numeric):
+        frame = self.df[columns]
+        grouped = frame.groupby(self.part)
+        sums = frame[numeric].groupby(self.part).sum()
+        return sums, grouped.count(), grouped.min(), grouped.max()
+
+    def quantile_points(self, col):
+        values = self.df[col].to_numpy(dtype=float, na_value=np.nan)
+        present = ~np.isnan(values)
+        part, values = self.part[present], values[present]
+        order = np.lexsort((values, part))
+        part, values = part[order], values[order]
+        starts = np.flatnonzero(np.r_[True, part[1:] != part[:-1]])
+        sizes = np.diff(np.r_[starts, len(part)])
+        rank = np.arange(len(part)) - np.repeat(starts, sizes) + 1
+        n = np.repeat(sizes, sizes)
+        # rank r is a point when some j has ceil(j * n / QUANTILE_POINTS) == r
+        chosen = (rank * QUANTILE_POINTS) // n > ((rank - 1) * QUANTILE_POINTS) // n
+        part, rank = part[chosen], rank[chosen]
+        return part, values[chosen], _rank_weights(part, rank)
+
+    def value_counts(self, col):
+        codes, uniques = _codes(self.df[col])
+        present = codes >= 0
+        pairs = pd.Series(self.part[present] * max(len(uniques), 1) + codes[present]).value_counts(sort=False)
+        part = pairs.index.to_numpy() // max(len(uniques), 1)
+        counts = pairs.to_numpy()
+        order = np.lexsort((-counts, part))
+        values = uniques.take(pairs.index.to_numpy()[order] % max(len(uniques), 1)).to_numpy(dtype=object)
+        return part[order], values, counts[order]
+
+
+class _DuckDBSource:
+    """Partition ids of the rows of a ``DuckDBIndex``, kept in a table next to
+    its ``data`` view."""
+
+    def __init__(self, index, date_col, cat_col):
+        self.index = index
+        self.table = f"partitions_{next(_table_ids)}"
+        day = f"date_trunc('day', {quote(date_col)})" if date_col is not None else "CAST(NULL AS TIMESTAMP)"
+        cat = quote(cat_col) if cat_col is not None else "NULL"
+        index.query(f"""
+            CREATE TABLE {self.table} AS
+            SELECT row_number() OVER () - 1 AS part, day, cat, rows
+            FROM (SELECT {day} AS day, {cat} AS cat, count(*) AS rows FROM data GROUP BY ALL)""")
+        self.source = (f"data JOIN {self.table} p ON {day} IS NOT DISTINCT FROM p.day "
+                       f"AND {cat} IS NOT DISTINCT FROM p.cat")
+        keys = index.query(f"SELECT day, cat, rows FROM {self.table} ORDER BY part").df()
+        keys["day"] = pd.to_datetime(keys["day"])
+        self.keys = keys
+
+    def _by_part(self, frame):
+        return frame.set_index("part").reindex(np.arange(len(self.keys)))
+
+    def stats(self, columns, numeric):
+        exprs = ["count(*)"] + [f"sum({quote(col)})" for col in numeric]
+        for name in ("count", "min", "max"):
+            exprs += [f"{name}({quote(col)})" for col in columns]
+        result = self.index.query(f"SELECT p.part, {', '.join(exprs)} FROM {self.source} GROUP BY p.part").df()
+        result = result.drop(columns=result.columns[1])
+        result = self._by_part(result)
+        blocks = [numeric, columns, columns, columns]
+        out, start = [], 0
+        for block in blocks:
+            part = result.iloc[:, start:start + len(block)]
+            out.append(part.set_axis(block, axis=1))
+            start += len(block)
+        out[1] = out[1].fillna(0).astype(np.int64)
+        return tuple(out)
+
+    def quantile_points(self, col):
+        value = quote(col)
+        result = self.index.query(f"""
+            SELECT part, v, r FROM (
+                SELECT p.part, CAST({value} AS DOUBLE) AS v,
+                       row_number() OVER (PARTITION BY p.part ORDER BY {value}) AS r,
+                       count(*) OVER (PARTITION BY p.part) AS n
+                FROM {self.source} WHERE {value} IS NOT NULL)
+            WHERE (r * {QUANTILE_POINTS}) // n > ((r - 1) * {QUANTILE_POINTS}) // n
+            ORDER BY part, r""").fetchnumpy()
+        part, rank = result["part"].astype(np.int64), result["r"].astype(np.int64)
+        return part, result["v"].astype(float), _rank_weights(part, rank)
+
+    def value_counts(self, col):
+        value = quote(col)
+        result = self.index.query(f"""
+            SELECT part, v, n FROM (
+                SELECT p.part, {value} AS v, count(*) AS n
+                FROM {self.source} WHERE {value} IS NOT NULL GROUP BY p.part, {value})
+            QUALIFY row_number() OVER (PARTITION BY part ORDER BY n DESC) <= {TOP_K + 1}
+            ORDER BY part, n DESC""").df()
+        return (result["part"].to_numpy(dtype=np.int64), result["v"].to_numpy(dtype=object),
+                result["n"].to_numpy(dtype=np.int64))
+
+
+class PartitionSummary:
+    def __init__(self, source, date_col, cat_col, columns, numeric, stats=None):
+        self.source = source
+        self.date_col = date_col
+        self.cat_col = cat_col
+        self.keys = source.keys
+        self.columns = list(columns)
+        self.numeric = list(numeric)
+        stats = stats if stats is not None else source.stats(self.columns, self.numeric)
+        self._sum, self._count, self._min, self._max = stats
+        self._quantiles = {}
+        self._top = {}
+        self._lock = threading.Lock()
+
+    def nbytes(self):
+        with self._lock:
+            pieces = [self.keys, self._sum, self._count, self._min, self._max,
+                      list(self._quantiles.values()), list(self._top.values())]
+        part = getattr(self.source, "part", None)
+        return sizeof(pieces) + (0 if part is None else part.nbytes)
+
+    def quantile_points(self, col):
+        with self._lock:
+            if col not in self._quantiles:
+                self._quantiles[col] = self.source.quantile_points(col)
+            return self._quantiles[col]
+
+    def top_counts(self, col):
+        with self._lock:
+            if col not in self._top:
+                kept, (left_part, left_counts) = _top_k(*self.source.value_counts(col))
+                left_out = np.zeros(len(self.keys), dtype=np.int64)
+                left_out[left_part] = left_counts
+                self._top[col] = kept + (left_out,)
+            return self._top[col]
+
+    def select(self, date=None, categories=None):
+        """``SketchStatistics`` of the rows ``FilterIndex.select(date,
+        categories)`` would give, or None when a filter cuts through partitions."""
+        mask = np.ones(len(self.keys), dtype=bool)
+        if date is not None:
+            col, start, end = date
+            start, end = pd.Timestamp(start), pd.Timestamp(end)
+            after_end = end + pd.Timedelta(1, "ns")
+            if col != self.date_col or start != start.normalize() or after_end != after_end.normalize():
+                return None
+            days = self.keys["day"]
+            mask &= ((days >= start) & (days <= end)).to_numpy()
+        if categories is not None:
+            col, selected = categories
+            if col != self.cat_col:
+                return None
+            mask &= self.keys["cat"].isin(list(selected)).to_numpy()
+        return SketchStatistics(self, mask)
+
+    def extended(self, df, parent_rows):
+        """Summary of ``df``, this summary's frame with rows appended: the new
+        rows' partitions are summarized and added after the existing ones."""
+        delta = PartitionSummary(_FrameSource.build(df.iloc[parent_rows:], self.date_col, self.cat_col),
+                                 self.date_col, self.cat_col, self.columns, self.numeric)
+        offset = len(self.keys)
+        shift = lambda frame: frame.set_axis(frame.index + offset)
+        source = _FrameSource(df, np.concatenate([self.source.part, delta.source.part + offset]),
+                              pd.concat([self.keys, delta.keys], ignore_index=True))
+        stats = [pd.concat([old, shift(new)]) for old, new in zip(
+            (self._sum, self._count, self._min, self._max),
+            (delta._sum, delta._count, delta._min, delta._max))]
+        summary = PartitionSummary(source, self.date_col, self.cat_col, self.columns, self.numeric, stats)
+        with self._lock:
+            quantiles, top = dict(self._quantiles), dict(self._top)
+        for col, (part, values, weights) in quantiles.items():
+            new_part, new_values, new_weights = delta.quantile_points(col)
+            summary._quantiles[col] = (np.concatenate([part, new_part + offset]),
+                                       np.concatenate([values, new_values]),
+                                       np.concatenate([weights, new_weights]))
+        for col, (part, values, counts, left_out) in top.items():
+            new_part, new_values, new_counts, new_left_out = delta.top_counts(col)
+            summary._top[col] = (np.concatenate([part, new_part + offset]),
+                                 np.concatenate([values, new_values]),
+                                 np.concatenate([counts, new_counts]),
+                                 np.concatenate([left_out, new_left_out]))
+        return summary
+
+
+class SketchStatistics:
+    """Statistics of the partitions selected by ``mask``, merged."""
+    exact = False
+
+    def __init__(self, summary, mask):
+        self.summary = summary
+        self.mask = mask
+
+    @property
+    def partitions(self):
+        return int(self.mask.sum())
+
+    def __len__(self):
+        return int(self.summary.keys["rows"].to_numpy()[self.mask].sum())
+
+    def column_totals(self, columns):
+        return self.summary._sum.loc[self.mask, list(columns)].sum()
+
+    def column_range(self, col):
+        return self.summary._min.loc[self.mask, col].min(), self.summary._max.loc[self.mask, col].max()
+
+    def top_value(self, col):
+        part, values, counts, left_out = self.summary.top_counts(col)
+        selected = self.mask[part]
+        if not selected.any():
+            return TopValue(None, 0, 0)
+        values = values[selected]
+        lower = pd.Series(counts[selected]).groupby(values).sum()
+        # the left-out counts of the partitions that did keep each value do not
+        # apply to it
+        kept_left_out = pd.Series(left_out[part[selected]]).groupby(values).sum()
+        upper = lower + left_out[self.mask].sum() - kept_left_out
+        top = lower.idxmax()
+        return TopValue(top, int(lower[top]), int(upper[top] - lower[top]))
+
+    def quantile(self, col, q):
+        part, values, weights = self.summary.quantile_points(col)
+        selected = self.mask[part]
+        values, weights = values[selected], weights[selected]
+        total = weights.sum()
+        if not total:
+            return Quantile(np.nan, 0.0)
+        order = np.argsort(values, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        target = max(1, int(np.ceil(q * total)))
+        value = values[order][np.searchsorted(cumulative, target)]
+        counts = self.summary._count.loc[self.mask, col].to_numpy()
+        error = np.maximum(-(-counts // QUANTILE_POINTS) - 1, 0).sum()
+        return Quantile(value, float(error / total))
+
+
+class ExactStatistics:
+    """The same statistics computed over every row of a view."""
+    exact = True
+
+    def __init__(self, view):
+        self.view = view
+
+    def __len__(self):
+        return len(self.view)
+
+    def column_totals(self, columns):
+        return column_totals(self.view, columns)
+
+    def column_range(self, col):
+        return column_range(self.view, col)
+
+    def top_value(self, col):
+        return TopValue(top_value(self.view, col), None, 0)
+
+    def quantile(self, col, q):
+        return Quantile(quantile(self.view, col, q), 0.0)
+
+
+_summaries = LRUCache(maxsize=MAX_SUMMARIES)
+track("Partition summaries", _summaries.items)
+
+
+def _build(index, date_col, cat_col):
+    date_cols, numeric, _ = column_groups(index.head())
+    if isinstance(index, FilterIndex):
+        if cat_col is not None and index.df[cat_col].nunique() > MAX_PARTITION_CATEGORIES:
+            cat_col = None
+        source = _FrameSource.build(index.df, date_col, cat_col)
+    else:
+        if cat_col is not None:
+            (distinct,) = index.query(f"SELECT approx_count_distinct({quote(cat_col)}) FROM data").fetchone()
+            if distinct > MAX_PARTITION_CATEGORIES:
+                cat_col = None
+        source = _DuckDBSource(index, date_col, cat_col)
+    return PartitionSummary(source, date_col, cat_col, numeric + date_cols, numeric)
+
+
+def partition_summary(index, date_col=None, cat_col=None):
+    """The ``PartitionSummary`` of an index's dataset by ``date_col`` and
+    ``cat_col``, built once per process."""
+    key = (index.dataset_id, date_col, cat_col)
+    return _summaries.get_or_compute(key, lambda: _build(index, date_col, cat_col))
+
+
+@traced("KPI statistics")
+def statistics(index, view, date_col=None, cat_col=None, date=None, categories=None, exact=False):
+    """Statistics of ``view`` (``index.select(date, categories)``): merged
+    partition sketches, or exact ones when asked for or when the filters do
+    not line up with partitions."""
+    if not exact:
+        found = partition_summary(index, date_col, cat_col).select(date, categories)
+        if found is not None:
+            return found
+    return ExactStatistics(view)
+
+
+def extend_summaries(parent_id, dataset_id, df, parent_rows):
+    """Carry the parent dataset's in-memory summaries over to ``df`` (the
+    parent's frame with rows appended) under ``dataset_id``."""
+    for (key_id, date_col, cat_col), summary in _summaries.items():
+        if key_id == parent_id and isinstance(summary.source, _FrameSource):
+            _summaries.put((dataset_id, date_col, cat_col), summary.extended(df, parent_rows))
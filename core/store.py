@@ -0,0 +1,149 @@
+"""Columnar on-disk store for uploaded datasets.
+
+Every upload is written once as Parquet under ``STORE_DIR``, named by the hash
+of the uploaded bytes, so re-uploading the same file skips parsing entirely and
+the pages can read back only the columns they use (memory-mapped).
+
+Appending rows writes a new version of a dataset under its own name: the
+parent's row groups are copied batch by batch, followed by the new rows, so
+nothing is parsed again. Small string metadata (such as how many source bytes
+a CSV dataset was read from) is kept in the Parquet footer.
+"""
+import hashlib
+import os
+import re
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from core.tracing import traced
+
+STORE_DIR = "uploaded_data"
+HASH_BLOCK_BYTES = 1 << 20
+
+
+METADATA_PREFIX = b"eda."
+
+
+def content_hash(file, limit=None):
+    """Hash a file-like object's bytes (the first ``limit`` of them, if given)
+    without reading it into one buffer."""
+    digest = hashlib.blake2b(digest_size=16)
+    file.seek(0)
+    remaining = limit
+    while remaining is None or remaining > 0:
+        block = file.read(HASH_BLOCK_BYTES if remaining is None else min(HASH_BLOCK_BYTES, remaining))
+        if not block:
+            break
+        digest.update(block)
+        if remaining is not None:
+            remaining -= len(block)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def is_digest(value):
+    """Whether ``value`` has the form of a dataset id (a 16-byte hex digest),
+    e.g. before a query parameter is used in a path."""
+    return isinstance(value, str) and re.fullmatch(r"[0-9a-f]{32}", value) is not None
+
+
+def dataset_path(digest):
+    return os.path.join(STORE_DIR, f"{digest}.parquet")
+
+
+def _to_arrow(df):
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        pass
+    # mixed scalars or ragged nested values (common after json_normalize)
+    # have no single Arrow type; store those columns as text
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True) not in ("string", "empty"):
+            df[col] = df[col].map(lambda v: v if v is None or isinstance(v, str) else str(v))
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _with_metadata(schema, metadata):
+    if not metadata:
+        return schema
+    extra = {METADATA_PREFIX + key.encode(): str(value).encode() for key, value in metadata.items()}
+    return schema.with_metadata({**(schema.metadata or {}), **extra})
+
+
+@traced("Write Parquet")
+def save_dataset(df, digest, metadata=None):
+    os.makedirs(STORE_DIR, exist_ok=True)
+    path = dataset_path(digest)
+    tmp_path = f"{path}.tmp"
+    table = _to_arrow(df)
+    pq.write_table(table.replace_schema_metadata(_with_metadata(table.schema, metadata).metadata), tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def dataset_metadata(path):
+    """The metadata saved with a dataset, as a dict of strings."""
+    metadata = pq.ParquetFile(path).schema_arrow.metadata or {}
+    return {key[len(METADATA_PREFIX):].decode(): value.decode()
+            for key, value in metadata.items() if key.startswith(METADATA_PREFIX)}
+
+
+def dataset_rows(path):
+    return pq.ParquetFile(path).metadata.num_rows
+
+
+def _common_type(a, b):
+    if a == b:
+        return a
+    try:
+        common = pa.unify_schemas([pa.schema([("c", a)]), pa.schema([("c", b)])],
+                                  promote_options="permissive").field("c").type
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        # e.g. categories appended to plain text, or numbers to text
+        return pa.string()
+    if pa.types.is_float32(common) and any(pa.types.is_integer(t) and t.bit_width > 16 for t in (a, b)):
+        return pa.float64()
+    return common
+
+
+def append_dataset(parent_path, df, digest, metadata=None):
+    """Store the rows of ``parent_path`` followed by ``df`` (same columns, in the
+    same order) as dataset ``digest``. Columns whose stored types differ are
+    widened to a type that holds both."""
+    parent = pq.ParquetFile(parent_path)
+    new_rows = _to_arrow(df)
+    fields = [pa.field(field.name, _common_type(field.type, new_rows.schema.field(i).type))
+              for i, field in enumerate(parent.schema_arrow)]
+    # pandas metadata would describe the parent's column types, not the widened ones
+    schema = _with_metadata(pa.schema(fields), metadata)
+
+    os.makedirs(STORE_DIR, exist_ok=True)
+    path = dataset_path(digest)
+    tmp_path = f"{path}.tmp"
+    with pq.ParquetWriter(tmp_path, schema) as writer:
+        for batch in parent.iter_batches():
+            writer.write_table(pa.Table.from_batches([batch]).cast(schema))
+        writer.write_table(new_rows.replace_schema_metadata().cast(schema))
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_columns(path):
+    return pq.ParquetFile(path).schema_arrow.names
+
+
+@traced("Read Parquet")
+def read_dataset(path, columns=None):
+    table = pq.read_table(path, columns=columns, memory_map=True)
+    return table.to_pandas(self_destruct=True)
+
+
+def read_head(path, n=5):
+    batch = next(pq.ParquetFile(path).iter_batches(batch_size=n), None)
+    if batch is None:
+        return pd.DataFrame(columns=read_columns(path))
+    return batch.to_pandas()
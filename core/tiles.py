@@ -0,0 +1,135 @@
+"""Figure building for the Dashboard Builder's tiles.
+
+A tile is a plain spec dict (``type``, ``x``, ``y``). ``build_tile`` reads just
+the columns it plots from the stored dataset and returns the figure as Plotly
+JSON, built from aggregates where the chart allows it, so the payload does
+not grow with the row count. Results are cached per (data version, tile spec),
+so only tiles whose spec or data changed are rebuilt; misses can be built in
+worker processes (see ``core.scheduler``).
+
+Tiles load plotly.js from one bundle written into the app's ``static/`` folder
+and served by Streamlit (``server.enableStaticServing``), so the browser
+fetches and caches it once for every tile and no CDN is needed.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.offline
+
+from core.cache import LRUCache
+from core.downsample import downsample_line, downsample_points
+from core.memory import track
+from core.scheduler import run_all_processes
+from core.store import read_dataset
+from core.tracing import span
+
+TILE_TYPES = ["Scatter", "Bar", "Line", "Histogram", "Pie"]
+HISTOGRAM_BINS = 50
+
+# Streamlit serves <main script dir>/static at /app/static
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+STATIC_URL = "/app/static"
+
+_figures = LRUCache(maxsize=256)
+track("Builder tile figures", _figures.items)
+
+
+def tile_columns(tile):
+    if tile["type"] == "Histogram":
+        return [tile["x"]]
+    return list(dict.fromkeys([tile["x"], tile["y"]]))
+
+
+def _totals(df, x, y):
+    """Sum of ``y`` per ``x``: what a bar or pie of the raw rows adds up to."""
+    if not pd.api.types.is_numeric_dtype(df[y]) or x == y:
+        return df
+    return df.groupby(x, observed=True, sort=False)[y].sum().reset_index()
+
+
+def tile_figure(df, tile):
+    x, y = tile["x"], tile["y"]
+    if tile["type"] == "Scatter":
+        return px.scatter(downsample_points(df, x, y), x=x, y=y)
+    if tile["type"] == "Bar":
+        return px.bar(_totals(df, x, y), x=x, y=y)
+    if tile["type"] == "Line":
+        return px.line(downsample_line(df, x, y), x=x, y=y)
+    if tile["type"] == "Histogram":
+        values = df[x].dropna()
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            counts, edges = np.histogram(values.to_numpy(dtype=float), bins=HISTOGRAM_BINS)
+            fig = px.bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, labels={"x": x, "y": "count"})
+            return fig.update_layout(bargap=0)
+        counts = values.value_counts(sort=False)
+        return px.bar(x=counts.index.astype(str), y=counts.to_numpy(), labels={"x": x, "y": "count"})
+    if tile["type"] == "Pie":
+        return px.pie(_totals(df, x, y), names=x, values=y)
+    raise ValueError(f"Unknown tile type: {tile['type']}")
+
+
+def build_tile(path, tile):
+    """Plotly JSON for one tile, read straight from the stored dataset."""
+    df = read_dataset(path, columns=tile_columns(tile))
+    return tile_figure(df, tile).to_json()
+
+
+def tile_key(data_version, tile):
+    return (data_version, tile["type"], tile["x"], tile["y"])
+
+
+def tile_figures(data_version, path, tiles):
+    """Figure JSON for every tile, in order, building only the cache misses
+    (in parallel)."""
+    found = {}
+    missing = []
+    for tile in tiles:
+        key = tile_key(data_version, tile)
+        cached = _figures.get(key)
+        if cached is not None:
+            found[key] = cached
+        elif key not in found:
+            found[key] = None
+            missing.append(tile)
+    with span("Build tiles", tiles=len(tiles), built=len(missing)) as attrs:
+        for tile, fig_json in zip(missing, run_all_processes(build_tile, [(path, tile) for tile in missing])):
+            key = tile_key(data_version, tile)
+            found[key] = _figures.put(key, fig_json)
+        figures = [found[tile_key(data_version, tile)] for tile in tiles]
+        attrs["payload_bytes"] = sum(len(fig_json) for fig_json in figures)
+    return figures
+
+
+def prime_tile_figures(data_version, tiles, rendered):
+    """Seed the cache with figures rendered earlier, keyed like ``tile_key``."""
+    for tile in tiles:
+        key = tile_key(data_version, tile)
+        if key in rendered:
+            _figures.put(key, rendered[key])
+
+
+def plotly_bundle_url():
+    """URL of the locally served plotly.js, writing the bundle on first use."""
+    name = f"plotly-{plotly.offline.get_plotlyjs_version()}.min.js"
+    path = os.path.join(STATIC_DIR, name)
+    if not os.path.exists(path):
+        os.makedirs(STATIC_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(plotly.offline.get_plotlyjs())
+        os.replace(tmp, path)
+    return f"{STATIC_URL}/{name}"
+
+
+def tile_document(fig_json, bundle_url):
+    """Small HTML page drawing ``fig_json`` with the shared bundle."""
+    # a "</script>" inside the data must not close the script element
+    fig_json = fig_json.replace("</", "<\\/")
+    return f"""<html><head><meta charset="utf-8"><script src="{bundle_url}"></script>
+<style>html, body, #plot {{ margin: 0; width: 100%; height: 100%; }}</style></head>
+<body><div id="plot"></div><script>
+var fig = {fig_json};
+Plotly.newPlot("plot", fig.data, fig.layout, {{responsive: true}});
+</script></body></html>"""
@@ -0,0 +1,222 @@
+"""Timing spans for the stages behind a page run.
+
+Each page starts a ``Trace`` when it runs; the stages it goes through (parsing
+an upload, type inference, loading and filtering the dataset, KPI statistics,
+chart builds, builder tiles, the profile report) record spans into it with
+``span`` or ``traced``: wall time, the change in the process's resident memory
+(when psutil is installed; other sessions' work shows up in it too) and
+attributes such as the payload bytes sent to the browser for a chart. Spans
+nest, and tasks run through ``core.scheduler.run_all`` record into the trace
+of the run that submitted them. Outside a trace, spans cost next to nothing.
+
+Pages keep their last ``MAX_TRACES`` traces in session state
+(``keep_trace``) for the performance panel, which exports them as JSON or as
+Chrome trace events (chrome://tracing or https://ui.perfetto.dev).
+"""
+import contextvars
+import functools
+import json
+import os
+import platform
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from core.memory import format_bytes, sizeof
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MAX_TRACES = 20
+TRACES_KEY = "traces"
+
+Span = namedtuple("Span", "name start seconds memory_delta rss thread depth attrs")
+
+_current = contextvars.ContextVar("trace", default=None)
+_depth = contextvars.ContextVar("trace_depth", default=0)
+_process = psutil.Process() if psutil is not None else None
+
+
+def _rss():
+    return _process.memory_info().rss if _process is not None else None
+
+
+class Trace:
+    """The spans recorded during one page run (or one background job)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.thread = threading.current_thread().name
+        self.seconds = None
+        self.spans = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def finish(self):
+        if self.seconds is None:
+            self.seconds = time.perf_counter() - self._origin
+        return self
+
+    def elapsed(self):
+        if self.seconds is not None:
+            return self.seconds
+        with self._lock:
+            return max((s.start + s.seconds for s in self.spans), default=0.0)
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        return {"name": self.name, "started": self.started, "thread": self.thread,
+                "seconds": self.elapsed(), "spans": [s._asdict() for s in spans]}
+
+
+def start_trace(name):
+    """Start a trace and make it the current one for this thread's run."""
+    trace = Trace(name)
+    _current.set(trace)
+    _depth.set(0)
+    return trace
+
+
+@contextmanager
+def activate(trace):
+    """Record spans of the enclosed block into ``trace`` (for worker threads)."""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Record the enclosed block as a span of the current trace.
+
+    Yields the span's attribute dict, which the block may add to.
+    """
+    trace = _current.get()
+    if trace is None:
+        yield attrs
+        return
+    depth = _depth.get()
+    token = _depth.set(depth + 1)
+    before = _rss()
+    start = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        seconds = time.perf_counter() - start
+        _depth.reset(token)
+        after = _rss()
+        trace.add(Span(name, start - trace._origin, seconds, None if after is None else after - before,
+                       after, threading.current_thread().name, depth, attrs))
+
+
+def traced(name):
+    """Decorator: record each call of the function as a span ``name``."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def payload_bytes(kind, payload):
+    """Approximate bytes sent to the browser for one chart item."""
+    if kind in ("plotly", "altair"):
+        return len(payload.to_json())
+    if isinstance(payload, str):
+        return len(payload.encode())
+    return sizeof(payload)
+
+
+def keep_trace(session_state, trace):
+    """Add ``trace`` to the session's recent traces (once), dropping the oldest."""
+    traces = session_state.get(TRACES_KEY, [])
+    if not any(t is trace for t in traces):
+        session_state[TRACES_KEY] = (traces + [trace])[-MAX_TRACES:]
+
+
+def describe_trace(trace):
+    clock = time.strftime("%H:%M:%S", time.localtime(trace.started))
+    return f"{trace.name} at {clock} ({trace.elapsed() * 1000:,.0f} ms)"
+
+
+def span_table(trace):
+    """The spans of ``trace`` in start order, formatted for display."""
+    rows = []
+    for s in sorted(trace.to_dict()["spans"], key=lambda s: s["start"]):
+        attrs = dict(s["attrs"])
+        payload = attrs.pop("payload_bytes", None)
+        rows.append({
+            "span": "· " * s["depth"] + s["name"],
+            "ms": round(s["seconds"] * 1000, 2),
+            "start ms": round(s["start"] * 1000, 1),
+            "memory Δ": "" if s["memory_delta"] is None else format_bytes(s["memory_delta"]),
+            "payload": "" if payload is None else format_bytes(payload),
+            "thread": s["thread"],
+            "details": ", ".join(f"{k}={v}" for k, v in attrs.items()),
+        })
+    return pd.DataFrame(rows, columns=["span", "ms", "start ms", "memory Δ", "payload", "thread", "details"])
+
+
+def environment():
+    """What the timings were measured on, for comparing exports across releases."""
+    return {"python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+            "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def _json_default(value):
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+def to_json(traces):
+    """``traces`` with their spans (seconds, bytes) as a JSON document."""
+    return json.dumps({"environment": environment(), "traces": [t.to_dict() for t in traces]},
+                      indent=1, default=_json_default)
+
+
+def to_chrome_trace(traces):
+    """``traces`` as Chrome trace events: one complete event per span on its
+    thread's track, plus a resident-memory counter."""
+    pid = os.getpid()
+    tids = {}
+    events = []
+
+    def tid(thread):
+        if thread not in tids:
+            tids[thread] = len(tids) + 1
+            events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": tids[thread],
+                           "args": {"name": thread}})
+        return tids[thread]
+
+    for trace in traces:
+        data = trace.to_dict()
+        base = data["started"] * 1e6
+        events.append({"ph": "X", "name": data["name"], "cat": "page", "pid": pid, "tid": tid(data["thread"]),
+                       "ts": base, "dur": data["seconds"] * 1e6})
+        for s in data["spans"]:
+            args = dict(s["attrs"])
+            if s["memory_delta"] is not None:
+                args["memory_delta"] = s["memory_delta"]
+            end = base + (s["start"] + s["seconds"]) * 1e6
+            events.append({"ph": "X", "name": s["name"], "cat": data["name"], "pid": pid, "tid": tid(s["thread"]),
+                           "ts": base + s["start"] * 1e6, "dur": s["seconds"] * 1e6, "args": args})
+            if s["rss"] is not None:
+                events.append({"ph": "C", "name": "Resident memory", "pid": pid, "ts": end,
+                               "args": {"bytes": s["rss"]}})
+    return json.dumps({"traceEvents": events, "displayTimeUnit": "ms", "otherData": environment()},
+                      default=_json_default)
@@ -0,0 +1,196 @@
+"""Sampled column type inference.
+
+Each text column is classified from an evenly spaced sample of its values,
+trying boolean, numeric and then a fixed list of date formats. Only when the
+sample settles on a type is the whole column parsed, once, with that exact
+format; a column whose full parse disagrees with its sample stays text.
+Categorical columns are inferred and converted through their categories, so a
+column with a handful of distinct dates costs a handful of parses.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+SAMPLE_SIZE = 1000
+# candidates are first checked on this many values so most are rejected cheaply
+PROBE_SIZE = 20
+# share of distinct values in the sample below which text is categorical
+CATEGORY_RATIO = 0.5
+CACHE_SIZE = 4096
+
+# tried in this order; month-first before day-first, matching pandas' default
+DATE_FORMATS = [
+    "ISO8601",
+    "%m/%d/%Y",
+    "%d/%m/%Y",
+    "%m/%d/%Y %H:%M",
+    "%d/%m/%Y %H:%M",
+    "%m/%d/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M:%S",
+    "%d-%m-%Y",
+    "%Y/%m/%d",
+    "%d.%m.%Y",
+    "%d %b %Y",
+    "%b %d, %Y",
+    "%d %B %Y",
+    "%B %d, %Y",
+]
+BOOL_VALUES = {"true": True, "false": False, "yes": True, "no": False}
+
+DATETIME = "datetime"
+NUMERIC = "numeric"
+BOOLEAN = "boolean"
+CATEGORICAL = "categorical"
+TEXT = "text"
+
+ColumnType = namedtuple("ColumnType", ["kind", "fmt"])
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _is_text(series):
+    return series.dtype == object or isinstance(series.dtype, pd.StringDtype)
+
+
+def _sample(series, size):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        values = pd.Series(series.cat.categories)
+    else:
+        values = series
+    if len(values) > size:
+        values = values.iloc[np.linspace(0, len(values) - 1, size).astype(int)]
+    return values.dropna()
+
+
+def _parse_dates(values, fmt):
+    return pd.to_datetime(values, format=fmt, errors="coerce")
+
+
+def _parse_numbers(values):
+    return pd.to_numeric(values, errors="coerce")
+
+
+def _parse_bools(values):
+    return values.astype(str).str.strip().str.lower().map(BOOL_VALUES)
+
+
+def _all_parsed(parsed, values):
+    return parsed.notna().sum() == values.notna().sum()
+
+
+def _matches(sample, parse):
+    probe = sample.iloc[:PROBE_SIZE]
+    if not _all_parsed(parse(probe), probe):
+        return False
+    return len(sample) <= PROBE_SIZE or _all_parsed(parse(sample), sample)
+
+
+def _classify(sample, is_categorical):
+    if sample.empty:
+        return ColumnType(TEXT, None)
+    if not all(isinstance(v, str) for v in sample):
+        # mixed or nested values (e.g. lists from json_normalize)
+        return ColumnType(TEXT, None)
+    if all(v.strip().lower() in BOOL_VALUES for v in sample):
+        return ColumnType(BOOLEAN, None)
+    if _matches(sample, _parse_numbers):
+        return ColumnType(NUMERIC, None)
+    for fmt in DATE_FORMATS:
+        if _matches(sample, lambda values: _parse_dates(values, fmt)):
+            return ColumnType(DATETIME, fmt)
+    if is_categorical or sample.nunique() <= CATEGORY_RATIO * len(sample):
+        return ColumnType(CATEGORICAL, None)
+    return ColumnType(TEXT, None)
+
+
+def infer_column(series, sample_size=SAMPLE_SIZE):
+    if pd.api.types.is_bool_dtype(series):
+        return ColumnType(BOOLEAN, None)
+    if pd.api.types.is_numeric_dtype(series):
+        return ColumnType(NUMERIC, None)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return ColumnType(DATETIME, None)
+    is_categorical = isinstance(series.dtype, pd.CategoricalDtype)
+    if not (is_categorical or _is_text(series)):
+        return ColumnType(TEXT, None)
+    return _classify(_sample(series, sample_size), is_categorical)
+
+
+def _through_categories(series, parse):
+    """Apply ``parse`` to a categorical's categories and expand by code."""
+    parsed = parse(pd.Series(series.cat.categories))
+    codes = series.cat.codes.to_numpy()
+    result = pd.Series(parsed.to_numpy()[codes], index=series.index, name=series.name)
+    return result.where(codes >= 0)
+
+
+def convert_column(series, ctype):
+    """Parse ``series`` as ``ctype``; returns ``series`` unchanged if the full
+    column does not parse cleanly."""
+    if ctype.kind == DATETIME and not pd.api.types.is_datetime64_any_dtype(series):
+        parse = lambda values: _parse_dates(values, ctype.fmt)
+    elif ctype.kind == NUMERIC and not pd.api.types.is_numeric_dtype(series):
+        parse = _parse_numbers
+    elif ctype.kind == BOOLEAN and not pd.api.types.is_bool_dtype(series):
+        parse = lambda values: _parse_bools(values).astype("boolean")
+    elif ctype.kind == CATEGORICAL and not isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype("category")
+    else:
+        return series
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        parsed = _through_categories(series, parse)
+        if ctype.kind == DATETIME:
+            parsed = pd.to_datetime(parsed)
+        elif ctype.kind == BOOLEAN:
+            parsed = parsed.astype("boolean")
+    else:
+        parsed = parse(series)
+    return parsed if _all_parsed(parsed, series) else series
+
+
+def infer_schema(df, key=None, sample_size=SAMPLE_SIZE):
+    """Map each column to its ``ColumnType``.
+
+    With a ``key`` (the dataset content hash) results are cached per column, so
+    a dataset is only inferred once per process.
+    """
+    schema = {}
+    for col in df.columns:
+        cache_key = (key, col, str(df[col].dtype)) if key is not None else None
+        if cache_key is not None:
+            with _cache_lock:
+                if cache_key in _cache:
+                    _cache.move_to_end(cache_key)
+                    schema[col] = _cache[cache_key]
+                    continue
+        schema[col] = infer_column(df[col], sample_size)
+        if cache_key is not None:
+            with _cache_lock:
+                _cache[cache_key] = schema[col]
+                while len(_cache) > CACHE_SIZE:
+                    _cache.popitem(last=False)
+    return schema
+
+
+def apply_schema(df, schema):
+    converted = {col: convert_column(df[col], schema[col]) for col in df.columns}
+    return pd.DataFrame(converted, index=df.index, copy=False)
+
+
+def column_groups(df):
+    """Split ``df``'s columns into (date_cols, num_cols, cat_cols) by dtype.
+
+    ``cat_cols`` lists categorical and boolean columns before free-text ones,
+    so charts keyed on ``cat_cols[0]`` prefer a low-cardinality column.
+    """
+    date_cols = [col for col in df.columns if pd.api.types.is_datetime64_any_dtype(df[col])]
+    num_cols = [col for col in df.columns
+                if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])]
+    grouped = [col for col in df.columns
+               if isinstance(df[col].dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(df[col])]
+    text = [col for col in df.columns if _is_text(df[col])]
+    return date_cols, num_cols, grouped + text
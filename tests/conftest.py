@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.dataset import extend_frame
+
+
+def _rows(n, seed, regions, stores):
+    rng = np.random.default_rng(seed)
+    dates = pd.Series(pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 10 * 24, n), unit="h"))
+    dates[rng.random(n) < 0.1] = pd.NaT
+    sales = rng.integers(0, 100, n).astype(float)
+    sales[rng.random(n) < 0.1] = np.nan
+    return pd.DataFrame({
+        "date": dates,
+        "region": pd.Categorical(rng.choice(regions, n)),
+        "store": rng.choice(stores, n).astype(object),
+        "sales": sales,
+    })
+
+
+@pytest.fixture
+def appended():
+    """(old frame, old frame with rows appended); the new rows add a region, a
+    store and NaT dates, and repeat dates the old rows have."""
+    old = _rows(300, 0, ["North", "South", "East"], ["S1", "S2", "S3"])
+    new = _rows(120, 1, ["North", "Central"], ["S2", "S4"])
+    new.loc[:9, "date"] = old["date"].dropna().iloc[:10].to_numpy()
+    return old, extend_frame(old, new)
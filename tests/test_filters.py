@@ -0,0 +1,57 @@
+import datetime
+
+import pandas as pd
+
+from core.filters import FilterIndex, date_range_filter
+
+
+def test_date_range_filter_runs_through_the_last_day():
+    df = pd.DataFrame({"date": pd.to_datetime(["2024-01-01 08:00", "2024-01-02 23:30", "2024-01-03 12:00"])})
+    index = FilterIndex(df)
+    bounds = index.date_bounds("date")
+    days = [datetime.date(2024, 1, 1), datetime.date(2024, 1, 2)]
+    filtered = index.select(date=date_range_filter("date", days, bounds))
+    assert filtered.rows.tolist() == [0, 1]
+
+
+def test_date_range_filter_full_or_incomplete_range_filters_nothing():
+    bounds = (pd.Timestamp("2024-01-01 08:00"), pd.Timestamp("2024-01-03 12:00"))
+    full = [datetime.date(2024, 1, 1), datetime.date(2024, 1, 3)]
+    assert date_range_filter("date", full, bounds) is None
+    assert date_range_filter("date", full[:1], bounds) is None
+    assert date_range_filter("date", full, (None, None)) is None
+    one_day = date_range_filter("date", [full[0], full[0]], bounds)
+    assert one_day == ("date", pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-02") - pd.Timedelta(1, "ns"))
+
+
+SELECTIONS = [
+    {},
+    {"date": ("date", pd.Timestamp("2024-01-03"), pd.Timestamp("2024-01-06 12:00"))},
+    {"categories": ("region", ["Central"])},
+    {"categories": ("store", ["S1", "S4"])},
+    {"date": ("date", pd.Timestamp("2024-01-02"), pd.Timestamp("2024-01-08")),
+     "categories": ("region", ["North", "Central"])},
+]
+
+
+def _selected(index, selection):
+    rows = index.select(**selection).rows
+    return None if rows is None else rows.tolist()
+
+
+def test_extended_index_matches_a_rebuilt_one(appended):
+    old, df = appended
+    index = FilterIndex(old, "old")
+    for selection in SELECTIONS:
+        # builds the per-column indexes that are carried over
+        index.select(**selection)
+    extended = index.extended(df, "new")
+    rebuilt = FilterIndex(df, "new")
+    assert extended.parent == ("old", len(old))
+    assert extended.date_bounds("date") == rebuilt.date_bounds("date")
+    for selection in SELECTIONS:
+        assert _selected(extended, selection) == _selected(rebuilt, selection)
+    for col in ("region", "store"):
+        assert sorted(extended.categories(col)) == sorted(rebuilt.categories(col))
+        rows = rebuilt.select(date=SELECTIONS[1]["date"]).rows
+        assert sorted(extended.categories(col, rows)) == sorted(rebuilt.categories(col, rows))
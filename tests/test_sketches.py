@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.filters import FilterIndex
+from core.sketches import extend_summaries, partition_summary
+
+SELECTIONS = [
+    {},
+    {"date": ("date", pd.Timestamp("2024-01-03"), pd.Timestamp("2024-01-07") - pd.Timedelta(1, "ns"))},
+    {"categories": ("region", ["Central"])},
+    {"date": ("date", pd.Timestamp("2024-01-02"), pd.Timestamp("2024-01-09") - pd.Timedelta(1, "ns")),
+     "categories": ("region", ["North", "Central"])},
+]
+
+
+def _kpis(stats):
+    return (len(stats), stats.column_totals(["sales"]).tolist(), stats.column_range("sales"),
+            stats.column_range("date"), tuple(stats.top_value("store")), tuple(stats.quantile("sales", 0.5)))
+
+
+@pytest.mark.parametrize("selection", SELECTIONS)
+def test_extended_summary_matches_a_rebuilt_one(appended, selection):
+    old, df = appended
+    parent_id, new_id = f"old-{id(selection)}", f"new-{id(selection)}"
+    summary = partition_summary(FilterIndex(old, parent_id), "date", "region")
+    # builds the per-column sketches that are carried over
+    _kpis(summary.select(**selection))
+
+    extend_summaries(parent_id, new_id, df, len(old))
+    extended = partition_summary(FilterIndex(df, new_id), "date", "region")
+    rebuilt = partition_summary(FilterIndex(df, f"rebuilt-{id(selection)}"), "date", "region")
+    # carried over, not rebuilt: the new rows get partitions of their own
+    assert len(extended.keys) > len(rebuilt.keys)
+
+    got, expected = _kpis(extended.select(**selection)), _kpis(rebuilt.select(**selection))
+    np.testing.assert_equal(got, expected)
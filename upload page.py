@@ -1,38 +1,66 @@
 import streamlit as st
 import pandas as pd
 import os
-import time
-import json
 
-UPLOAD_FOLDER = "uploaded_data"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+from core.append import SOURCE_BYTES, append_rows, appended_id, new_rows_offset
+from core.ingest import (columns_digest, excel_sheet_names, ingest_workbook, json_columns, read_csv_chunked,
+                         read_excel_sheet, read_json_records, sheet_digest)
+from core.panels import performance_panel
+from core.store import content_hash, dataset_path, dataset_rows, read_columns, read_head, save_dataset
+from core.tracing import span, start_trace
 
 st.set_page_config(page_title="EDA Dashboard App", layout="wide")
+run = start_trace("Upload")
 
 st.title("📤 Upload Your Dataset")
 
 st.markdown("""
-Upload your dataset in **CSV**, **Excel (.xlsx, .xls)**, or **JSON** format.  
+Upload your dataset in **CSV**, **Excel (.xlsx, .xls)**, or **JSON** (including JSON Lines) format.  
 Maximum file size: **2 GB**.
 
 - After uploading, the dataset is saved on the server and previewed below.
 - You can proceed to the Dashboard or Data Visualization pages.
+- To add new rows to the current dataset, choose **Append** and upload a file with the same columns
+  (or the same CSV with lines added at the end).
 """)
 
+append_mode = False
+if "dataset_id" in st.session_state:
+    append_mode = st.radio(
+        "Upload mode", ["New dataset", "Append to current dataset"], horizontal=True
+    ) == "Append to current dataset"
+
 uploaded_file = st.file_uploader(
     "Choose a dataset file", 
-    type=["csv", "xlsx", "xls", "json"]
+    type=["csv", "xlsx", "xls", "json", "jsonl", "ndjson"]
 )
 
-def load_file(file):
+JSON_SUFFIXES = ('.json', '.jsonl', '.ndjson')
+
+def load_file(file, columns=None):
+    """Parse an uploaded file; ``columns`` picks the flattened fields of a JSON file."""
     try:
         if file.name.endswith('.csv'):
-            return pd.read_csv(file)
-        elif file.name.endswith(('.xlsx', '.xls')):
+            progress_bar = st.progress(0.0, text="Reading CSV...")
+
+            def report(rows, fraction):
+                progress_bar.progress(fraction or 0.0, text=f"Read {rows:,} rows")
+
+            df = read_csv_chunked(file, total_bytes=file.size, progress=report)
+            progress_bar.empty()
+            return df
+        elif file.name.endswith('.xls'):
+            # legacy binary workbooks; .xlsx goes through load_workbook_sheets
             return pd.read_excel(file)
-        elif file.name.endswith('.json'):
-            data = json.load(file)
-            return pd.json_normalize(data)
+        elif file.name.endswith(JSON_SUFFIXES):
+            progress_bar = st.progress(0.0, text="Reading JSON...")
+
+            def report(rows, fraction):
+                progress_bar.progress(fraction or 0.0, text=f"Read {rows:,} records")
+
+            df = read_json_records(file, columns, total_bytes=file.size, progress=report)
+            progress_bar.empty()
+            return df
         else:
             st.error("Unsupported file format")
             return None
@@ -40,32 +68,142 @@ def load_file(file):
         st.error(f"Error loading file: {e}")
         return None
 
-if uploaded_file:
-    df = load_file(uploaded_file)
-    if df is not None:
-        st.session_state["uploaded_df"] = df
-
-        filename = f"dataset_{int(time.time())}_{uploaded_file.name}"
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-
-        if uploaded_file.name.endswith('.csv'):
-            df.to_csv(file_path, index=False)
-        elif uploaded_file.name.endswith(('.xlsx', '.xls')):
-            df.to_excel(file_path, index=False)
-        elif uploaded_file.name.endswith('.json'):
-            uploaded_file.seek(0)
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.read())
+def load_workbook_sheets(file, digest):
+    """Let the user pick sheets, store each picked sheet as a dataset (parsed in
+    parallel, streaming) and return the dataset id of the one to analyse."""
+    try:
+        sheets = excel_sheet_names(file)
+    except Exception as e:
+        st.error(f"Error loading file: {e}")
+        st.stop()
+    selected = st.multiselect("Sheets to load", sheets, default=sheets[:1])
+    if not selected:
+        st.info("Select at least one sheet.")
+        st.stop()
+    try:
+        with st.spinner(f"Reading {len(selected)} sheet(s)..."):
+            ids = ingest_workbook(file, selected, digest)
+    except Exception as e:
+        st.error(f"Error loading file: {e}")
+        st.stop()
+    active = st.selectbox("Sheet to analyse", selected) if len(selected) > 1 else selected[0]
+    return ids[active]
 
+def pick_json_columns(file, digest):
+    """Let the user pick which (flattened) fields of a JSON file to keep before
+    it is parsed; returns the dataset id and the picked columns."""
+    try:
+        columns = json_columns(file)
+    except Exception as e:
+        st.error(f"Error loading file: {e}")
+        st.stop()
+    # the pick is kept per file, so reruns do not ask again
+    picked = st.session_state.setdefault("json_columns", {})
+    with st.form("json_fields"):
+        selected = st.multiselect("Fields to load", columns, default=picked.get(digest, columns))
+        if st.form_submit_button("Load"):
+            picked[digest] = selected
+    if not picked.get(digest):
+        st.info("Select the fields to load and press Load.")
+        st.stop()
+    selected = picked[digest]
+    return (digest if selected == columns else columns_digest(digest, selected)), selected
+
+def append_upload(file, dataset_id):
+    """Append the uploaded file's rows to dataset ``dataset_id``; returns the new
+    dataset id and the number of rows added."""
+    digest = content_hash(file)
+    sheet = None
+    if file.name.endswith('.xlsx'):
+        sheet = st.selectbox("Sheet to append", excel_sheet_names(file))
+        digest = sheet_digest(digest, sheet)
+    # the uploaded file stays in place across reruns; append it to each version only once
+    appended = st.session_state.setdefault("appended_uploads", {})
+    if (dataset_id, digest) in appended:
+        return appended[(dataset_id, digest)]
+    if digest == dataset_id:
+        return dataset_id, 0
+
+    new_id, metadata = appended_id(dataset_id, digest), None
+    try:
+        offset = new_rows_offset(file, dataset_id) if file.name.endswith('.csv') else None
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
+    if offset is not None:
+        # the same CSV with lines added: parse only the new lines, and store the
+        # result under the full file's hash, as a fresh upload would be
+        file.seek(offset)
+        with st.spinner("Reading new lines..."):
+            df = read_csv_chunked(file, names=read_columns(dataset_path(dataset_id)))
+        new_id, metadata = digest, {SOURCE_BYTES: file.size}
+    elif sheet is not None:
+        file.seek(0)
+        with st.spinner("Reading sheet..."):
+            df = read_excel_sheet(file, sheet)
+    else:
+        with span("Parse upload", file=file.name, bytes=file.size):
+            df = load_file(file)
+        if df is None:
+            st.stop()
+
+    if df.empty:
+        return dataset_id, 0
+    try:
+        with st.spinner(f"Appending {len(df):,} rows..."):
+            append_rows(dataset_id, df, new_id, metadata)
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
+    # reruns see the new version as the current dataset, with the same file
+    appended[(dataset_id, digest)] = appended[(new_id, digest)] = (new_id, len(df))
+    return new_id, len(df)
+
+if uploaded_file and append_mode:
+    dataset_id, added = append_upload(uploaded_file, st.session_state["dataset_id"])
+    file_path = dataset_path(dataset_id)
+    st.session_state["dataset_id"] = dataset_id
+    st.session_state["uploaded_file_path"] = file_path
+
+    if added:
+        st.success(f"✅ Appended {added:,} rows from '{uploaded_file.name}'. "
+                   f"The dataset now has {dataset_rows(file_path):,} rows.")
+    else:
+        st.info("No new rows to append.")
+
+    st.markdown("### Dataset preview:")
+    st.dataframe(read_head(file_path), use_container_width=True)
+
+elif uploaded_file:
+    digest = content_hash(uploaded_file)
+    columns = None
+    if uploaded_file.name.endswith('.xlsx'):
+        digest = load_workbook_sheets(uploaded_file, digest)
+    elif uploaded_file.name.endswith(JSON_SUFFIXES):
+        digest, columns = pick_json_columns(uploaded_file, digest)
+    file_path = dataset_path(digest)
+
+    # identical bytes were already parsed and stored: reuse the columnar copy
+    if not os.path.exists(file_path):
+        with span("Parse upload", file=uploaded_file.name, bytes=uploaded_file.size):
+            df = load_file(uploaded_file, columns)
+        if df is not None:
+            # lets a grown copy of the same CSV be appended by its new lines only
+            metadata = {SOURCE_BYTES: uploaded_file.size} if uploaded_file.name.endswith('.csv') else None
+            save_dataset(df, digest, metadata)
+            del df
+
+    if os.path.exists(file_path):
+        st.session_state["dataset_id"] = digest
         st.session_state["uploaded_file_path"] = file_path
 
         st.success(f"✅ Dataset '{uploaded_file.name}' uploaded successfully! Size: {uploaded_file.size / (1024**2):.2f} MB")
 
         st.markdown("### Dataset preview:")
-        st.dataframe(df.head(), use_container_width=True)
+        st.dataframe(read_head(file_path), use_container_width=True)
 
         if st.button("Clear uploaded data"):
-            st.session_state.pop("uploaded_df", None)
+            st.session_state.pop("dataset_id", None)
             st.session_state.pop("uploaded_file_path", None)
             st.experimental_rerun()
 
@@ -82,9 +220,9 @@ if uploaded_file:
             unsafe_allow_html=True
         )
 
-elif "uploaded_df" in st.session_state:
+elif "uploaded_file_path" in st.session_state:
     st.info("Dataset already uploaded in this session:")
-    st.dataframe(st.session_state["uploaded_df"].head(), use_container_width=True)
+    st.dataframe(read_head(st.session_state["uploaded_file_path"]), use_container_width=True)
 else:
     st.info("Please upload a CSV, Excel, or JSON file to proceed.")
 
@@ -93,3 +231,6 @@ st.markdown("""
 console.log("Custom JS loaded! You can add your scripts here.");
 </script>
 """, unsafe_allow_html=True)
+
+# ---------- PERFORMANCE ----------
+performance_panel(st, run)
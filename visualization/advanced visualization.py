@@ -1,20 +1,42 @@
+import os
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 from streamlit_elements import elements, dashboard, html, mui
 
+from core.layouts import delete_dashboard, list_dashboards, load_dashboard, save_dashboard
+from core.panels import performance_panel
+from core.store import dataset_path, is_digest, read_columns
+from core.tiles import TILE_TYPES, plotly_bundle_url, tile_document, tile_figures
+from core.tracing import start_trace
+
 st.set_page_config(page_title="Dashboard Builder", layout="wide", page_icon="📊")
+run = start_trace("Dashboard Builder")
 
 if "tiles" not in st.session_state:
     st.session_state["tiles"] = []
 
-if "data" not in st.session_state:
-    st.session_state["data"] = None
+# shared links (?dataset=<hash>&dashboard=<name>) open a saved dashboard directly
+# the dataset id ends up in file paths, so only well-formed ids are accepted
+shared_dataset = st.query_params.get("dataset")
+if shared_dataset and is_digest(shared_dataset) and os.path.exists(dataset_path(shared_dataset)):
+    st.session_state["dataset_id"] = shared_dataset
+    st.session_state["uploaded_file_path"] = dataset_path(shared_dataset)
+shared_dashboard = st.query_params.get("dashboard")
+if (shared_dashboard and "dataset_id" in st.session_state
+        and st.session_state.get("open_dashboard") != shared_dashboard
+        and shared_dashboard in list_dashboards(st.session_state["dataset_id"])):
+    st.session_state["tiles"] = load_dashboard(st.session_state["dataset_id"], shared_dashboard)
+    st.session_state["open_dashboard"] = shared_dashboard
+
+# only the schema is read here; each tile loads just the columns it plots
+data_path = st.session_state.get("uploaded_file_path")
+columns = read_columns(data_path) if data_path else []
 
 st.sidebar.subheader("➕ Add Tile")
-chart_type = st.sidebar.selectbox("Chart Type", ["Scatter", "Bar", "Line", "Histogram", "Pie"])
-x_axis = st.sidebar.selectbox("X-axis", st.session_state["data"].columns if st.session_state["data"] is not None else [])
-y_axis = st.sidebar.selectbox("Y-axis", st.session_state["data"].columns if st.session_state["data"] is not None else [])
+chart_type = st.sidebar.selectbox("Chart Type", TILE_TYPES)
+x_axis = st.sidebar.selectbox("X-axis", columns)
+y_axis = st.sidebar.selectbox("Y-axis", columns)
 
 if st.sidebar.button("Add Chart"):
     tile_id = f"tile_{len(st.session_state['tiles'])+1}"
@@ -29,37 +51,60 @@ if st.sidebar.button("Add Chart"):
         "h": 8,
     })
 
+if data_path:
+    st.sidebar.subheader("💾 Saved Dashboards")
+    dataset_id = st.session_state["dataset_id"]
+    saved = list_dashboards(dataset_id)
+    if saved:
+        chosen = st.sidebar.selectbox("Saved dashboard", saved)
+        open_col, delete_col = st.sidebar.columns(2)
+        if open_col.button("Open"):
+            # served from the stored render cache; nothing is rebuilt
+            st.session_state["tiles"] = load_dashboard(dataset_id, chosen)
+            st.session_state["open_dashboard"] = chosen
+            st.query_params["dataset"] = dataset_id
+            st.query_params["dashboard"] = chosen
+            st.rerun()
+        if delete_col.button("Delete"):
+            delete_dashboard(dataset_id, chosen)
+            st.rerun()
+    dashboard_name = st.sidebar.text_input("Dashboard name", value=st.session_state.get("open_dashboard", ""))
+    if st.sidebar.button("Save dashboard", disabled=not (dashboard_name and st.session_state["tiles"])):
+        try:
+            save_dashboard(dataset_id, data_path, dashboard_name, st.session_state["tiles"])
+        except ValueError as e:
+            st.sidebar.error(str(e))
+        else:
+            st.session_state["open_dashboard"] = dashboard_name
+            st.query_params["dataset"] = dataset_id
+            st.query_params["dashboard"] = dashboard_name
+            st.sidebar.success(f"Saved '{dashboard_name}'. Share this page's URL to open it.")
+
 st.markdown("### 📊 Dashboard")
 
-if st.session_state["tiles"] and st.session_state["data"] is not None:
+if st.session_state["tiles"] and data_path:
 
     layout = [
         dashboard.Item(tile["id"], tile["x_pos"], tile["y_pos"], tile["w"], tile["h"])
         for tile in st.session_state["tiles"]
     ]
 
+    # figure JSON is cached per (dataset, tile spec); only new or changed tiles
+    # are built, in parallel, and every tile shares the locally served plotly.js
+    figures = tile_figures(st.session_state["dataset_id"], data_path, st.session_state["tiles"])
+    bundle_url = plotly_bundle_url()
+
     with elements("dashboard"):
         with dashboard.Grid(layout, draggableHandle=".draggable"):
 
-            for tile in st.session_state["tiles"]:
-                df = st.session_state["data"]
-
-                # Build chart
-                if tile["type"] == "Scatter":
-                    fig = px.scatter(df, x=tile["x"], y=tile["y"])
-                elif tile["type"] == "Bar":
-                    fig = px.bar(df, x=tile["x"], y=tile["y"])
-                elif tile["type"] == "Line":
-                    fig = px.line(df, x=tile["x"], y=tile["y"])
-                elif tile["type"] == "Histogram":
-                    fig = px.histogram(df, x=tile["x"])
-                elif tile["type"] == "Pie":
-                    fig = px.pie(df, names=tile["x"], values=tile["y"])
-
+            for tile, fig_json in zip(st.session_state["tiles"], figures):
                 with mui.Paper(key=tile["id"], elevation=3, sx={"p":2, "borderRadius":2}):
                     mui.Typography(tile["id"], variant="h6", className="draggable")
 
                     html.Iframe(
-                        srcDoc=fig.to_html(include_plotlyjs="cdn"),
+                        srcDoc=tile_document(fig_json, bundle_url),
                         style={"width": "100%", "height": "100%", "border": "none"},
                     )
+
+# ---------- PERFORMANCE ----------
+performance_panel(st, run)
@@ -1,13 +1,24 @@
+import uuid
+
 import streamlit as st 
 import pandas as pd
-import numpy as np
-import plotly.express as px
-import matplotlib.pyplot as plt
-import seaborn as sns
-import altair as alt
+
+from core.aggregate import column_range
+from core.animation import RESOLUTIONS, frame_plan
+from core.backend import open_dataset
+from core.charts import PREFETCH_TABS, TABS, ChartContext, build, prefetch, zoom_bounds
+from core.correlation import PAIRS_VIEW_ABOVE
+from core.downsample import DEFAULT_POINT_BUDGET
+from core.export import FORMATS, export_view, file_name, mime_type
+from core.filters import date_range_filter
+from core.panels import memory_panel, performance_panel, performance_toggle
+from core.sketches import statistics
+from core.tracing import payload_bytes, span, start_trace
+from core.type_inference import column_groups
 
 # ---------- PAGE CONFIG ----------
 st.set_page_config(page_title="Smart Auto-Dashboard", layout="wide", page_icon="📊")
+run = start_trace("Dashboard")
 
 # Load Roboto font
 st.markdown("""
@@ -53,75 +64,87 @@ st.markdown(f"""
 """, unsafe_allow_html=True)
 
 # ---------- CHECK FOR DATA ----------
-if "uploaded_df" not in st.session_state:
+if "uploaded_file_path" not in st.session_state:
     st.warning(lang["warning"])
     st.stop()
 
-df = st.session_state.uploaded_df.copy()
+# in-memory or out-of-core (DuckDB) index over the stored dataset; filters
+# only produce row ids or predicates, and the data is never modified in place
+index = open_dataset(st.session_state["dataset_id"], st.session_state["uploaded_file_path"])
+head = index.head()
+columns = head.columns.tolist()
 
-# ---------- CLEAN DUPLICATE COLUMNS ----------
-def make_unique_columns(columns):
-    counts = {}
-    new_cols = []
-    for col in columns:
-        if col in counts:
-            counts[col] += 1
-            new_cols.append(f"{col}_{counts[col]}")
-        else:
-            counts[col] = 0
-            new_cols.append(col)
-    return new_cols
+date_cols, num_cols, cat_cols = column_groups(head)
 
-df.columns = make_unique_columns(df.columns)
+# ---------- FILTERS ----------
+date_col = None
+category_col = None
+date_filter = None
+category_filter = None
 
-# ---------- DETECT COLUMN TYPES ----------
-for col in df.columns:
-    if df[col].dtype == object:
-        try:
-            df[col] = pd.to_datetime(df[col], errors='ignore')
-        except:
-            pass
 
-date_cols = [col for col in df.columns if pd.api.types.is_datetime64_any_dtype(df[col])]
-num_cols = df.select_dtypes(include=np.number).columns.tolist()
-cat_cols = [col for col in df.columns if df[col].dtype == 'object']
+def reset_filters():
+    for key in [key for key in st.session_state if key.startswith("filter_")]:
+        del st.session_state[key]
+
 
-# ---------- FILTERS ----------
 with st.sidebar:
     st.header(lang["filters"])
 
     if date_cols:
-        date_col = st.selectbox("Select Date Column", date_cols)
-        min_date, max_date = df[date_col].min(), df[date_col].max()
-        date_range = st.date_input("Date Range", [min_date, max_date])
-        if len(date_range) == 2:
-            df = df[(df[date_col] >= pd.to_datetime(date_range[0])) & (df[date_col] <= pd.to_datetime(date_range[1]))]
+        date_col = st.selectbox("Select Date Column", date_cols, key="filter_date_col")
+        min_date, max_date = index.date_bounds(date_col)
+        # keyed per dataset version, so appended rows widen the default range
+        date_range = st.date_input("Date Range", [min_date, max_date],
+                                   key=f"filter_date_range_{st.session_state['dataset_id']}_{date_col}")
+        # no filter for the full range also lets results cached before rows were
+        # appended be extended rather than recomputed
+        date_filter = date_range_filter(date_col, date_range, (min_date, max_date))
 
     if cat_cols:
-        category_col = st.selectbox("Category Column", cat_cols)
-        selected_cats = st.multiselect("Select Categories", df[category_col].unique())
+        category_col = st.selectbox("Category Column", cat_cols, key="filter_category_col")
+        date_rows = index.select(date=date_filter).rows
+        selected_cats = st.multiselect("Select Categories", index.categories(category_col, date_rows),
+                                       key=f"filter_categories_{category_col}")
         if selected_cats:
-            df = df[df[category_col].isin(selected_cats)]
+            category_filter = (category_col, selected_cats)
+
+    view = index.select(date=date_filter, categories=category_filter)
 
     # Sorting feature
-    sort_col = st.selectbox("Sort By", options=["None"] + df.columns.tolist())
-    sort_order = st.radio("Order", ["Ascending", "Descending"])
+    sort_col = st.selectbox("Sort By", options=["None"] + columns, key="filter_sort_col")
+    sort_order = st.radio("Order", ["Ascending", "Descending"], key="filter_sort_order")
     if sort_col != "None":
-        df = df.sort_values(by=sort_col, ascending=True if sort_order=="Ascending" else False)
+        view = view.sorted_by(sort_col, ascending=True if sort_order=="Ascending" else False)
+
+    # Export exactly the filtered and sorted rows, streamed from the shared frame
+    export_format = st.selectbox("Export format", list(FORMATS))
+    st.download_button(
+        f"⬇️ Export filtered data ({len(view):,} rows)",
+        data=lambda: export_view(view, export_format),
+        file_name=file_name("filtered_data", export_format),
+        mime=mime_type(export_format),
+    )
+
+    # Reset filters button: back to every row, keeping the dataset
+    st.button("🔄 Reset Filters", on_click=reset_filters)
+
+    exact_stats = st.toggle("Exact KPIs", value=False,
+                            help="Compute Key Metrics and Quick Insights over every filtered row "
+                                 "instead of merging per-day, per-category summaries.")
 
-    # Reset filters button
-    if st.button("🔄 Reset Filters"):
-        st.session_state.pop("uploaded_df")
-        st.success("✅ Filters cleared! Please re-upload your file.")
-        st.stop()
+# KPIs and insights: merged partition summaries (exact sums, extrema and date
+# range; bounded error for top values and quantiles), or exact aggregates
+stats = statistics(index, view, date_col, category_col, date_filter, category_filter, exact=exact_stats)
 
 # ---------- KPI METRICS ----------
 st.markdown(f"### {lang['metrics']}")
 if num_cols:
     cols = st.columns(min(4, len(num_cols)))
+    totals = stats.column_totals(num_cols[:4])
     for i, metric in enumerate(num_cols[:4]):
         with cols[i]:
-            total = df[metric].sum()
+            total = totals[metric]
             st.metric(label=metric, value=f"{total:,.0f}")
 else:
     st.info("No numeric columns available for KPIs.")
@@ -129,11 +152,21 @@ else:
 # ---------- QUICK INSIGHTS ----------
 insights_md = ""
 if cat_cols:
-    insights_md += f"*Top Category in {cat_cols[0]}:* {df[cat_cols[0]].value_counts().idxmax()}  \n"
+    top = stats.top_value(cat_cols[0])
+    insights_md += f"*Top Category in {cat_cols[0]}:* {top.value}"
+    if top.count is not None:
+        bound = f" to {top.count + top.error:,}" if top.error else ""
+        insights_md += f" ({top.count:,}{bound} rows)"
+    insights_md += "  \n"
 if num_cols:
-    insights_md += f"*Max Value in {num_cols[0]}:* {df[num_cols[0]].max():,.0f}  \n"
+    insights_md += f"*Max Value in {num_cols[0]}:* {stats.column_range(num_cols[0])[1]:,.0f}  \n"
+    median = stats.quantile(num_cols[0], 0.5)
+    if pd.notna(median.value):
+        bound = f" (rank within ±{median.rank_error:.2%})" if median.rank_error else ""
+        insights_md += f"*Median {num_cols[0]}:* {median.value:,.2f}{bound}  \n"
 if date_cols:
-    insights_md += f"*Date Range:* {df[date_cols[0]].min().date()} to {df[date_cols[0]].max().date()}"
+    first_date, last_date = stats.column_range(date_cols[0])
+    insights_md += f"*Date Range:* {first_date.date()} to {last_date.date()}"
 
 st.markdown(f"""
     <h4>{lang['insights']}</h4>
@@ -141,165 +174,85 @@ st.markdown(f"""
         {insights_md}
     </p>
 """, unsafe_allow_html=True)
+if stats.exact:
+    st.caption(f"Exact over {len(stats):,} rows.")
+else:
+    st.caption(f"Merged from {stats.partitions:,} per-day, per-category summaries ({len(stats):,} rows). "
+               "Totals, extremes and dates are exact; top-category counts and the median carry the bounds shown.")
 
 # ---------- VISUALIZATION SETTINGS ----------
 st.sidebar.subheader("🎨 Visualization Settings")
 viz_lib = st.sidebar.radio("Choose Visualization Library", ["Plotly", "Matplotlib", "Seaborn", "Altair"])
 theme = st.sidebar.radio("Theme", ["Light", "Dark"])
+point_budget = st.sidebar.number_input("Max points per chart", min_value=500, max_value=200_000,
+                                       value=DEFAULT_POINT_BUDGET, step=500)
+
+lat_cols = [c for c in columns if "lat" in c.lower()]
+lon_cols = [c for c in columns if "lon" in c.lower() or "lng" in c.lower()]
+ctx = ChartContext(view, date_cols, num_cols, cat_cols, lat_cols, lon_cols, viz_lib, theme, point_budget)
 
 # ---------- VISUALIZATION TABS ----------
-tab_donut, tab_bar, tab_box, tab_hist, tab_corr, tab_scatter, tab_line, tab_anim, tab_map = st.tabs([
-    "🍩 Donut Chart", "📊 Bar Chart", "📦 Box Plot",
-    "📈 Histogram", "🔗 Correlation Heatmap", "⚪ Scatter Plot", 
-    "📉 Line Chart", "🎥 Animated Plot", "🌍 Map Visualization"
-])
-
-# ---------- DONUT ----------
-with tab_donut:
-    if cat_cols and num_cols:
-        if viz_lib == "Plotly":
-            fig = px.pie(df, names=cat_cols[0], values=num_cols[0], hole=0.4, 
-                         template="plotly_dark" if theme=="Dark" else "plotly_white")
-            st.plotly_chart(fig, use_container_width=True)
-        elif viz_lib == "Altair":
-            chart = alt.Chart(df).mark_arc(innerRadius=50).encode(
-                theta=alt.Theta(field=num_cols[0], type="quantitative"),
-                color=alt.Color(field=cat_cols[0], type="nominal")
-            )
-            st.altair_chart(chart, use_container_width=True)
-        else:
-            st.warning("Donut available only in Plotly / Altair.")
-    else:
-        st.info("Not enough data for donut chart.")
-
-# ---------- BAR ----------
-with tab_bar:
-    if cat_cols and num_cols:
-        if viz_lib == "Plotly":
-            fig = px.bar(df, x=cat_cols[0], y=num_cols[0], color=cat_cols[0], 
-                         template="plotly_dark" if theme=="Dark" else "plotly_white")
-            st.plotly_chart(fig, use_container_width=True)
-        elif viz_lib == "Matplotlib":
-            fig, ax = plt.subplots()
-            df.groupby(cat_cols[0])[num_cols[0]].mean().plot(kind="bar", ax=ax, 
-                color="green" if theme=="Light" else "white")
-            st.pyplot(fig)
-        elif viz_lib == "Seaborn":
-            fig, ax = plt.subplots()
-            sns.barplot(x=cat_cols[0], y=num_cols[0], data=df, ax=ax)
-            st.pyplot(fig)
-        elif viz_lib == "Altair":
-            chart = alt.Chart(df).mark_bar().encode(x=cat_cols[0], y=num_cols[0], color=cat_cols[0])
-            st.altair_chart(chart, use_container_width=True)
-    else:
-        st.info("Not enough data for bar chart.")
-
-# ---------- BOX PLOT ----------
-with tab_box:
-    if cat_cols and num_cols:
-        if viz_lib == "Plotly":
-            fig = px.box(df, x=cat_cols[0], y=num_cols[0], color=cat_cols[0],
-                         template="plotly_dark" if theme=="Dark" else "plotly_white")
-            st.plotly_chart(fig, use_container_width=True)
-        elif viz_lib == "Seaborn":
-            fig, ax = plt.subplots()
-            sns.boxplot(x=cat_cols[0], y=num_cols[0], data=df, ax=ax)
-            st.pyplot(fig)
-        elif viz_lib == "Matplotlib":
-            fig, ax = plt.subplots()
-            df.boxplot(column=num_cols[0], by=cat_cols[0], ax=ax)
-            st.pyplot(fig)
-    else:
-        st.info("Not enough data for boxplot.")
-
-# ---------- HISTOGRAM ----------
-with tab_hist:
-    if num_cols:
-        if viz_lib == "Plotly":
-            fig = px.histogram(df, x=num_cols[0], nbins=20, 
-                               template="plotly_dark" if theme=="Dark" else "plotly_white")
-            st.plotly_chart(fig, use_container_width=True)
-        elif viz_lib == "Seaborn":
-            fig, ax = plt.subplots()
-            sns.histplot(df[num_cols[0]], bins=20, kde=True, ax=ax)
-            st.pyplot(fig)
-        elif viz_lib == "Matplotlib":
-            fig, ax = plt.subplots()
-            ax.hist(df[num_cols[0]], bins=20, color="skyblue")
-            st.pyplot(fig)
-    else:
-        st.info("No numeric columns for histogram.")
-
-# ---------- CORRELATION ----------
-with tab_corr:
-    if num_cols:
-        corr = df[num_cols].corr()
-        if viz_lib == "Plotly":
-            fig = px.imshow(corr, text_auto=True, template="plotly_dark" if theme=="Dark" else "plotly_white")
-            st.plotly_chart(fig, use_container_width=True)
-        elif viz_lib == "Seaborn":
-            fig, ax = plt.subplots()
-            sns.heatmap(corr, annot=True, cmap="coolwarm", ax=ax)
-            st.pyplot(fig)
+# only the selected tab's chart is built (st.tabs would run every tab body)
+selected_tab = st.radio("Chart", list(TABS), horizontal=True, label_visibility="collapsed")
+
+def zoom_slider(col, key):
+    """Range slider over ``col``; narrowing it until the range fits the point
+    budget draws that range at full resolution."""
+    bounds = zoom_bounds(*column_range(view, col))
+    if bounds is None:
+        return None
+    zoom = st.slider(f"Zoom: {col}", min_value=bounds[0], max_value=bounds[1], value=bounds, key=key)
+    return None if zoom == bounds else zoom
+
+params = {}
+if selected_tab == "⚪ Scatter Plot" and len(num_cols) >= 2:
+    params["zoom"] = zoom_slider(num_cols[0], "scatter_zoom")
+    if viz_lib == "Plotly":
+        params["as_bins"] = st.checkbox("Show as density heatmap", key="scatter_bins")
+elif selected_tab == "📉 Line Chart" and date_cols and num_cols:
+    params["zoom"] = zoom_slider(date_cols[0], "line_zoom")
+elif selected_tab == "🔗 Correlation Heatmap" and len(num_cols) > 2:
+    corr_view = st.radio("Correlation view", ["Heatmap", "Strongest pairs"], horizontal=True,
+                         index=1 if len(num_cols) > PAIRS_VIEW_ABOVE else 0)
+    if corr_view == "Strongest pairs":
+        params["mode"] = "pairs"
+        params["top_k"] = st.slider("Number of pairs", 5, 100, 20, key="corr_top_k")
+elif selected_tab == "🎥 Animated Plot" and date_cols and num_cols and cat_cols:
+    params["resolution"] = st.selectbox("Frame resolution", RESOLUTIONS, format_func=str.capitalize,
+                                        key="animation_resolution")
+    plan = frame_plan(view, date_cols[0], params["resolution"])
+    if plan is not None and plan.pages > 1:
+        # long ranges at a fine resolution are animated one page of frames at a time
+        params["page"] = st.number_input(f"Frames page (of {plan.pages})", min_value=1, max_value=plan.pages,
+                                         value=1, key="animation_page") - 1
+
+# payload sizes cost a serialization, so they are only measured with the panel open
+show_performance = performance_toggle(st)
+items = build(selected_tab, ctx, **params)
+for kind, payload in items:
+    with span("Send chart", tab=selected_tab, kind=kind) as attrs:
+        if show_performance:
+            attrs["payload_bytes"] = payload_bytes(kind, payload)
+        if kind == "plotly":
+            st.plotly_chart(payload, use_container_width=True)
+        elif kind == "altair":
+            st.altair_chart(payload, use_container_width=True)
+        elif kind == "image":
+            st.image(payload, use_container_width=True)
         else:
-            st.info("Correlation supported only in Plotly/Seaborn")
-    else:
-        st.info("Not enough numeric data for correlation heatmap.")
-
-# ---------- SCATTER ----------
-with tab_scatter:
-    if len(num_cols) >= 2:
-        if viz_lib == "Plotly":
-            fig = px.scatter(df, x=num_cols[0], y=num_cols[1], color=cat_cols[0] if cat_cols else None,
-                             template="plotly_dark" if theme=="Dark" else "plotly_white")
-            st.plotly_chart(fig, use_container_width=True)
-        elif viz_lib == "Seaborn":
-            fig, ax = plt.subplots()
-            sns.scatterplot(x=num_cols[0], y=num_cols[1], hue=cat_cols[0] if cat_cols else None, data=df, ax=ax)
-            st.pyplot(fig)
-        elif viz_lib == "Matplotlib":
-            fig, ax = plt.subplots()
-            ax.scatter(df[num_cols[0]], df[num_cols[1]], c="blue")
-            st.pyplot(fig)
-    else:
-        st.info("Need at least 2 numeric columns for scatter plot.")
-
-# ---------- LINE ----------
-with tab_line:
-    if date_cols and num_cols:
-        if viz_lib == "Plotly":
-            fig = px.line(df, x=date_cols[0], y=num_cols[0], color=cat_cols[0] if cat_cols else None,
-                          template="plotly_dark" if theme=="Dark" else "plotly_white")
-            st.plotly_chart(fig, use_container_width=True)
-        elif viz_lib == "Seaborn":
-            fig, ax = plt.subplots()
-            sns.lineplot(x=date_cols[0], y=num_cols[0], hue=cat_cols[0] if cat_cols else None, data=df, ax=ax)
-            st.pyplot(fig)
-        elif viz_lib == "Matplotlib":
-            fig, ax = plt.subplots()
-            ax.plot(df[date_cols[0]], df[num_cols[0]])
-            st.pyplot(fig)
-    else:
-        st.info("Need date and numeric column for line chart.")
-
-# ---------- ANIMATED ----------
-with tab_anim:
-    if date_cols and num_cols and cat_cols:
-        fig = px.bar(df, x=cat_cols[0], y=num_cols[0], color=cat_cols[0], animation_frame=date_cols[0], 
-                     template="plotly_dark" if theme=="Dark" else "plotly_white")
-        st.plotly_chart(fig, use_container_width=True)
-    else:
-        st.info("Not enough data for animated plot.")
-
-# ---------- MAP ----------
-with tab_map:
-    lat_cols = [c for c in df.columns if "lat" in c.lower()]
-    lon_cols = [c for c in df.columns if "lon" in c.lower() or "lng" in c.lower()]
-    if lat_cols and lon_cols:
-        fig = px.scatter_mapbox(df, lat=lat_cols[0], lon=lon_cols[0], 
-                                color=cat_cols[0] if cat_cols else None,
-                                size=num_cols[0] if num_cols else None, mapbox_style="open-street-map",
-                                template="plotly_dark" if theme=="Dark" else "plotly_white")
-        st.plotly_chart(fig, use_container_width=True)
-    else:
-        st.info("No latitude/longitude columns found for map visualization.")
+            getattr(st, kind)(payload)
+
+# the cheap summary tabs are built on the worker pool meanwhile, so switching
+# to them is instant; what is still queued for an earlier filter state is dropped
+prefetch_group = st.session_state.setdefault("prefetch_group", uuid.uuid4().hex)
+prefetch([tab for tab in PREFETCH_TABS if tab != selected_tab], ctx, group=prefetch_group)
+if "page" in params and params["page"] + 1 < plan.pages:
+    # and so is the next page of animation frames
+    prefetch([selected_tab], ctx, {selected_tab: dict(params, page=params["page"] + 1)}, prefetch_group)
+
+# ---------- MEMORY ----------
+# measured after this run's charts, so it includes what they just cached
+memory_panel(st)
+
+# ---------- PERFORMANCE ----------
+performance_panel(st, run, show_performance)
@@ -1,144 +1,138 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
 import streamlit.components.v1 as components
-import os
-import base64
 
-try:
-    from ydata_profiling import ProfileReport
-except ImportError:
-    ProfileReport = None
+from core.cleaning import with_duplicates_filled, without_duplicates_null
+from core.backend import open_dataset
+from core.export import FORMATS, export_frame, file_name, mime_type
+from core.filters import date_range_filter
+from core.panels import memory_panel, performance_panel
+from core.profiling import DEFAULT_SAMPLE_ROWS, ProfileReport, profile
+from core.tracing import keep_trace, start_trace
+from core.type_inference import column_groups
 
-import pdfkit 
---
 st.set_page_config(page_title="Smart Auto-Dashboard", layout="wide", page_icon="📊")
+run = start_trace("Preview")
 st.markdown("<h1 style='text-align:center; color:#4CAF50;'>📊 Smart Auto-Generated Dashboard</h1>", unsafe_allow_html=True)
 
-if "uploaded_df" not in st.session_state:
+if "uploaded_file_path" not in st.session_state:
     st.warning("Please upload a CSV or Excel file from the Upload page first.")
     st.stop()
 
-df_raw = st.session_state.uploaded_df.copy()
+# in-memory or out-of-core index over the stored dataset; filters below build
+# new frames from it
+index = open_dataset(st.session_state["dataset_id"], st.session_state["uploaded_file_path"])
 
-def make_unique_columns(columns):
-    counts = {}
-    new_cols = []
-    for col in columns:
-        if col in counts:
-            counts[col] += 1
-            new_cols.append(f"{col}_{counts[col]}")
-        else:
-            counts[col] = 0
-            new_cols.append(col)
-    return new_cols
-
-df = df_raw.copy()
-df.columns = make_unique_columns(df.columns)
-
-for col in df.columns:
-    if df[col].dtype == object:
-        try:
-            df[col] = pd.to_datetime(df[col], errors='ignore')
-        except Exception:
-            pass
-
-date_cols = [col for col in df.columns if pd.api.types.is_datetime64_any_dtype(df[col])]
-cat_cols = [col for col in df.columns if df[col].dtype == 'object']
+date_cols, _, cat_cols = column_groups(index.head())
 
 st.sidebar.header("🔍 Filters")
 
+date_filter = None
+category_filter = None
+
 if date_cols:
     date_col = st.sidebar.selectbox("Select Date Column", date_cols)
-    min_date, max_date = df[date_col].min(), df[date_col].max()
+    min_date, max_date = index.date_bounds(date_col)
     date_range = st.sidebar.date_input("Date Range", [min_date, max_date])
-    if len(date_range) == 2:
-        df = df[(df[date_col] >= pd.to_datetime(date_range[0])) & 
-                (df[date_col] <= pd.to_datetime(date_range[1]))]
+    date_filter = date_range_filter(date_col, date_range, (min_date, max_date))
 
 if cat_cols:
     category_col = st.sidebar.selectbox("Category Column", cat_cols)
-    selected_cats = st.sidebar.multiselect("Select Categories", df[category_col].unique())
+    date_rows = index.select(date=date_filter).rows
+    selected_cats = st.sidebar.multiselect("Select Categories", index.categories(category_col, date_rows))
     if selected_cats:
-        df = df[df[category_col].isin(selected_cats)]
-
-def without_duplicates_null(data):
-    df_clean = data.drop_duplicates().reset_index(drop=True)
-    df_clean.replace("", np.nan, inplace=True)
-    for col in df_clean.select_dtypes(include='object'):
-        df_clean[col] = df_clean[col].str.strip().replace("", np.nan)
-    return df_clean
-
-def with_duplicates_filled(data):
-    df_filled = data.copy()
-    df_filled.replace("", np.nan, inplace=True)
-    for col in df_filled.select_dtypes(include='object'):
-        df_filled[col] = df_filled[col].str.strip().replace("", np.nan)
-    df_filled.fillna(method='ffill', inplace=True)
-    df_filled.fillna(method='bfill', inplace=True)
-    return df_filled
-
-df_no_duplicates_null = without_duplicates_null(df)
-df_with_duplicates_filled = with_duplicates_filled(df)
-
-tab_preview, tab_summary, tab_cleaned = st.tabs([
-    "🗂 Data Preview",
-    "📑 Summary",
-    "✨ Cleaned Data"
-])
-
-with tab_preview:
+        category_filter = (category_col, selected_cats)
+
+view = index.select(date=date_filter, categories=category_filter)
+
+# only the selected tab is computed; cleaned variants are built on first view
+selected_tab = st.radio("View", ["🗂 Data Preview", "📑 Summary", "✨ Cleaned Data"],
+                        horizontal=True, label_visibility="collapsed")
+
+if selected_tab == "🗂 Data Preview":
     st.markdown("### 📋 Data Preview (Raw Uploaded Data)")
+    everything = index.select()
+    df_raw = everything.frame()
+    if len(df_raw) < len(everything):
+        st.caption(f"Showing a random sample of {len(df_raw):,} of {len(everything):,} rows.")
     st.dataframe(df_raw)
 
-with tab_summary:
+elif selected_tab == "📑 Summary":
     st.markdown("### 📊 Automated EDA Summary")
 
     if ProfileReport is not None:
-        profile = ProfileReport(df, title="Pandas Profiling Report", explorative=True, minimal=True)
-        html_report = profile.to_html()
-
-        b64_html = base64.b64encode(html_report.encode()).decode()
-        iframe_code = f"""
-        <iframe src="data:text/html;base64,{b64_html}" width="100%" height="1600" frameborder="0"></iframe>
-        """
-        st.markdown(iframe_code, unsafe_allow_html=True)
-
-        st.download_button(
-            label="📥 Download EDA Report as HTML",
-            data=html_report,
-            file_name="EDA_Report.html",
-            mime="text/html"
-        )
-        try:
-            pdf_bytes = pdfkit.from_string(html_report, False)
+        sample_rows = st.number_input("Profile a random sample above this many rows", min_value=1_000,
+                                      value=DEFAULT_SAMPLE_ROWS, step=10_000)
+        full_run = len(view) > sample_rows and st.checkbox(f"Profile all {len(view):,} rows (slower)")
+        # runs on a background worker; reruns pick up the same job
+        job = profile(view, sample_rows=int(sample_rows), full=full_run)
+
+        if not job.done():
+            def profile_status():
+                if job.done():
+                    st.rerun()
+                st.progress(job.progress, text=f"⏳ {job.stage}... ({job.elapsed():.0f}s)")
+
+            st.fragment(profile_status, run_every=2)()
+        elif job.error is not None:
+            st.error(f"Error generating report: {job.error}")
+        else:
+            # the report was built on a worker, under its own trace
+            keep_trace(st.session_state, job.trace)
+            if job.sampled:
+                st.caption(f"Report built from a random sample of {job.rows:,} of {job.total_rows:,} rows.")
+            components.html(job.html, height=1600, scrolling=True)
+
             st.download_button(
-                label="📥 Download EDA Report as PDF",
-                data=pdf_bytes,
-                file_name="EDA_Report.pdf",
-                mime="application/pdf"
+                label="📥 Download EDA Report as HTML",
+                data=job.html,
+                file_name="EDA_Report.html",
+                mime="text/html"
             )
-        except Exception as e:
-            st.warning("⚠ PDF generation failed. Make sure wkhtmltopdf is installed.")
-            st.error(f"Error: {e}")
+            # the PDF is only rendered when asked for
+            if st.button("📄 Prepare PDF report"):
+                st.session_state["profile_pdf_job"] = id(job)
+            if st.session_state.get("profile_pdf_job") == id(job):
+                try:
+                    st.download_button(
+                        label="📥 Download EDA Report as PDF",
+                        data=job.pdf(),
+                        file_name="EDA_Report.pdf",
+                        mime="application/pdf"
+                    )
+                except Exception as e:
+                    st.warning("⚠ PDF generation failed. Make sure wkhtmltopdf is installed.")
+                    st.error(f"Error: {e}")
     else:
         st.info("Install ydata-profiling to enable automated EDA.")
 
-with tab_cleaned:
+elif selected_tab == "✨ Cleaned Data":
+    export_format = st.selectbox("Download format", list(FORMATS))
+    if view.pushdown:
+        st.caption("Large dataset: cleaned variants are computed on a random sample of the filtered rows.")
+    df_no_duplicates_null = without_duplicates_null(view)
     st.markdown("### 🧹 Data Without Duplicates (Missing as NULL)")
     st.dataframe(df_no_duplicates_null)
+    # files are encoded in chunks only when the button is clicked
     st.download_button(
         label="📥 Download (No Duplicates, Null Missing Values)",
-        data=df_no_duplicates_null.to_csv(index=False).encode('utf-8'),
-        file_name="no_duplicates_null.csv",
-        mime="text/csv"
+        data=lambda: export_frame(without_duplicates_null(view), export_format),
+        file_name=file_name("no_duplicates_null", export_format),
+        mime=mime_type(export_format)
     )
 
+    df_with_duplicates_filled = with_duplicates_filled(view)
     st.markdown("### 🔄 Data With Duplicates (Missing Filled from Duplicates)")
     st.dataframe(df_with_duplicates_filled)
     st.download_button(
         label="📥 Download (With Duplicates, Missing Filled)",
-        data=df_with_duplicates_filled.to_csv(index=False).encode('utf-8'),
-        file_name="with_duplicates_filled.csv",
-        mime="text/csv"
+        data=lambda: export_frame(with_duplicates_filled(view), export_format),
+        file_name=file_name("with_duplicates_filled", export_format),
+        mime=mime_type(export_format)
     )
+
+# ---------- MEMORY ----------
+# measured after this run's tab, so it includes the cleaned variants it just cached
+memory_panel(st)
+
+# ---------- PERFORMANCE ----------
+performance_panel(st, run)